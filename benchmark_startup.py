@@ -0,0 +1,47 @@
+"""
+benchmark_startup.py
+
+Benchmarks the startup cost of the pipeline scripts (run_pipeline.sh shells out to each of them):
+the wall time of a fresh interpreter importing each script (and the model modules), against a bare
+interpreter and a bare TensorFlow import. The data-only scripts, and the model modules (which only
+import TensorFlow when a model is built, see models/lazy.py), should start in about the time of a
+bare interpreter.
+
+Example:
+    python benchmark_startup.py --repeats 5
+"""
+from argparse import ArgumentParser
+import subprocess
+import sys
+import time
+
+MODULES = ['data_utils', 'gen_settrc', 'predict_class', 'predict_rf_npi', 'predict_rf_rnn',
+           'models.lifted_npi', 'models.single_rnn', 'models.classifier_rnn', 'tensorflow']
+
+
+def startup_time(statement, repeats):
+    """
+    Return the best wall time (over repeats) of a fresh interpreter running statement.
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', statement])
+        times.append(time.time() - start)
+    return min(times)
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the import time of the pipeline scripts.")
+    parser.add_argument("--modules", nargs="+", default=MODULES, help="Modules to import.")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of runs per module (the best is reported).")
+    args = parser.parse_args()
+
+    baseline = startup_time('pass', args.repeats)
+    print '%-24s %8.3fs' % ('(interpreter)', baseline)
+    for module in args.modules:
+        seconds = startup_time('import %s' % module, args.repeats)
+        print '%-24s %8.3fs  (+%.3fs)' % (module, seconds, seconds - baseline)
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,181 @@
 """
-learning_curve.py 
+learning_curve.py
+
+Generates the learning curves: action-oriented (means) and goal-oriented (ends) test accuracy of each
+model family vs. the number of training examples. Every point trains a model on the first N examples
+of the shuffled training corpus (of which a validation split is held out for early stopping, so test
+accuracy is only measured on the weights selected by validation accuracy, see sweep.py). The corpus is parsed and vectorized once per family (into the corpus
+cache), and every point loads the same memory-mapped arrays and takes its subsample from them (see
+subsample), rather than re-parsing. Points are trained concurrently, on a pool of worker processes
+(as in sweep.py), and the accuracies and training time of every point are written to a results table,
+along with the two curves.
+
+Example:
+    python learning_curve.py --sizes 400 800 1200 1600 --models lifted_rnn idraggn --workers 4
 """
-import matplotlib.pyplot as plt
-
-X = [0, 400, 800, 1200, 1600, 2000, 2400, 2800, 3200, 3600]
-
-# ACTION
-LRNN_ACT = [0, .678, .736, .892, .902, .939, .942, .953, .955, .956]
-JD_ACT = [0, .766, .864, .949, .939, .956, .963, .966, .963, .966]
-ID_ACT = [0, .776, .922, .959, .966, .971, .973, .973, .971, .969]
-
-# GOAL
-LRNN_GOAL = [0, .649, .711, .763, .842, .825, .842, .842, .851, .842]
-JD_GOAL = [0, .491, .728, .561, .728, .728, .845, .845, .853, .852]
-ID_GOAL = [0, .447, .570, .561, .711, .754, .767, .801, .798, .798]
-
-plt.figure()
-lrnn, = plt.plot(X, LRNN_ACT, 'r-', label='Single-RNN')
-jdraggn, = plt.plot(X, JD_ACT, 'g-', label='J-DRAGGN')
-idraggn, = plt.plot(X, ID_ACT, 'b-', label='I-DRAGGN')
-plt.title('Action-Oriented Test Accuracy vs. # Training Examples')
-plt.xlabel('Number of Examples (Combined Action and Goal Samples)')
-plt.ylabel('Accuracy')
-plt.ylim([0, 1])
-plt.legend(handles=[lrnn, jdraggn, idraggn], loc='lower right')
-plt.savefig("./action_curve.png")
-plt.clf()
-
-lrnn, = plt.plot(X, LRNN_GOAL, 'r-', label='Single-RNN')
-jdraggn, = plt.plot(X, JD_GOAL, 'g-', label='J-DRAGGN')
-idraggn, = plt.plot(X, ID_GOAL, 'b-', label='I-DRAGGN')
-plt.title('Goal-Oriented Test Accuracy vs. # Training Examples')
-plt.xlabel('Number of Examples (Combined Action and Goal Samples)')
-plt.ylabel('Accuracy')
-plt.ylim([0, 1])
-plt.legend(handles=[lrnn, jdraggn, idraggn], loc='lower right')
-plt.savefig("./goal_curve.png")
+from argparse import ArgumentParser, Namespace
+import csv
+import multiprocessing
+import numpy as np
+import os
+import time
+
+import sweep
+
+# Model Family => (Label, Line Style, Default Iterations (as in the run scripts))
+CURVES = [('lifted_rnn', ('Single-RNN', 'r-', 5)),
+          ('npi', ('J-DRAGGN', 'g-', 25)),
+          ('idraggn', ('I-DRAGGN', 'b-', 25))]
+SIZES = range(400, 4000, 400)
+
+
+def prepare(job):
+    """
+    Parse and vectorize a model family's corpora into the corpus cache (in a worker process, so the
+    points that follow only load it).
+    """
+    model_name, args = job
+    import importlib
+    module, cls = sweep.MODELS[model_name]
+    model_cls = getattr(importlib.import_module(module), cls)
+    model_cls(args.means_train_path, args.ends_train_path, args.means_test_path, args.ends_test_path,
+              is_pik=args.is_pik, pik_train_path=args.pik_train, pik_test_path=args.pik_test, until=1)
+    return model_name
+
+
+def accuracy(row, split):
+    """
+    Return a results row's overall accuracy on a test split (means or ends), or None if it failed.
+    """
+    for key in ['%s_overall' % split, '%s_accuracy' % split]:
+        if row.get(key) not in [None, '']:
+            return float(row[key])
+    return None
+
+
+def curves(rows, split):
+    """
+    Collect the learning curve of each model family on a test split, averaged over seeds.
+
+    :return: Dictionary mapping model family to (sizes, accuracies).
+    """
+    points = {}
+    for row in rows:
+        acc = accuracy(row, split)
+        if acc is not None:
+            points.setdefault(row['model'], {}).setdefault(int(row['until']), []).append(acc)
+    return {m: (sorted(p), [np.mean(p[n]) for n in sorted(p)]) for m, p in points.items()}
+
+
+def plot(rows, out_dir):
+    """
+    Plot the action-oriented (means) and goal-oriented (ends) learning curves.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    for split, title, path in [('means', 'Action-Oriented', 'action_curve.png'), ('ends', 'Goal-Oriented', 'goal_curve.png')]:
+        plt.figure()
+        family_curves, handles = curves(rows, split), []
+        for model_name, (label, style, _) in CURVES:
+            if model_name in family_curves:
+                handle, = plt.plot(family_curves[model_name][0], family_curves[model_name][1], style, label=label)
+                handles.append(handle)
+        plt.title('%s Test Accuracy vs. # Training Examples' % title)
+        plt.xlabel('Number of Examples (Combined Action and Goal Samples)')
+        plt.ylabel('Accuracy')
+        plt.ylim([0, 1])
+        plt.legend(handles=handles, loc='lower right')
+        plt.savefig(os.path.join(out_dir, path))
+        plt.close()
+        print 'Wrote %s' % os.path.join(out_dir, path)
+
+
+def report(rows):
+    """
+    Print the accuracies, iterations, and training time of every point, per model family.
+    """
+    labels = dict((m, label) for m, (label, _, _) in CURVES)
+    print '%-12s %6s %6s %8s %8s %10s %9s' % ('Model', 'Size', 'Seed', 'Action', 'Goal', 'Iterations', 'Seconds')
+    for row in sorted(rows, key=lambda r: ([m for m, _ in CURVES].index(r['model']), int(r['until']), int(r['seed']))):
+        means, ends = accuracy(row, 'means'), accuracy(row, 'ends')
+        print '%-12s %6d %6d %8s %8s %10s %9.1f' % (labels[row['model']], int(row['until']), int(row['seed']),
+                                                   '-' if means is None else '%.3f' % means,
+                                                   '-' if ends is None else '%.3f' % ends,
+                                                   row.get('iterations', '-'), float(row['seconds']))
+
+
+def main():
+    parser = ArgumentParser(description="Train and plot learning curves, over a pool of worker processes.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES, help="Numbers of training examples.")
+    parser.add_argument("--models", nargs="+", choices=[m for m, _ in CURVES], default=[m for m, _ in CURVES],
+                        help="Model families to train.")
+    parser.add_argument("--seeds", nargs="+", type=int, default=[49], help="Random seeds (one run per seed, per point).")
+    parser.add_argument("--iterations", type=int, default=None,
+                        help="Maximum number of fit/evaluate iterations per point (default: as in each model's run script).")
+    parser.add_argument("--eval_every", type=int, default=1, help="Number of iterations between evaluations.")
+    parser.add_argument("--patience", type=int, default=5,
+                        help="Number of evaluations without improvement before stopping a point early (0 to disable).")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="Number of worker processes.")
+    parser.add_argument("--threads", type=int, default=1, help="TensorFlow intra-op threads per worker.")
+    parser.add_argument("--results", default=os.path.join("sweeps", "learning_curve.csv"), help="Path of the results table.")
+    parser.add_argument("--out_dir", default=".", help="Directory to write the curves to.")
+    parser.add_argument("--plot_only", action="store_true", help="Only re-plot the curves from an existing results table.")
+    for name, default in sorted(sweep.DATA.items()):
+        if isinstance(default, bool):
+            parser.add_argument("--" + name, action="store_true", default=default)
+            parser.add_argument("--no_" + name, action="store_false", dest=name)
+        else:
+            parser.add_argument("--" + name, default=default)
+    args = parser.parse_args()
+
+    if args.plot_only:
+        with open(args.results, 'rb') as f:
+            rows = list(csv.DictReader(f))
+        report(rows)
+        plot(rows, args.out_dir)
+        return
+
+    args.log_dir = os.path.splitext(args.results)[0] + "_logs"
+    if not os.path.exists(args.log_dir):
+        os.makedirs(args.log_dir)
+
+    # One Job per (Family, Size, Seed), Longest First (so the pool does not finish on one long point)
+    iterations = dict((m, args.iterations or default) for m, (_, _, default) in CURVES)
+    jobs = [(m, n, seed) for m in args.models for n in args.sizes for seed in args.seeds]
+    jobs.sort(key=lambda (m, n, _): -iterations[m] * n)
+    jobs = [(i, m, {'until': n}, seed, Namespace(**dict(vars(args), iterations=iterations[m]))) for i, (m, n, seed) in enumerate(jobs)]
+
+    # One process per job (maxtasksperchild), so every point starts from a fresh TensorFlow runtime
+    start = time.time()
+    pool = multiprocessing.Pool(args.workers, sweep.init_worker, (args.threads,), maxtasksperchild=1)
+    for model_name in pool.imap_unordered(prepare, [(m, args) for m in args.models]):
+        print 'Cached %s corpus' % model_name
+    print 'Training %d points (%d families x %d sizes x %d seeds) on %d workers' % (len(jobs), len(args.models), len(args.sizes),
+                                                                                 len(args.seeds), args.workers)
+    rows = []
+    for row in pool.imap_unordered(sweep.run, jobs):
+        rows.append(row)
+        print '[%d/%d] %s, %d examples: %s' % (len(rows), len(jobs), row['model'], row['until'],
+                                              row.get('error', 'done in %.1fs' % row['seconds']))
+    pool.close()
+    pool.join()
+    elapsed = time.time() - start
+
+    # Write Results Table
+    rows.sort(key=lambda r: r['run'])
+    columns = ['run', 'model', 'until', 'seed'] + sorted(set(k for r in rows for k in r) - set(['run', 'model', 'until', 'seed', 'seconds', 'error'])) + ['seconds', 'error']
+    with open(args.results, 'wb') as f:
+        writer = csv.DictWriter(f, columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    print 'Wrote %s' % args.results
+
+    report(rows)
+    print 'Total: %.1fs wall time, %.1fs of training (%.1fx)' % (elapsed, sum(r['seconds'] for r in rows),
+                                                              sum(r['seconds'] for r in rows) / elapsed)
+    plot(rows, args.out_dir)
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+batching.py
+
+Length-bucketed mini-batching for the training loops. Examples are grouped with others of similar
+length, and each batch is trimmed to its own longest sentence, rather than the corpus-wide max_len,
+so the GRU encoders don't spend most of their compute on padding. MiniBatches wraps this (or plain
+shuffled batching) in a reusable epoch iterator, that covers every example and prefetches batches.
+hold_out splits a validation set off the training set, for model selection.
+"""
+import numpy as np
+import Queue
+import sys
+import threading
+
+BATCH_SEED, BUCKET_POOL = 21, 20
+VALID_SEED, VALID_FRACTION = 7, 0.1
+
+
+def bucket_batches(lengths, batch_size, rng, pool_batches=BUCKET_POOL):
+    """
+    Split the examples into batches of similar length, in a shuffled order. Examples are shuffled
+    and split into pools of pool_batches batches; each pool is stably sorted by length and cut into
+    consecutive batches, and the batch order is shuffled. Sorting within pools (rather than the
+    whole corpus) keeps batches varied, while still trimming most of the padding. Drawing from rng
+    makes the order reproducible, and different every epoch.
+
+    :param lengths: Sentence lengths, shape [N]
+    :param batch_size: Maximum number of examples per batch (the last batch of a pool may be smaller)
+    :param rng: np.random.RandomState to shuffle with
+    :param pool_batches: Number of batches per sorted pool
+    :return: List of index arrays, one per batch, covering every example once.
+    """
+    lengths, pool_size = np.asarray(lengths), batch_size * pool_batches
+    order, batches = rng.permutation(len(lengths)), []
+    for pool_start in range(0, len(order), pool_size):
+        pool = order[pool_start:pool_start + pool_size]
+        pool = pool[np.argsort(lengths[pool], kind='mergesort')]
+        batches.extend([pool[start:start + batch_size] for start in range(0, len(pool), batch_size)])
+    rng.shuffle(batches)
+    return batches
+
+
+def batch_width(lengths, idx):
+    """
+    Return the padded width needed for the batch with the given indices (at least 1).
+    """
+    return max(int(np.max(np.asarray(lengths)[idx])), 1)
+
+
+def shuffled_batches(num_examples, batch_size, rng):
+    """
+    Split the examples into consecutive batches of a fresh random permutation.
+
+    :return: List of index arrays, one per batch, covering every example once (the last batch may
+             be smaller).
+    """
+    order = rng.permutation(num_examples)
+    return [order[start:start + batch_size] for start in range(0, num_examples, batch_size)]
+
+
+def hold_out(arrays, fraction=VALID_FRACTION, seed=VALID_SEED):
+    """
+    Split a training set into training and validation examples. A seeded random fraction of the
+    examples (the same every run; at least one, unless there is only one example) is held out.
+
+    :param arrays: List of per-example arrays (e.g. sentences, lengths, labels), all of length N
+    :param fraction: Fraction of the examples to hold out, in (0, 1)
+    :return: Tuple of the lists of training arrays and of validation arrays (each in corpus order).
+    """
+    if not 0 < fraction < 1:
+        raise ValueError("Validation fraction must be in (0, 1), not %r" % fraction)
+    num_examples = len(arrays[0])
+    num_valid = min(max(int(round(fraction * num_examples)), 1), max(num_examples - 1, 0))
+    held_out = np.zeros(num_examples, dtype=bool)
+    held_out[np.random.RandomState(seed).permutation(num_examples)[:num_valid]] = True
+    arrays = [np.asarray(a) for a in arrays]
+    return [a[~held_out] for a in arrays], [a[held_out] for a in arrays]
+
+
+class ProducerError():
+    def __init__(self, exc_info):
+        """
+        Exception raised on the prefetch thread, passed through the queue to be re-raised by the
+        consumer.
+        """
+        self.exc_info = exc_info
+
+
+class MiniBatches():
+    def __init__(self, X, X_len, Y, batch_size, seed=BATCH_SEED, bucketed=True, prefetch=2):
+        """
+        Reusable, epoch-shuffling mini-batch iterator over a vectorized training set. Every example
+        is visited once per epoch (the last batch of an epoch may be partial).
+
+        :param X: Sentence matrix, shape [N, max_len]
+        :param X_len: Sentence lengths, shape [N]
+        :param Y: Labels, shape [N] or [N, k]
+        :param seed: Seed of the shuffling RandomState (reproducible, different every epoch)
+        :param bucketed: Group examples of similar length (see bucket_batches) and trim each batch
+                         to its longest sentence; otherwise batches are plain shuffled slices
+        :param prefetch: Number of batches gathered ahead on a background thread (0 to disable)
+        """
+        self.X, self.X_len, self.Y = X, np.asarray(X_len), Y
+        self.batch_size, self.bucketed, self.prefetch = batch_size, bucketed, prefetch
+        self.rng = np.random.RandomState(seed)
+
+    def indices(self):
+        """
+        Draw the batch indices for the next epoch.
+        """
+        if self.bucketed:
+            return bucket_batches(self.X_len, self.batch_size, self.rng)
+        return shuffled_batches(len(self.X_len), self.batch_size, self.rng)
+
+    def gather(self, idx):
+        """
+        Gather the feed arrays for the batch with the given indices.
+
+        :return: Tuple of sentences, lengths, labels.
+        """
+        width = batch_width(self.X_len, idx) if self.bucketed else self.X.shape[1]
+        return self.X[idx, :width], self.X_len[idx], self.Y[idx]
+
+    def epoch(self):
+        """
+        Iterate over one epoch of batches, as tuples of (sentences, lengths, labels). With prefetch,
+        the next batches are gathered on a background thread while the current step runs; an error
+        gathering a batch is re-raised here, and the thread stops if iteration stops early.
+        """
+        batches = self.indices()
+        if not self.prefetch:
+            for idx in batches:
+                yield self.gather(idx)
+            return
+
+        queue, stop = Queue.Queue(maxsize=self.prefetch), threading.Event()
+
+        def put(item):
+            # Wait for room in the queue, unless the consumer has stopped iterating
+            while not stop.is_set():
+                try:
+                    queue.put(item, timeout=0.1)
+                    return True
+                except Queue.Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                for idx in batches:
+                    if not put(self.gather(idx)):
+                        return
+            except Exception:
+                put(ProducerError(sys.exc_info()))
+            finally:
+                put(None)
+
+        producer = threading.Thread(target=produce, name="MiniBatches")
+        producer.daemon = True
+        producer.start()
+        try:
+            for batch in iter(queue.get, None):
+                if isinstance(batch, ProducerError):
+                    raise batch.exc_info[0], batch.exc_info[1], batch.exc_info[2]
+                yield batch
+        finally:
+            stop.set()
+            producer.join()
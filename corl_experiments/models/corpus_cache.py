@@ -0,0 +1,139 @@
+"""
+corpus_cache.py
+
+Cache of compiled (parsed and vectorized) corpora. The first run on a set of corpora writes the
+vocabularies, token-id matrices, lengths, and traces to a cache entry keyed by a content hash of the
+source files (and of the code that parses them), so later runs, e.g. the many runs of a
+hyperparameter sweep, load the arrays memory-mapped instead of re-parsing. Entries are invalidated
+automatically whenever a source file or the parsing code changes. Arrays are stored in the smallest
+integer dtype that holds their values (see index_dtype), and the models' placeholders take the same
+dtypes, so batches are fed as stored.
+"""
+import hashlib
+import numpy as np
+import os
+import pickle
+import shutil
+
+CACHE_DIR, CACHE_VERSION = "cache", 2
+META_FILE = "meta.pik"
+
+
+def index_dtype(size):
+    """
+    Return the smallest integer dtype holding the values in range(size) (e.g. the token ids of a
+    vocabulary of that size, or sentence lengths up to size - 1): uint8, uint16, or int32.
+    """
+    for dtype in [np.uint8, np.uint16]:
+        if size <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.int32
+
+
+def file_digest(path):
+    """
+    Return the SHA-1 hex digest of the contents of the file at path.
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(sources, code):
+    """
+    Compute the cache key for a corpus, from the contents of its source files, and the contents of
+    the code files that parse it.
+    """
+    digest = hashlib.sha1(str(CACHE_VERSION))
+    for path in list(sources) + [c[:-1] if c.endswith('.pyc') else c for c in code]:
+        digest.update(file_digest(path))
+    return digest.hexdigest()
+
+
+def save(path, corpus):
+    """
+    Write a compiled corpus (dictionary of named arrays and other picklable values) to the cache
+    entry at path: one .npy file per array, plus the remaining values in META_FILE. The entry is
+    written to a temporary directory and renamed into place, so concurrent runs never see a partial
+    entry.
+    """
+    tmp = "%s.tmp%d" % (path, os.getpid())
+    if not os.path.exists(tmp):
+        os.makedirs(tmp)
+
+    arrays = sorted(k for k, v in corpus.items() if isinstance(v, np.ndarray))
+    for key in arrays:
+        np.save(os.path.join(tmp, key + ".npy"), corpus[key])
+    meta = {k: v for k, v in corpus.items() if k not in arrays}
+    with open(os.path.join(tmp, META_FILE), 'wb') as f:
+        pickle.dump({'arrays': arrays, 'meta': meta}, f, pickle.HIGHEST_PROTOCOL)
+
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        # Another run wrote the same entry first
+        shutil.rmtree(tmp)
+
+
+def load(path):
+    """
+    Load the compiled corpus in the cache entry at path, with arrays memory-mapped (read-only).
+    """
+    with open(os.path.join(path, META_FILE), 'rb') as f:
+        entry = pickle.load(f)
+    corpus = dict(entry['meta'])
+    for key in entry['arrays']:
+        corpus[key] = np.load(os.path.join(path, key + ".npy"), mmap_mode='r')
+    return corpus
+
+
+def cached(name, sources, code, compile_fn, cache_dir=CACHE_DIR):
+    """
+    Return the compiled corpus for the given source files, loading it from the cache if it has been
+    compiled before, and otherwise compiling it with compile_fn and caching the result.
+
+    :param name: Name of the corpus format (e.g. the model class name)
+    :param sources: Paths of the corpus files read by compile_fn
+    :param code: Paths of the code files that define compile_fn (e.g. [__file__])
+    :param compile_fn: Function returning the compiled corpus, as a dictionary of named values
+    :return: Dictionary of named values, with arrays memory-mapped from the cache.
+    """
+    path = os.path.join(cache_dir, "%s-%s" % (name, cache_key(sources, code)))
+    if not os.path.exists(os.path.join(path, META_FILE)):
+        save(path, compile_fn())
+    return load(path)
+
+
+def compile_into(model, compile_fn):
+    """
+    Run compile_fn, a model method that parses the corpora into attributes of the model, then delete
+    the attributes it set along the way (the raw corpora, parallel pairs, etc.), so a model compiled
+    on a cache miss ends up with the same attributes as one loaded on a cache hit: only the returned
+    corpus.
+    """
+    before = set(vars(model))
+    try:
+        return compile_fn()
+    finally:
+        for attr in set(vars(model)) - before:
+            delattr(model, attr)
+
+
+def renumber(ids, size, reserved=0):
+    """
+    Renumber the ids that occur in a subsample of a compiled corpus (e.g. its word ids) densely, in
+    order of first occurrence, as parsing the subsample would number them. Ids below reserved (e.g.
+    PAD and UNK) keep their numbers.
+
+    :param ids: Array of the subsample's ids, in occurrence order
+    :param size: Number of ids in the full corpus
+    :return: Lookup array mapping each id to its new id, or to -1 if it does not occur.
+    """
+    ids = np.asarray(ids, dtype=np.int64).ravel()
+    unique, first = np.unique(ids[ids >= reserved], return_index=True)
+    lookup = np.full(size, -1, dtype=np.int64)
+    lookup[:reserved] = np.arange(reserved)
+    lookup[unique[np.argsort(first)]] = reserved + np.arange(len(unique))
+    return lookup
@@ -8,14 +8,30 @@ import pickle
 import tensorflow as tf
 import tflearn
 
+from . import batching, corpus_cache, embedding, sessions
+
 TERMINATE, CONTINUE = 1, 0
 P_IDX, A1_IDX, T_IDX = 0, 1, 2
 
+
+def corpus_dtypes(vocab_size, max_len, num_progs, num_args):
+    """
+    Return the dtypes of the vectorized corpus (see corpus_cache.index_dtype): of its token ids,
+    sentence lengths, and traces (program ids, including GO, argument ids, and termination flags).
+    """
+    return (corpus_cache.index_dtype(vocab_size), corpus_cache.index_dtype(max_len + 1),
+            corpus_cache.index_dtype(max(num_progs, num_args, 2)))
+
+
 class NPI():
+    CORPUS_ATTRS = ['word2id', 'progs', 'args', 'trainX', 'trainX_len', 'testMeansX', 'testMeans_len', 'testEndsX',
+                    'testEnds_len', 'trainY', 'testMeansY', 'testEndsY', 'max_len']
+
     def __init__(self, means_train_path, ends_train_path, means_test_path, ends_test_path,
                  is_pik=False, pik_train_path=None, pik_test_path=None, embedding_size=30, 
                  num_args=1, npi_core_dim=64, key_dim=32, batch_size=16, num_epochs=5, 
-                 initializer=tf.random_normal_initializer(stddev=0.1), restore=False, until=400):
+                 initializer=tf.random_normal_initializer(stddev=0.1), restore=False, until=400,
+                 valid_fraction=batching.VALID_FRACTION):
         """
         Instantiate an NPI for grounding language to lifted Reward Functions, with the necessary
         parameters.
@@ -24,6 +40,8 @@ class NPI():
         :param ends_train_path: Path to ends training data
         :param means_test_path: Path to means test data
         :param ends_test_path: Path to ends test data
+        :param valid_fraction: Fraction of the training set held out as the validation split (monitored
+                               for early stopping and model selection, see eval_valid)
         """
         assert(is_pik)
         self.means_train_path, self.ends_train_path = means_train_path, ends_train_path
@@ -33,13 +51,25 @@ class NPI():
         self.npi_core_dim, self.key_dim, self.bsz = npi_core_dim, key_dim, batch_size
         self.epochs = num_epochs
         self.until = until
-        self.session = tf.Session()
+        self.session = sessions.new_session()
+
+        # Set Random Seed (for consistency), unless the caller (e.g. sweep.py) already seeded the graph
+        if tf.get_default_graph().seed is None:
+            tf.set_random_seed(49)
 
-        # Set Random Seed (for consistency)
-        tf.set_random_seed(49)
+        # Parse Inputs (loaded from the corpus cache, if these corpora have been parsed before)
+        self.__dict__.update(corpus_cache.cached(self.__class__.__name__, self.corpus_sources(), [__file__],
+                                                  lambda: corpus_cache.compile_into(self, self.compile_corpus)))
 
-        # Parse Inputs
-        self.word2id, self.progs, self.args, self.trainX, self.trainX_len, self.testMeansX, self.testMeans_len, self.testEndsX, self.testEnds_len, self.trainY, self.testMeansY, self.testEndsY = self.parse()
+        # Restrict to the First `until` Training Examples (for learning curve)
+        self.subsample(self.until)
+
+        # Hold Out a Validation Split of the Training Set
+        (self.trainX, self.trainX_len, self.trainY), (self.validX, self.validX_len, self.validY) = batching.hold_out(
+            [self.trainX, self.trainX_len, self.trainY], valid_fraction)
+
+        # Length-bucketed, epoch-shuffled training batches
+        self.train_batches = batching.MiniBatches(self.trainX, self.trainX_len, self.trainY, self.bsz)
 
         # Add GO Program
         self.progs["<<GO>>"] = len(self.progs)
@@ -50,13 +80,13 @@ class NPI():
         # Create id2arg Map
         self.id2arg = {i:arg for arg, i in self.args.iteritems()}
 
-        # Setup Placeholders
-        self.X = tf.placeholder(tf.int32, shape=[None, self.trainX.shape[1]], name='NL_Directive')
-        self.X_len = tf.placeholder(tf.int32, shape=[None], name="NL_Length")
+        # Setup Placeholders (in the corpus dtypes, so batches are fed as stored)
+        self.X = tf.placeholder(self.trainX.dtype, shape=[None, None], name='NL_Directive')
+        self.X_len = tf.placeholder(self.trainX_len.dtype, shape=[None], name="NL_Length")
         self.P = tf.placeholder(tf.int32, shape=[None], name='Program_ID')
-        self.P_out = tf.placeholder(tf.int64, shape=[None], name='Program_Out')
-        self.A1_out = tf.placeholder(tf.int64, shape=[None], name='Argument1_Out')
-        self.T_out = tf.placeholder(tf.int64, shape=[None], name='Termination_Out')
+        self.P_out = tf.placeholder(self.trainY.dtype, shape=[None], name='Program_Out')
+        self.A1_out = tf.placeholder(self.trainY.dtype, shape=[None], name='Argument1_Out')
+        self.T_out = tf.placeholder(self.trainY.dtype, shape=[None], name='Termination_Out')
         self.keep_prob = tf.placeholder(tf.float32, name="Dropout_Prob")
 
         # Instantiate Network Weights
@@ -82,12 +112,12 @@ class NPI():
         self.loss = self.p_loss + sum(self.a_losses)
 
         # Build Training Operation
-        self.train_op = tf.train.AdamOptimizer().minimize(self.loss)
+        self.train_op = embedding.optimizer().minimize(self.loss)
 
         # Build Accuracy Operation
-        correct_prog = tf.equal(tf.argmax(self.program_distribution, 1), self.P_out)
+        correct_prog = tf.equal(tf.argmax(self.program_distribution, 1), tf.cast(self.P_out, tf.int64))
         self.p_accuracy = tf.reduce_mean(tf.cast(correct_prog, tf.float32), name="Prog_Accuracy")
-        correct_a1 = tf.equal(tf.argmax(self.arguments[0], 1), self.A1_out)
+        correct_a1 = tf.equal(tf.argmax(self.arguments[0], 1), tf.cast(self.A1_out, tf.int64))
         self.a1_accuracy = tf.reduce_mean(tf.cast(correct_a1, tf.float32), name="A1_Accuracy")
 
         # Create Saver
@@ -103,11 +133,8 @@ class NPI():
         """
         Instantiate all network weights, including NPI Core GRU Cell.
         """
-        # Create NL Embedding Matrix, with 0 Vector for PAD_ID (0)
-        E = tf.get_variable("Embedding", [len(self.word2id), self.embed_sz], initializer=self.init)
-        zero_mask = tf.constant([0 if i == 0 else 1 for i in range(len(self.word2id))],
-                                    dtype=tf.float32, shape=[len(self.word2id), 1])
-        self.E = E * zero_mask
+        # Create NL Embedding Matrix (PAD_ID (0) is embedded as the 0 Vector by embedding.lookup)
+        self.E = tf.get_variable("Embedding", [len(self.word2id), self.embed_sz], initializer=self.init)
 
         # Create Program Embedding Matrix
         # self.PE = tf.get_variable("Program_Embedding", [len(self.progs), self.embed_sz], initializer=self.init)
@@ -119,7 +146,7 @@ class NPI():
         """
         Map Natural Language Directive to Fixed Size Vector Embedding.
         """
-        directive_embedding = tf.nn.embedding_lookup(self.E, self.X)          # [None, sent_len, embed_sz]
+        directive_embedding = embedding.lookup(self.E, self.X)                # [None, sent_len, embed_sz]
         directive_embedding = tf.nn.dropout(directive_embedding, self.keep_prob)
 
         with tf.variable_scope("Encoder"):
@@ -165,16 +192,16 @@ class NPI():
         Build separate loss computations, using the logits from each of the sub-networks.
         """
         # Termination Network Loss
-        termination_loss = tf.losses.sparse_softmax_cross_entropy(self.T_out, self.terminate)
+        termination_loss = tf.losses.sparse_softmax_cross_entropy(tf.cast(self.T_out, tf.int64), self.terminate)
 
         # Program Network Loss
-        program_loss = tf.losses.sparse_softmax_cross_entropy(self.P_out, self.program_distribution)
+        program_loss = tf.losses.sparse_softmax_cross_entropy(tf.cast(self.P_out, tf.int64), self.program_distribution)
 
         # Argument Network Losses
         arg_losses = []
         for i in range(self.num_args):
             if i == 0:
-                arg_losses.append(tf.losses.sparse_softmax_cross_entropy(self.A1_out, self.arguments[i]))
+                arg_losses.append(tf.losses.sparse_softmax_cross_entropy(tf.cast(self.A1_out, tf.int64), self.arguments[i]))
 
         return termination_loss, program_loss, arg_losses
 
@@ -183,24 +210,38 @@ class NPI():
         Train the model, with the specified batch size and number of epochs.
         """
         # Run through epochs
-        chunk_size = (len(self.trainX) / self.bsz) * self.bsz
         for e in range(self.epochs):
             curr_loss, curr_p_acc, curr_a1_acc, curr_a2_acc, batches = 0.0, 0.0, 0.0, 0.0, 0.0
-            for start, end in zip(range(0, len(self.trainX[:chunk_size]) - self.bsz, self.bsz),
-                                  range(self.bsz, len(self.trainX[:chunk_size]), self.bsz)):
+            for X, X_len, Y in self.train_batches.epoch():
                 loss, p_acc, a1_acc, _ = self.session.run([self.loss, self.p_accuracy, self.a1_accuracy,
                                                            self.train_op], feed_dict={
-                                                                       self.X: self.trainX[start:end],
-                                                                       self.X_len: self.trainX_len[start:end],
-                                                                       self.P: [self.progs["<<GO>>"]] * self.bsz,
-                                                                       self.P_out: self.trainY[start:end, P_IDX],
-                                                                       self.A1_out: self.trainY[start:end, A1_IDX],
-                                                                       self.T_out: self.trainY[start:end, T_IDX],
+                                                                       self.X: X,
+                                                                       self.X_len: X_len,
+                                                                       self.P: [self.progs["<<GO>>"]] * len(X),
+                                                                       self.P_out: Y[:, P_IDX],
+                                                                       self.A1_out: Y[:, A1_IDX],
+                                                                       self.T_out: Y[:, T_IDX],
                                                                        self.keep_prob: 0.5})
                 curr_loss, batches = curr_loss + loss, batches + 1
                 curr_p_acc, curr_a1_acc = curr_p_acc + p_acc, curr_a1_acc + a1_acc
             print 'Epoch %d\tAverage Loss: %.3f\tProgram Accuracy: %.3f\tArg1 Accuracy: %.3f' % (e, curr_loss / batches, curr_p_acc / batches, curr_a1_acc / batches)
 
+    def eval_valid(self):
+        """
+        Evaluate the model on the validation split.
+        """
+        num_correct, num_prog, num_arg = 0.0, 0.0, 0.0
+        for i in range(len(self.validX)):
+            pred_prog, pred_a1 = self.score(self.validX[i], self.validX_len[i])
+            true_prog, true_a1 = self.validY[i, P_IDX], self.validY[i, A1_IDX]
+            num_correct += (pred_prog == true_prog) and (pred_a1 == true_a1)
+            num_prog += pred_prog == true_prog
+            num_arg += pred_a1 == true_a1
+
+        acc = {'program': num_prog / len(self.validX), 'argument': num_arg / len(self.validX), 'overall': num_correct / len(self.validX)}
+        print "Validation Program: %.3f Argument: %.3f Overall: %.3f" % (acc['program'], acc['argument'], acc['overall'])
+        return acc
+
     def eval_means(self):
         """
         Evaluate the model on the test data.
@@ -209,14 +250,15 @@ class NPI():
         for i in range(len(self.testMeansX)):
             pred_prog, pred_a1 = self.score(self.testMeansX[i], self.testMeans_len[i])
             true_prog, true_a1 = self.testMeansY[i, P_IDX], self.testMeansY[i, A1_IDX]
-            if (pred_prog == int(true_prog)) and (pred_a1 == int(true_a1)):
+            if (pred_prog == true_prog) and (pred_a1 == true_a1):
                 num_correct += 1
-            if pred_prog == int(true_prog):
+            if pred_prog == true_prog:
                 num_prog += 1
-            if pred_a1 == int(true_a1):
+            if pred_a1 == true_a1:
                 num_arg += 1
 
         print "Means Per-Segment Test Program: %.3f Argument: %.3f Overall: %.3f" % ((float(num_prog) / float(len(self.testMeansX))), (float(num_arg) / float(len(self.testMeansX))), (float(num_correct) / float(len(self.testMeansX))))
+        return {'program': num_prog / len(self.testMeansX), 'argument': num_arg / len(self.testMeansX), 'overall': num_correct / len(self.testMeansX)}
 
     def eval_ends(self):
         """
@@ -226,14 +268,15 @@ class NPI():
         for i in range(len(self.testEndsX)):
             pred_prog, pred_a1 = self.score(self.testEndsX[i], self.testEnds_len[i])
             true_prog, true_a1 = self.testEndsY[i, P_IDX], self.testEndsY[i, A1_IDX]
-            if (pred_prog == int(true_prog)) and (pred_a1 == int(true_a1)):
+            if (pred_prog == true_prog) and (pred_a1 == true_a1):
                 num_correct += 1
-            if pred_prog == int(true_prog):
+            if pred_prog == true_prog:
                 num_prog += 1
-            if pred_a1 == int(true_a1):
+            if pred_a1 == true_a1:
                 num_arg += 1
 
         print "Ends Test Program: %.3f Argument: %.3f Overall: %.3f" % ((float(num_prog) / float(len(self.testEndsX))), (float(num_arg) / float(len(self.testEndsX))), (float(num_correct) / float(len(self.testEndsX))))
+        return {'program': num_prog / len(self.testEndsX), 'argument': num_arg / len(self.testEndsX), 'overall': num_correct / len(self.testEndsX)}
 
     def score(self, nl_command, length):
         """
@@ -291,7 +334,7 @@ class NPI():
         sent = nl_sentence.split()
         sentence_len = len(sent)
 
-        vec = np.zeros((self.max_len,))
+        vec = np.zeros((self.max_len,), dtype=self.trainX.dtype)
 
         # Truncate Sentences that are too long
         for i in range(min(sentence_len, self.max_len)):
@@ -299,6 +342,50 @@ class NPI():
 
         return vec, sentence_len
 
+    def corpus_sources(self):
+        """
+        List the corpus files read by parse (their contents key the corpus cache).
+        """
+        sources = [self.means_train_path, self.ends_train_path + ".en", self.ends_train_path + ".ml",
+                   self.means_test_path, self.ends_test_path + ".en", self.ends_test_path + ".ml"]
+        if self.is_pik:
+            sources += [self.pik_train, self.pik_test]
+        return sources
+
+    def compile_corpus(self):
+        """
+        Parse the corpora into the values listed in CORPUS_ATTRS (parse's outputs, in order, then the
+        attributes it sets), for the corpus cache.
+        """
+        corpus = dict(zip(self.CORPUS_ATTRS, self.parse()))
+        corpus.update({attr: getattr(self, attr) for attr in self.CORPUS_ATTRS if attr not in corpus})
+        return corpus
+
+    def subsample(self, until):
+        """
+        Restrict the (full, shuffled) training set to its first `until` examples, renumbering the
+        vocabulary, programs, and arguments to those of the remaining training examples and the test
+        sets, exactly as parsing only those examples would.
+        """
+        self.trainX, self.trainX_len, self.trainY = self.trainX[:until], self.trainX_len[:until], self.trainY[:until]
+        splits = [(self.trainX, self.trainX_len, self.trainY), (self.testMeansX, self.testMeans_len, self.testMeansY),
+                  (self.testEndsX, self.testEnds_len, self.testEndsY)]
+
+        # Renumber Words, Truncate to the Maximum Remaining Sentence Length
+        self.max_len = int(max(X_len.max() for _, X_len, _ in splits))
+        tokens = [X[np.arange(X.shape[1]) < X_len[:, None]] for X, X_len, _ in splits]
+        words = corpus_cache.renumber(np.concatenate(tokens), len(self.word2id), reserved=2)
+        self.word2id = {w: int(words[i]) for w, i in self.word2id.items() if words[i] >= 0}
+        self.trainX, self.testMeansX, self.testEndsX = [words[X[:, :self.max_len].astype(np.int64)].astype(X.dtype) for X, _, _ in splits]
+
+        # Renumber Programs, Arguments
+        self.trainY, self.testMeansY, self.testEndsY = traces = [np.array(Y) for _, _, Y in splits]
+        for idx, name in [(P_IDX, 'progs'), (A1_IDX, 'args')]:
+            ids = corpus_cache.renumber(np.concatenate([Y[:, idx] for Y in traces]), len(getattr(self, name)))
+            setattr(self, name, {k: int(ids[i]) for k, i in getattr(self, name).items() if ids[i] >= 0})
+            for Y in traces:
+                Y[:, idx] = ids[Y[:, idx].astype(np.int64)]
+
     def parse(self, max_sentence_len=50):
         """
         Parse the english sentences in the training and test data, generating vocabularies,
@@ -348,10 +435,6 @@ class NPI():
         random.shuffle(self.train_set)
         random.shuffle(self.train_set)
         random.shuffle(self.train_set)
-
-        ### CHANGE THIS FOR LEARNING CURVE ###
-        self.train_set = self.train_set[:self.until]
-        ######################################
         
         # Parse Test Data
         with open(self.means_test_path, 'r') as f:
@@ -404,9 +487,10 @@ class NPI():
             self.max_len = max_sentence_len
         
         # Vectorize English Data
-        trainX, trainX_len = np.zeros((len(self.train_set), self.max_len)), np.zeros((len(self.train_set)), dtype=np.int32)
-        testMeansX, testEndsX = np.zeros((len(self.test_means), self.max_len)), np.zeros((len(self.test_ends), self.max_len))
-        testMeans_len, testEnds_len = np.zeros((len(self.test_means)), dtype=np.int32), np.zeros((len(self.test_ends)), dtype=np.int32)
+        id_dtype, len_dtype, _ = corpus_dtypes(len(word2id), self.max_len, 0, 0)
+        trainX, trainX_len = np.zeros((len(self.train_set), self.max_len), dtype=id_dtype), np.zeros((len(self.train_set)), dtype=len_dtype)
+        testMeansX, testEndsX = np.zeros((len(self.test_means), self.max_len), dtype=id_dtype), np.zeros((len(self.test_ends), self.max_len), dtype=id_dtype)
+        testMeans_len, testEnds_len = np.zeros((len(self.test_means)), dtype=len_dtype), np.zeros((len(self.test_ends)), dtype=len_dtype)
 
         for i in range(len(self.train_set)):
             nl_sentence = self.train_set[i][0]
@@ -454,9 +538,10 @@ class NPI():
             test_ends_traces.append((program_set[prog_key], arg_set[arg], TERMINATE))
         assert(len(test_ends_traces) == len(testEndsX))
 
-        # Vectorize Traces
-        vtrain_traces = np.zeros([len(train_traces), 3])
-        vtest_means_traces, vtest_ends_traces = np.zeros([len(test_means_traces), 3]), np.zeros([len(test_ends_traces), 3])
+        # Vectorize Traces (Programs, plus GO)
+        _, _, trace_dtype = corpus_dtypes(0, 0, len(program_set) + 1, len(arg_set))
+        vtrain_traces = np.zeros([len(train_traces), 3], dtype=trace_dtype)
+        vtest_means_traces, vtest_ends_traces = np.zeros([len(test_means_traces), 3], dtype=trace_dtype), np.zeros([len(test_ends_traces), 3], dtype=trace_dtype)
         for i in range(len(train_traces)):
             trace = train_traces[i]
             vtrain_traces[i][P_IDX] = trace[0]
@@ -0,0 +1,26 @@
+"""
+sessions.py
+
+TensorFlow sessions for the models, with optional process-wide thread limits. When several training
+runs share a machine (e.g. the worker processes of sweep.py), each run should use a few threads,
+rather than every run sizing its thread pools to all of the machine's cores.
+"""
+import tensorflow as tf
+
+THREAD_LIMITS = {'intra_op': 0, 'inter_op': 0}
+
+
+def limit_threads(intra_op, inter_op=1):
+    """
+    Limit the thread pools of sessions created (by new_session) from now on, in this process (0 leaves
+    a pool at TensorFlow's default size, one thread per core).
+    """
+    THREAD_LIMITS.update(intra_op=intra_op, inter_op=inter_op)
+
+
+def new_session():
+    """
+    Create a session, with the process' thread limits.
+    """
+    return tf.Session(config=tf.ConfigProto(intra_op_parallelism_threads=THREAD_LIMITS['intra_op'],
+                                            inter_op_parallelism_threads=THREAD_LIMITS['inter_op']))
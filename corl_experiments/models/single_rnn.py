@@ -8,21 +8,35 @@ singular labels.
 import numpy as np
 import tensorflow as tf
 
+from . import batching, corpus_cache, sessions
+
 PAD, PAD_ID = "<<PAD>>", 0
 UNK, UNK_ID = "<<UNK>>", 1
 
+
+def corpus_dtypes(vocab_size, max_len, num_commands):
+    """
+    Return the dtypes of the vectorized corpus (see corpus_cache.index_dtype): of its token ids,
+    sentence lengths, and reward function labels.
+    """
+    return (corpus_cache.index_dtype(vocab_size), corpus_cache.index_dtype(max_len + 1),
+            corpus_cache.index_dtype(num_commands))
+
+
 class SingleRNN():
     def __init__(self, means_train_path, ends_train_path, means_test_path, ends_test_path,
-                 embedding_size=30, rnn_size=50, h1_size=60, h2_size=50, epochs=10, batch_size=32):
+                 embedding_size=30, rnn_size=50, h1_size=60, h2_size=50, epochs=10, batch_size=32, valid_fraction=batching.VALID_FRACTION):
         """
         Instantiate a SingleRNN Model, with the necessary parameters.
 
         :param train_en: Path to training natural language directives.
         :param train_rf: Path to training reward function strings.
+        :param valid_fraction: Fraction of the training set held out as the validation split (monitored
+                               for early stopping and model selection, see eval_valid)
         """
         self.embedding_sz, self.rnn_sz, self.h1_sz, self.h2_sz = embedding_size, rnn_size, h1_size, h2_size
         self.init, self.bsz, self.epochs = tf.truncated_normal_initializer(stddev=0.5), batch_size, epochs
-        self.session = tf.Session()
+        self.session = sessions.new_session()
 
         # Read Data + Assemble Commands, Parallel Corpus
         with open(means_train_path + ".en", 'r') as f:
@@ -93,24 +107,32 @@ class SingleRNN():
         self.word2id, self.id2word = self.build_vocabulary()
 
         # Vectorize Parallel Corpus
-        self.lengths = [len(n) for n, _ in self.pc]
+        lengths = [len(n) for n, _ in self.pc]
+        self.lengths = np.array(lengths, dtype=corpus_dtypes(0, max(lengths), 0)[1])
         self.train_x, self.train_y = self.vectorize()
 
-         # Setup Placeholders
-        self.X = tf.placeholder(tf.int64, shape=[None, self.train_x.shape[-1]], name='NL_Directive')
-        self.Y = tf.placeholder(tf.int64, shape=[None], name='Lifted_RF')
-        self.X_len = tf.placeholder(tf.int64, shape=[None], name='NL_Length')
+        # Hold Out a Validation Split of the Training Set
+        (self.train_x, self.lengths, self.train_y), (self.valid_x, self.valid_len, self.valid_y) = batching.hold_out(
+            [self.train_x, self.lengths, self.train_y], valid_fraction)
+
+        # Length-bucketed, epoch-shuffled training batches
+        self.train_batches = batching.MiniBatches(self.train_x, self.lengths, self.train_y, self.bsz)
+
+        # Setup Placeholders (in the corpus dtypes, so batches are fed as stored)
+        self.X = tf.placeholder(self.train_x.dtype, shape=[None, None], name='NL_Directive')
+        self.Y = tf.placeholder(self.train_y.dtype, shape=[None], name='Lifted_RF')
+        self.X_len = tf.placeholder(self.lengths.dtype, shape=[None], name='NL_Length')
         self.keep_prob = tf.placeholder(tf.float32, name='Dropout_Prob')
 
         # Build Inference Graph
         self.logits = self.inference()
 
         # Build Loss Computation
-        self.loss = tf.losses.sparse_softmax_cross_entropy(self.Y, self.logits)
+        self.loss = tf.losses.sparse_softmax_cross_entropy(tf.cast(self.Y, tf.int64), self.logits)
         self.probs = tf.nn.softmax(self.logits)
 
         # Create Accuracy Operation
-        correct_prediction = tf.equal(tf.argmax(self.logits, 1), self.Y)
+        correct_prediction = tf.equal(tf.argmax(self.logits, 1), tf.cast(self.Y, tf.int64))
         self.accuracy = tf.reduce_mean(tf.cast(correct_prediction, tf.float32), name="Accuracy")
 
         # Build Training Operation
@@ -141,14 +163,15 @@ class SingleRNN():
         """
         Step through the Parallel Corpus, and convert each sequence to vectors.
         """
+        id_dtype, _, label_dtype = corpus_dtypes(len(self.word2id), max(self.lengths), len(self.commands))
         x, y = [], []
         for nl, ml in self.pc:
-            nvec, mlab = np.zeros((max(self.lengths)), dtype=np.int32), ml
+            nvec, mlab = np.zeros((max(self.lengths)), dtype=id_dtype), ml
             for i in range(len(nl)):
                 nvec[i] = self.word2id.get(nl[i], UNK_ID)
             x.append(nvec)
             y.append(mlab)
-        return np.array(x, dtype=np.int32), np.array(y, dtype=np.int32)
+        return np.array(x, dtype=id_dtype), np.array(y, dtype=label_dtype)
 
     def inference(self):
         """
@@ -158,7 +181,7 @@ class SingleRNN():
         # Embedding
         E = tf.get_variable("Embedding", shape=[len(self.word2id), self.embedding_sz],
                             dtype=tf.float32, initializer=self.init)
-        embedding = tf.nn.embedding_lookup(E, self.X)               # Shape [None, x_len, embed_sz]
+        embedding = tf.nn.embedding_lookup(E, tf.cast(self.X, tf.int32))             # Shape [None, x_len, embed_sz]
         embedding = tf.nn.dropout(embedding, self.keep_prob)
 
         # LSTM
@@ -194,19 +217,24 @@ class SingleRNN():
         Train the model, with the specified batch size and number of epochs.
         """
         # Run through epochs
-        chunk_size = (len(self.train_x) / self.bsz) * self.bsz
         for e in range(self.epochs):
             curr_loss, curr_acc, batches = 0.0, 0.0, 0.0
-            for start, end in zip(range(0, len(self.train_x[:chunk_size]) - self.bsz, self.bsz),
-                                  range(self.bsz, len(self.train_x[:chunk_size]), self.bsz)):
+            for X, X_len, Y in self.train_batches.epoch():
                 loss, acc, _ = self.session.run([self.loss, self.accuracy, self.train_op],
-                                                feed_dict={self.X: self.train_x[start:end],
-                                                           self.X_len: self.lengths[start:end],
-                                                           self.keep_prob: 0.5,
-                                                           self.Y: self.train_y[start:end]})
+                                                feed_dict={self.X: X, self.X_len: X_len, self.keep_prob: 0.5, self.Y: Y})
                 curr_loss, curr_acc, batches = curr_loss + loss, curr_acc + acc, batches + 1
             print 'Epoch %d\tAverage Loss: %.3f\tAverage Accuracy: %.3f' % (e, curr_loss / batches, curr_acc / batches)
 
+    def eval_valid(self):
+        """
+        Perform an evaluation epoch, running through the validation split, returning accuracy.
+        """
+        y = self.session.run(self.probs, feed_dict={self.X: self.valid_x, self.X_len: self.valid_len,
+                                                    self.keep_prob: 1.0})
+        acc = np.mean(np.argmax(y, axis=1) == self.valid_y)
+        print "Validation Accuracy: %.3f" % acc
+        return acc
+
     def eval_means(self):
         """
         Perform an evaluation epoch, running through the test means data, returning accuracy.
@@ -265,7 +293,7 @@ class SingleRNN():
 
         :return: List of tokens representing predicted command, and score.
         """
-        seq, seq_len = np.zeros((max(self.lengths))), len(nl_command)
+        seq, seq_len = np.zeros((self.train_x.shape[1]), dtype=self.train_x.dtype), len(nl_command)
         for i in range(min(len(nl_command), len(seq))):
             seq[i] = self.word2id.get(nl_command[i], UNK_ID)
         y = self.session.run(self.probs, feed_dict={self.X: [seq], self.X_len: [seq_len],
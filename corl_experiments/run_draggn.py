@@ -5,6 +5,7 @@ Core script for loading, training, and evaluating the NPI model for grounding la
 to lifted reward functions.
 """
 from models.lg_npi import NPI
+from models import training
 import tensorflow as tf
 
 FLAGS = tf.app.flags.FLAGS
@@ -18,6 +19,9 @@ tf.app.flags.DEFINE_bool("is_pik", True, "Use pickled version of goals commands.
 tf.app.flags.DEFINE_string("pik_train", "data/vanilla/train_goals.pik", "Path to train pickle file.")
 tf.app.flags.DEFINE_string("pik_test", "data/vanilla/test_goals.pik", "Path to test pickle file.")
 tf.app.flags.DEFINE_integer("until", 400, "Number of training examples (for learning curve)")
+tf.app.flags.DEFINE_integer("iterations", 25, "Maximum number of fit/evaluate iterations.")
+tf.app.flags.DEFINE_integer("eval_every", 1, "Number of iterations between evaluations.")
+tf.app.flags.DEFINE_integer("patience", 5, "Number of evaluations without improvement before stopping early (0 to disable).")
 
 # Unseen Dataset
 # tf.app.flags.DEFINE_string("means_train_path", "data/unseen/unseen_train_actions.pik", "Path to means training data.")
@@ -33,14 +37,11 @@ def main(_):
     npi = NPI(FLAGS.means_train_path, FLAGS.ends_train_path, FLAGS.means_test_path, FLAGS.ends_test_path, is_pik=FLAGS.is_pik,
               pik_train_path=FLAGS.pik_train, pik_test_path=FLAGS.pik_test, until=FLAGS.until)
 
-    # Train Model + Evaluate
+    # Train Model (Stopping Early on Validation Accuracy), then Evaluate the Best Weights on the Test Sets
     print '###' * 10
     print 'UNTIL:', FLAGS.until
-    for i in range(25):
-        print 'ITERATION:', i + 1
-        npi.fit()
-        npi.eval_means()
-        npi.eval_ends()
+    training.train(npi, npi.eval_valid, FLAGS.iterations, FLAGS.eval_every, FLAGS.patience, checkpoint="checkpoints/npi_best.ckpt",
+                   test=lambda: (npi.eval_means(), npi.eval_ends()))
     
     # Save Model
     npi.saver.save(npi.session, "checkpoints/npi.ckpt")
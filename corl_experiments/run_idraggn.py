@@ -5,6 +5,7 @@ Core script for loading, training, and evaluating the Conditionally Independent
 DRAGGN (I-DRAGGN) model for grounding language to lifted reward functions.
 """
 from models.i_draggn import IDRAGGN
+from models import training
 import tensorflow as tf
 
 FLAGS = tf.app.flags.FLAGS
@@ -27,6 +28,9 @@ tf.app.flags.DEFINE_string("ends_test_path", "data/unseen/goals", "Path to ends
 tf.app.flags.DEFINE_bool("is_pik", True, "Use pickled version of goals commands.")
 tf.app.flags.DEFINE_string("pik_train", "data/unseen/unseen_train_goals.pik", "Path to train pickle file.")
 tf.app.flags.DEFINE_string("pik_test", "data/unseen/unseen_test_goals.pik", "Path to test pickle file.")
+tf.app.flags.DEFINE_integer("iterations", 25, "Maximum number of fit/evaluate iterations.")
+tf.app.flags.DEFINE_integer("eval_every", 1, "Number of iterations between evaluations.")
+tf.app.flags.DEFINE_integer("patience", 5, "Number of evaluations without improvement before stopping early (0 to disable).")
 
 def main(_):
     # Create Model
@@ -34,14 +38,11 @@ def main(_):
                       pik_train_path=FLAGS.pik_train, pik_test_path=FLAGS.pik_test, until=FLAGS.until,
                       restore="checkpoints/idraggn.ckpt")
 
-    # Train Model + Evaluate
+    # Train Model (Stopping Early on Validation Accuracy), then Evaluate the Best Weights on the Test Sets
     print '###' * 10
     print 'UNTIL:', FLAGS.until
-    for i in range(25):
-        print 'ITERATION:', i + 1
-        idraggn.fit()
-        idraggn.eval_means()
-        idraggn.eval_ends()
+    training.train(idraggn, idraggn.eval_valid, FLAGS.iterations, FLAGS.eval_every, FLAGS.patience, checkpoint="checkpoints/idraggn_best.ckpt",
+                   test=lambda: (idraggn.eval_means(), idraggn.eval_ends()))
     
     # Save Model
     idraggn.saver.save(idraggn.session, "checkpoints/idraggn.ckpt")
@@ -2,6 +2,7 @@
 run_lifted_rnn.py 
 """
 from models.lifted_rnn import LiftedRNN
+from models import training
 import tensorflow as tf
 
 FLAGS = tf.app.flags.FLAGS
@@ -14,6 +15,9 @@ tf.app.flags.DEFINE_bool("is_pik", True, "Use pickled version of goals commands.
 tf.app.flags.DEFINE_string("pik_train", "data/vanilla/train_goals.pik", "Path to train pickle file.")
 tf.app.flags.DEFINE_string("pik_test", "data/vanilla/test_goals.pik", "Path to test pickle file.")
 tf.app.flags.DEFINE_integer("until", 400, "Number of training examples (for learning curve)")
+tf.app.flags.DEFINE_integer("iterations", 5, "Maximum number of fit/evaluate iterations.")
+tf.app.flags.DEFINE_integer("eval_every", 1, "Number of iterations between evaluations.")
+tf.app.flags.DEFINE_integer("patience", 2, "Number of evaluations without improvement before stopping early (0 to disable).")
 
 # Unseen Dataset
 # tf.app.flags.DEFINE_string("means_train_path", "data/unseen/unseen_train_actions.pik", "Path to means training data.")
@@ -30,13 +34,12 @@ def main(_):
                            is_pik=FLAGS.is_pik, pik_train_path=FLAGS.pik_train, pik_test_path=FLAGS.pik_test,
                            until=FLAGS.until)
 
-    # Fit Model 5 Times, Running Evaluation Epochs 
+    # Fit Model (Stopping Early, and Keeping the Best Weights, Once Validation Accuracy Stops Improving),
+    # then Evaluate the Best Weights on the Test Sets
     print '###' * 10
     print 'UNTIL:', FLAGS.until
-    for _ in range(5):
-        lifted_rnn.fit()
-        lifted_rnn.eval_means()
-        lifted_rnn.eval_ends()
+    training.train(lifted_rnn, lifted_rnn.eval_valid, FLAGS.iterations, FLAGS.eval_every, FLAGS.patience, checkpoint="checkpoints/lifted_rnn_best.ckpt",
+                   test=lambda: (lifted_rnn.eval_means(), lifted_rnn.eval_ends()))
     
 if __name__ == "__main__":
     tf.app.run()
\ No newline at end of file
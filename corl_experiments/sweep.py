@@ -0,0 +1,189 @@
+"""
+sweep.py
+
+Runs a sweep of training runs for one of the grounding models (SingleRNN, LiftedRNN, NPI, I-DRAGGN),
+over a grid of hyperparameters and random seeds. Runs are spread over a pool of worker processes,
+each limited to a few TensorFlow threads (so the runs share the machine's cores, instead of each
+sizing its thread pools to all of them), and every run's test metrics are collected into one results
+table (CSV), with a per-configuration summary over seeds. Runs stop early once their accuracy on a
+validation split held out of the training set stops improving (see models/training.py), and only the
+weights of the best validation evaluation are scored on the test sets.
+
+Example:
+    python sweep.py idraggn --grid until=400,800,1200 --seeds 1 2 3 --workers 4
+"""
+from argparse import ArgumentParser
+import ast
+import csv
+import importlib
+import itertools
+import multiprocessing
+import numpy as np
+import os
+import random
+import sys
+import time
+import traceback
+
+MODELS = {'single_rnn': ('models.single_rnn', 'SingleRNN'),
+          'lifted_rnn': ('models.lifted_rnn', 'LiftedRNN'),
+          'npi': ('models.lg_npi', 'NPI'),
+          'idraggn': ('models.i_draggn', 'IDRAGGN')}
+PIK_MODELS = ['lifted_rnn', 'npi', 'idraggn']
+
+# Vanilla Dataset
+DATA = {'means_train_path': "data/vanilla/train_actions.pik", 'ends_train_path': "data/vanilla/goals",
+        'means_test_path': "data/vanilla/test_actions.pik", 'ends_test_path': "data/vanilla/goals",
+        'is_pik': True, 'pik_train': "data/vanilla/train_goals.pik", 'pik_test': "data/vanilla/test_goals.pik"}
+
+
+def parse_grid(specs):
+    """
+    Parse grid specs of the form name=value1,value2,... (values as Python literals, or strings).
+
+    :return: List of (name, list of values) pairs.
+    """
+    def value(v):
+        try:
+            return ast.literal_eval(v)
+        except (ValueError, SyntaxError):
+            return v
+
+    grid = []
+    for spec in specs:
+        name, values = spec.split('=', 1)
+        grid.append((name, [value(v) for v in values.split(',')]))
+    return grid
+
+
+def flatten(split, metrics):
+    """
+    Flatten a model's eval result (accuracy, or dictionary of accuracies) into named table columns.
+    """
+    if isinstance(metrics, dict):
+        return {'%s_%s' % (split, k): float(v) for k, v in metrics.items()}
+    return {'%s_accuracy' % split: float(metrics)}
+
+
+def init_worker(threads):
+    """
+    Limit the TensorFlow threads of every session a worker process creates.
+    """
+    from models import sessions
+    sessions.limit_threads(threads)
+
+
+def run(job):
+    """
+    Train and evaluate one model configuration, with one seed (in a fresh worker process).
+
+    :return: Results table row: the configuration, seed, best validation score, test metrics (of the
+             weights of the best validation evaluation), iterations run, and wall time.
+    """
+    run_id, model_name, params, seed, args = job
+    row = dict(params, run=run_id, model=model_name, seed=seed)
+    stdout, start = sys.stdout, time.time()
+    sys.stdout = open(os.path.join(args.log_dir, "run%d.log" % run_id), 'w', 0)
+    try:
+        import tensorflow as tf
+        tf.set_random_seed(seed)
+        np.random.seed(seed)
+        random.seed(seed)
+
+        module, cls = MODELS[model_name]
+        model_cls = getattr(importlib.import_module(module), cls)
+        from models import training
+        kwargs = dict(params)
+        if model_name in PIK_MODELS:
+            kwargs.update(is_pik=args.is_pik, pik_train_path=args.pik_train, pik_test_path=args.pik_test)
+        model = model_cls(args.means_train_path, args.ends_train_path, args.means_test_path, args.ends_test_path, **kwargs)
+        if hasattr(model, 'train_batches'):
+            # Shuffle batches by the run's seed, too
+            model.train_batches.rng = np.random.RandomState(seed)
+
+        results, history = training.train(model, model.eval_valid, args.iterations, args.eval_every, args.patience,
+                                          test=lambda: (model.eval_means(), model.eval_ends()))
+        if history:
+            best_iteration, valid = max(history, key=lambda h: h[1])
+            row.update(iterations=history[-1][0], best_iteration=best_iteration, valid=valid)
+            row.update(flatten('means', results[0]))
+            row.update(flatten('ends', results[1]))
+    except Exception:
+        traceback.print_exc(file=sys.stdout)
+        row['error'] = traceback.format_exc().strip().split('\n')[-1]
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    row['seconds'] = round(time.time() - start, 1)
+    return row
+
+
+def summarize(rows, names):
+    """
+    Print the mean and standard deviation of each metric over seeds, per configuration.
+    """
+    metrics = sorted(set(k for row in rows for k in row if k.startswith('means_') or k.startswith('ends_')))
+    configs = {}
+    for row in rows:
+        # Skip failed runs, and runs that never evaluated (e.g. --iterations 0)
+        if 'error' not in row and 'iterations' in row:
+            configs.setdefault(tuple(row.get(n) for n in names), []).append(row)
+
+    for config in sorted(configs):
+        runs = configs[config]
+        stats = ['%s: %.3f +/- %.3f' % (m, np.mean([r[m] for r in runs]), np.std([r[m] for r in runs])) for m in metrics]
+        print ', '.join('%s=%s' % (n, v) for n, v in zip(names, config)), '(%d seeds)' % len(runs)
+        print '    ' + '  '.join(stats)
+
+
+def main():
+    parser = ArgumentParser(description="Run a hyperparameter/seed sweep over a pool of worker processes.")
+    parser.add_argument("model", choices=sorted(MODELS), help="Model to train.")
+    parser.add_argument("--grid", nargs="*", default=[], help="Hyperparameter grid, as name=value1,value2,...")
+    parser.add_argument("--seeds", nargs="+", type=int, default=[49], help="Random seeds (one run per seed, per configuration).")
+    parser.add_argument("--iterations", type=int, default=25, help="Maximum number of fit/evaluate iterations per run.")
+    parser.add_argument("--eval_every", type=int, default=1, help="Number of iterations between evaluations.")
+    parser.add_argument("--patience", type=int, default=5,
+                        help="Number of evaluations without improvement before stopping a run early (0 to disable).")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="Number of worker processes.")
+    parser.add_argument("--threads", type=int, default=1, help="TensorFlow intra-op threads per worker.")
+    parser.add_argument("--results", default=None, help="Path of the results table (default: sweeps/<model>.csv).")
+    for name, default in sorted(DATA.items()):
+        if isinstance(default, bool):
+            parser.add_argument("--" + name, action="store_true", default=default)
+            parser.add_argument("--no_" + name, action="store_false", dest=name)
+        else:
+            parser.add_argument("--" + name, default=default)
+    args = parser.parse_args()
+
+    args.results = args.results or os.path.join("sweeps", args.model + ".csv")
+    args.log_dir = os.path.splitext(args.results)[0] + "_logs"
+    if not os.path.exists(args.log_dir):
+        os.makedirs(args.log_dir)
+
+    grid = parse_grid(args.grid)
+    names = [name for name, _ in grid] + ['seed']
+    configs = [dict(zip([name for name, _ in grid], values)) for values in itertools.product(*[v for _, v in grid])]
+    jobs = [(i, args.model, params, seed, args) for i, (params, seed) in enumerate(itertools.product(configs, args.seeds))]
+    print 'Running %d runs (%d configurations x %d seeds) on %d workers' % (len(jobs), len(configs), len(args.seeds), args.workers)
+
+    # One process per run (maxtasksperchild), so every run starts from a fresh TensorFlow runtime
+    pool, rows = multiprocessing.Pool(args.workers, init_worker, (args.threads,), maxtasksperchild=1), []
+    for row in pool.imap_unordered(run, jobs):
+        rows.append(row)
+        print '[%d/%d] run %d %s' % (len(rows), len(jobs), row['run'], row.get('error', 'done in %.1fs' % row['seconds']))
+    pool.close()
+    pool.join()
+
+    # Write Results Table
+    rows.sort(key=lambda r: r['run'])
+    columns = ['run', 'model'] + names + sorted(set(k for r in rows for k in r) - set(['run', 'model', 'seconds', 'error'] + names)) + ['seconds', 'error']
+    with open(args.results, 'wb') as f:
+        writer = csv.DictWriter(f, columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    print 'Wrote %s' % args.results
+    summarize(rows, names[:-1])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+'''
+Data utilities shared by the pipeline scripts: reading and writing parallel (.en/.ml) data and
+means/ends labels, and writing action traces (.settrc/.ccgsettrc files).
+
+Imports nothing but NumPy, so the data-only scripts (gen_settrc.py) start without paying the
+TensorFlow import.
+'''
+
+import numpy as np
+
+default_start = "(6,6,0)" #for lack of parse failure
+default_map = "cleanupclassic"
+
+#save strings to file
+def save_data(outfile, data):
+    with open(outfile, 'w') as textfile:
+        outstr = "\n".join(data)
+        textfile.write(outstr)
+        print "saved to {}".format(outfile)
+
+def load_data(filepath):
+    with open(filepath, 'r') as f:
+        return [line.strip() for line in f]
+
+def load_labels(filepath):
+    with open(filepath, 'r') as f:
+        return np.array([1 if line.strip() == "E" else 0 for line in f])
+
+def gen_trace(nl, ml, trace_id, map_name=default_map, is_ccgsettrc=True):
+    #parsing machine language
+    #detecting invalid action trace (i.e. block manipulation task or incorrectly classified task)
+    #TODO: assume that all action traces are present, collect files
+    if ml == "NONE" or ml.startswith("L1") or ml.startswith("L2"):
+        start = default_start
+        end = default_start
+        actions = default_start #assuming automatic failures, probably invalid
+    else:
+        split_ml = ml.split()
+        start = split_ml[0]
+        end = split_ml[1]
+        actions = split_ml[2]
+
+    #add header information
+    #TODO: check this info
+    header = "CleanupTrace_{}\nmap={} end={} start={} valid=True correct=True efficiency=(0.8,0.4) implicit=False numFollowers=5 confidence=(5.0,2.0) directionRating=(4.6,1.8547236990991407)	annotated=True	targetFound=(0.8,0.4)".format(trace_id, map_name, end, start)
+    if is_ccgsettrc:
+        trace = "\n".join([header, nl, "you:ps", actions])
+    else:
+        trace = "\n".join([header, nl, actions])
+
+    return trace
+
+def save_traces(traces, outfile):
+    with open(outfile, 'w') as f:
+        outstr = "\n\n".join(traces)
+        f.write(outstr)
+        print "traces saved to {}".format(outfile)
@@ -1,10 +1,13 @@
 """
-api.py 
+api.py
 
-Starts a lightweight Flask API Server, that can be queried via calls to CURL
+Starts a lightweight Flask API Server, that can be queried via calls to CURL. Incoming commands
+are grouped into micro-batches, and grounded with a single forward pass per batch.
 """
 from flask import Flask, request, jsonify
-from models.lg_npi import NPI
+from models.export import FrozenModel
+from models.lg_npi import NPI, load_bundle
+from serving import MicroBatcher
 import sys
 import tensorflow as tf
 
@@ -15,16 +18,34 @@ tf.app.flags.DEFINE_string("means_train_path", "npi_train_test/L0_npi_train", "P
 tf.app.flags.DEFINE_string("ends_train_path", "npi_train_test/L2_train", "Path to ends training data.")
 tf.app.flags.DEFINE_string("means_test_path", "npi_train_test/L0_test", "Path to means test data.")
 tf.app.flags.DEFINE_string("ends_test_path", "npi_train_test/L2_train", "Path to ends test data.")
+tf.app.flags.DEFINE_string("bundle", "", "Path to a model bundle; if set, serve from it without parsing the corpora.")
+tf.app.flags.DEFINE_string("frozen", "", "Path to an exported frozen graph; if set, serve it with the slim runner.")
+tf.app.flags.DEFINE_integer("max_batch_size", 32, "Maximum number of commands grounded in one forward pass.")
+tf.app.flags.DEFINE_float("max_wait_ms", 5.0, "Maximum time (ms) a command waits for its micro-batch to fill.")
 
 # Create Model
-npi = NPI(FLAGS.means_train_path, FLAGS.ends_train_path, FLAGS.means_test_path, FLAGS.ends_test_path, 
-            restore='checkpoints/npi.ckpt')
+if FLAGS.frozen:
+    npi = FrozenModel(FLAGS.frozen)
+elif FLAGS.bundle:
+    npi = load_bundle(FLAGS.bundle)
+else:
+    npi = NPI(FLAGS.means_train_path, FLAGS.ends_train_path, FLAGS.means_test_path, FLAGS.ends_test_path,
+              restore='checkpoints/npi.ckpt')
+
+# Create Micro-Batching Queue
+batcher = MicroBatcher(npi.score_nl_batch, max_batch_size=FLAGS.max_batch_size, max_wait_ms=FLAGS.max_wait_ms)
 
 @app.route('/model')
 def model():
     nl_command = request.args.get('command')
-    x = npi.score_nl(nl_command)
+    if not nl_command:
+        return "Missing 'command' parameter\n", 400
+    x = batcher.submit(nl_command)
     return x + "\n"
 
+@app.route('/stats')
+def stats():
+    return jsonify(batcher.stats())
+
 if __name__ == "__main__":
-    app.run(host=('0.0.0.0'))
\ No newline at end of file
+    app.run(host=('0.0.0.0'), threaded=True)
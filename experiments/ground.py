@@ -0,0 +1,25 @@
+"""
+ground.py
+
+Grounds natural language commands from the command line (or stdin, one per line) with a model
+exported via export_numpy, using the pure-NumPy backend, so TensorFlow is never imported.
+"""
+from argparse import ArgumentParser
+from models.numpy_backend import NumpyModel
+import sys
+
+
+def main():
+    parser = ArgumentParser(description="Ground commands with a NumPy-exported model.")
+    parser.add_argument("model", help="Path to a model directory written by export_numpy.")
+    parser.add_argument("commands", nargs="*", help="Commands to ground (read from stdin if omitted).")
+    args = parser.parse_args()
+
+    model = NumpyModel(args.model)
+    commands = args.commands or [line.strip() for line in sys.stdin if line.strip()]
+    for rf in model.score_nl_batch(commands):
+        print rf
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+bundle.py
+
+Self-contained model bundles. A bundle is a directory holding a checkpoint, plus the vocabularies,
+program/argument maps, maximum sentence length, and hyperparameters needed to rebuild the graph
+(each model lists these in BUNDLE_ATTRS), so a model can be restored for serving without reading
+or parsing the training corpora.
+"""
+import os
+import pickle
+
+STATE_FILE, CHECKPOINT = "bundle.pik", "model.ckpt"
+
+
+class Blank():
+    """
+    Empty instance, re-classed as a model to bypass its corpus-parsing constructor (the model
+    classes are old-style, so there is no __new__ to call).
+    """
+    pass
+
+
+def save_state(model, path):
+    """
+    Save a model's graph-building state (its BUNDLE_ATTRS) to the directory at path.
+    """
+    if not os.path.exists(path):
+        os.makedirs(path)
+
+    state = {attr: getattr(model, attr) for attr in model.BUNDLE_ATTRS}
+    with open(os.path.join(path, STATE_FILE), 'wb') as f:
+        pickle.dump({'model': model.__class__.__name__, 'state': state}, f, pickle.HIGHEST_PROTOCOL)
+
+
+def load_state(path):
+    """
+    Load the graph-building state saved by save_state.
+
+    :return: Tuple of model class name, dictionary of saved attributes.
+    """
+    with open(os.path.join(path, STATE_FILE), 'rb') as f:
+        bundle = pickle.load(f)
+    return bundle['model'], bundle['state']
+
+
+def save_bundle(model, path):
+    """
+    Save a trained model's checkpoint and graph-building state to the bundle directory at path.
+    """
+    save_state(model, path)
+    model.saver.save(model.session, os.path.join(path, CHECKPOINT))
+
+
+def load_bundle(model_cls, path):
+    """
+    Instantiate a model of class model_cls from the bundle directory at path, restoring its weights.
+    """
+    model_name, state = load_state(path)
+    assert(model_name == model_cls.__name__)
+
+    # Bypass the corpus-parsing constructor, and rebuild the graph directly from the saved state
+    model = Blank()
+    model.__class__ = model_cls
+    model.__dict__.update(state)
+
+    # All variables are restored from the checkpoint, so no initializer is needed
+    model.init = None
+    model.build_graph(restore=os.path.join(path, CHECKPOINT))
+    return model
@@ -0,0 +1,81 @@
+"""
+evaluate.py
+
+Shared evaluation engine for the grounding models. Runs each test split through a model's
+score_batch in large batches, and computes program, argument, and joint accuracy with NumPy
+reductions (instead of scoring one test row per session call).
+"""
+import numpy as np
+
+EVAL_BATCH_SIZE = 1024
+
+
+def predict(score_batch, X, X_len, batch_size=EVAL_BATCH_SIZE, num_outputs=2):
+    """
+    Run a model's score_batch function over a full test split, in chunks of batch_size.
+
+    :param score_batch: Function mapping (X, X_len) to a tuple of per-example prediction arrays
+    :param X: Vectorized sentences, shape [N, max_len]
+    :param X_len: Sentence lengths, shape [N]
+    :param num_outputs: Number of score_batch outputs (only used for an empty split)
+    :return: Tuple of concatenated prediction arrays (one per score_batch output), each shape [N]
+    """
+    if len(X) == 0:
+        return tuple(np.zeros(0, dtype=np.int64) for _ in range(num_outputs))
+    outputs = [score_batch(X[i:i + batch_size], X_len[i:i + batch_size])
+               for i in range(0, len(X), batch_size)]
+    return tuple(np.concatenate(out) for out in zip(*outputs))
+
+
+def segment_index(segments_per_sentence):
+    """
+    Build a segment-to-sentence index for segmented means data.
+
+    :param segments_per_sentence: Number of segments in each sentence, in corpus order
+    :return: Array where entry i is the sentence id of segment i.
+    """
+    return np.repeat(np.arange(len(segments_per_sentence)), segments_per_sentence)
+
+
+def sentence_accuracy(correct, sentence_idx):
+    """
+    Compute per-sentence accuracy, where a sentence is correct iff all its segments are correct.
+
+    :param correct: Boolean array of per-segment correctness, shape [num_segments]
+    :param sentence_idx: Segment-to-sentence index, as built by segment_index
+    :return: Fraction of sentences with every segment correct.
+    """
+    num_wrong = np.bincount(sentence_idx, weights=~correct, minlength=sentence_idx.max() + 1 if len(sentence_idx) else 0)
+    return np.mean(num_wrong == 0)
+
+
+def eval_programs(score_batch, X, X_len, true_prog, true_arg, sentence_idx=None,
+                  batch_size=EVAL_BATCH_SIZE):
+    """
+    Evaluate a (program, argument) model (NPI, I-DRAGGN) on a full test split.
+
+    :param true_prog: True program ids, shape [N]
+    :param true_arg: True argument ids, shape [N]
+    :param sentence_idx: Optional segment-to-sentence index, to also report sentence accuracy
+    :return: Dictionary with program, argument, and overall (joint) accuracy.
+    """
+    pred_prog, pred_arg = predict(score_batch, X, X_len, batch_size)
+    prog_correct, arg_correct = pred_prog == true_prog, pred_arg == true_arg
+    correct = prog_correct & arg_correct
+
+    metrics = {'program': np.mean(prog_correct), 'argument': np.mean(arg_correct),
+               'overall': np.mean(correct)}
+    if sentence_idx is not None:
+        metrics['sentence'] = sentence_accuracy(correct, sentence_idx)
+    return metrics
+
+
+def eval_labels(score_batch, X, X_len, Y, batch_size=EVAL_BATCH_SIZE):
+    """
+    Evaluate a single-label model (Single-RNN, Lifted-RNN) on a full test split.
+
+    :param Y: True label ids, shape [N]
+    :return: Accuracy over the split.
+    """
+    pred, _ = predict(score_batch, X, X_len, batch_size)
+    return np.mean(pred == Y)
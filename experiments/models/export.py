@@ -0,0 +1,144 @@
+"""
+export.py
+
+Frozen, pruned inference graphs for the program/argument models (NPI, I-DRAGGN). Rather than
+freezing the full training graph, the trained weights are collected into a small layout spec
+(embeddings with the PAD mask folded in, GRU encoders, dense heads) and an inference-only graph
+is rebuilt from them: no dropout (keep_prob folded to 1.0), no termination head, no optimizer
+slots or train ops. FrozenModel is the slim runner that serves the exported graph.
+"""
+import numpy as np
+import os
+import tensorflow as tf
+
+from . import bundle, rf_utils
+
+FROZEN_GRAPH = "frozen.pb"
+GRU_WEIGHTS = ['gates/kernel', 'gates/bias', 'candidate/kernel', 'candidate/bias']
+
+
+def collect_weights(session, encoders, heads):
+    """
+    Evaluate the weights needed for inference, and describe how they fit together.
+
+    :param encoders: Dictionary mapping encoder name to (embedding tensor, list of GRU variables)
+    :param heads: Dictionary mapping head name to (encoder name, list of (W, b, activation) layers)
+    :return: Tuple of spec (layout, with activations), dictionary of named weight arrays.
+    """
+    tensors, spec = {}, {'encoders': sorted(encoders), 'heads': {}}
+    for name, (embedding, gru_vars) in encoders.items():
+        tensors[name + '/embedding'] = embedding
+        for key, var in zip(GRU_WEIGHTS, gru_vars):
+            tensors[name + '/' + key] = var
+
+    for name, (encoder, layers) in heads.items():
+        spec['heads'][name] = {'encoder': encoder, 'activations': [act for _, _, act in layers]}
+        for i, (W, b, _) in enumerate(layers):
+            tensors['%s/%d/W' % (name, i)], tensors['%s/%d/b' % (name, i)] = W, b
+
+    keys = sorted(tensors)
+    values = session.run([tensors[k] for k in keys])
+    return spec, dict(zip(keys, values))
+
+
+def build_inference_graph(spec, weights, max_len):
+    """
+    Build an inference-only graph in the current default graph, with GRU variables initialized from
+    the given weights (dense layers and embeddings are constants).
+
+    :return: Tuple of input placeholders (X, X_len), dictionary mapping head name to logits, and
+             list of (variable, value) pairs to load before freezing.
+    """
+    X = tf.placeholder(tf.int32, shape=[None, max_len], name='NL_Directive')
+    X_len = tf.placeholder(tf.int32, shape=[None], name="NL_Length")
+
+    states, assignments = {}, []
+    for name in spec['encoders']:
+        embedding = tf.nn.embedding_lookup(tf.constant(weights[name + '/embedding']), X)
+        with tf.variable_scope(name):
+            cell = tf.contrib.rnn.GRUCell(weights[name + '/candidate/bias'].shape[0])
+            _, states[name] = tf.nn.dynamic_rnn(cell, embedding, sequence_length=X_len, dtype=tf.float32)
+            gru_vars = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope=name + '/')
+        assignments += [(var, weights[name + '/' + key]) for var, key in zip(gru_vars, GRU_WEIGHTS)]
+
+    logits = {}
+    for name, head in spec['heads'].items():
+        hidden, activations = states[head['encoder']], head['activations']
+        for i, activation in enumerate(activations):
+            W, b = weights['%s/%d/W' % (name, i)], weights['%s/%d/b' % (name, i)]
+            layer_name = name + '_logits' if i == len(activations) - 1 else None
+            hidden = tf.nn.bias_add(tf.matmul(hidden, tf.constant(W)), tf.constant(b), name=layer_name)
+            if activation == 'relu':
+                hidden = tf.nn.relu(hidden)
+            elif activation == 'elu':
+                hidden = tf.nn.elu(hidden)
+        logits[name] = hidden
+    return (X, X_len), logits, assignments
+
+
+def export_frozen(model, path):
+    """
+    Export a trained NPI or I-DRAGGN as a frozen inference graph (plus the vocabulary and
+    program/argument maps) to the directory at path, for serving with FrozenModel.
+    """
+    spec, weights = model.inference_weights()
+    graph = tf.Graph()
+    with graph.as_default():
+        _, logits, assignments = build_inference_graph(spec, weights, model.max_len)
+        with tf.Session(graph=graph) as session:
+            for var, value in assignments:
+                var.load(value, session)
+            frozen = tf.graph_util.convert_variables_to_constants(
+                session, graph.as_graph_def(), [t.op.name for t in logits.values()])
+
+    bundle.save_state(model, path)
+    with open(os.path.join(path, FROZEN_GRAPH), 'wb') as f:
+        f.write(frozen.SerializeToString())
+
+
+class FrozenModel():
+    def __init__(self, path):
+        """
+        Load a frozen NPI or I-DRAGGN inference graph exported by export_frozen.
+        """
+        _, state = bundle.load_state(path)
+        self.word2id, self.progs, self.args, self.max_len = state['word2id'], state['progs'], state['args'], state['max_len']
+        self.id2prog = {i:prog for prog, i in self.progs.iteritems()}
+        self.id2arg = {i:arg for arg, i in self.args.iteritems()}
+        self.arg_mask = rf_utils.arg_mask(self.id2prog, self.id2arg)
+
+        graph_def = tf.GraphDef()
+        with open(os.path.join(path, FROZEN_GRAPH), 'rb') as f:
+            graph_def.ParseFromString(f.read())
+
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            tf.import_graph_def(graph_def, name='')
+        self.session = tf.Session(graph=self.graph)
+        self.X, self.X_len = self.graph.get_tensor_by_name('NL_Directive:0'), self.graph.get_tensor_by_name('NL_Length:0')
+        self.program_logits = self.graph.get_tensor_by_name('program_logits:0')
+        self.argument_logits = self.graph.get_tensor_by_name('argument_logits:0')
+
+    def score_batch(self, X, X_len):
+        """
+        Given a batch of vectorized natural language commands, return the predicted program and
+        argument for each, using a single forward pass.
+        """
+        prog, a1 = self.session.run([self.program_logits, self.argument_logits],
+                                    feed_dict={self.X: X, self.X_len: X_len})
+        return rf_utils.masked_argmax(prog, a1, self.arg_mask)
+
+    def score_nl_batch(self, nl_commands):
+        """
+        Given a list of natural language strings, return a list of strings representing the
+        lifted RFs, using a single forward pass.
+        """
+        X, X_len = rf_utils.vectorize(nl_commands, self.word2id, self.max_len, self.word2id['UNK'])
+        pred_progs, pred_a1s = self.score_batch(X, X_len)
+        return [rf_utils.rf_string(self.id2prog[p], self.id2arg[a]) for p, a in zip(pred_progs, pred_a1s)]
+
+    def score_nl(self, nl_command):
+        """
+        Given a natural language string, return a string representing the lifted RF
+        """
+        return self.score_nl_batch([nl_command])[0]
@@ -0,0 +1,81 @@
+"""
+input_pipeline.py
+
+In-graph input pipeline for the training loops. The vectorized training set is loaded into the
+graph once, and shuffled, length-bucketed (as in batching), and prefetched by tf.data, so each
+training step is a single session.run of the train op, with no per-step host copies through
+feed_dict. The model placeholders default to the pipeline's batches, so feeding them (e.g. for
+evaluation) still works.
+"""
+import numpy as np
+import tensorflow as tf
+
+from .batching import BATCH_SEED, BUCKET_POOL
+
+PREFETCH = 2
+
+
+def placeholder(dtype, shape, name, default=None):
+    """
+    Create an input placeholder, that (if given a default tensor) reads from it unless fed.
+    """
+    if default is None:
+        return tf.placeholder(dtype, shape=shape, name=name)
+    return tf.placeholder_with_default(tf.cast(default, dtype), shape=shape, name=name)
+
+
+def bucket_pool(batch_size, X, X_len, *labels):
+    """
+    Split a pool of examples into batches of similar length (as in batching.bucket_batches): sort
+    the pool by length, cut it into consecutive batches, and trim each to its longest sentence.
+
+    :return: Dataset of the pool's batches.
+    """
+    order = tf.nn.top_k(-tf.cast(X_len, tf.int32), k=tf.shape(X_len)[0]).indices
+    X, X_len, labels = tf.gather(X, order), tf.gather(X_len, order), [tf.gather(y, order) for y in labels]
+
+    def batch(i):
+        start = tf.cast(i, tf.int32) * batch_size
+        batch_len = X_len[start:start + batch_size]
+        width = tf.maximum(tf.reduce_max(tf.cast(batch_len, tf.int32)), 1)
+        return tuple([X[start:start + batch_size, :width], batch_len] + [y[start:start + batch_size] for y in labels])
+
+    num_batches = (tf.shape(X_len)[0] + batch_size - 1) // batch_size
+    return tf.data.Dataset.range(tf.cast(num_batches, tf.int64)).map(batch)
+
+
+class InputPipeline():
+    def __init__(self, X, X_len, labels, batch_size, seed=BATCH_SEED, pool_batches=BUCKET_POOL, prefetch=PREFETCH):
+        """
+        Build the pipeline over a vectorized training set, in the current graph.
+
+        :param X: Sentence matrix, shape [N, max_len] (loaded into the graph in its own dtype, as are
+                  the lengths and labels)
+        :param X_len: Sentence lengths, shape [N]
+        :param labels: List of label arrays, each of shape [N]
+        :param seed: Seed of the per-epoch shuffling seeds (reproducible, different every epoch)
+        :param pool_batches: Number of batches per length-sorted pool (see batching.bucket_batches)
+        """
+        self.rng = np.random.RandomState(seed)
+        self.epoch_seed = tf.placeholder(tf.int64, shape=[], name='Epoch_Seed')
+
+        dataset = tf.data.Dataset.from_tensor_slices(tuple([X, X_len] + list(labels)))
+        dataset = dataset.shuffle(len(X_len), seed=self.epoch_seed).batch(batch_size * pool_batches)
+        dataset = dataset.flat_map(lambda *pool: bucket_pool(batch_size, *pool))
+        dataset = dataset.shuffle(pool_batches, seed=self.epoch_seed).prefetch(prefetch)
+
+        self.iterator = dataset.make_initializable_iterator()
+        self.next_batch = self.iterator.get_next()
+
+    def run_epoch(self, session, fetches, feed_dict=None):
+        """
+        Run the fetches once per batch, over one (freshly shuffled) epoch of the training set.
+
+        :return: Generator over the results of each step.
+        """
+        session.run(self.iterator.initializer, feed_dict={self.epoch_seed: self.rng.randint(2 ** 31)})
+        while True:
+            try:
+                yield session.run(fetches, feed_dict=feed_dict)
+            except tf.errors.OutOfRangeError:
+                return
@@ -8,22 +8,149 @@ singular labels.
 import numpy as np
 import tensorflow as tf
 
+from . import batching, bundle, corpus_cache, embedding, evaluate, export, input_pipeline, numpy_backend, output_layers
+
 PAD, PAD_ID = "<<PAD>>", 0
 UNK, UNK_ID = "<<UNK>>", 1
 
+
+def corpus_dtypes(vocab_size, max_len, num_commands):
+    """
+    Return the dtypes of the vectorized corpus (see corpus_cache.index_dtype): of its token ids,
+    sentence lengths, and reward function labels.
+    """
+    return (corpus_cache.index_dtype(vocab_size), corpus_cache.index_dtype(max_len + 1),
+            corpus_cache.index_dtype(num_commands))
+
+
 class LiftedRNN():
+    CORPUS_ATTRS = ['word2id', 'id2word', 'commands', 'lengths', 'max_len', 'train_x', 'train_y', 'test_means_x', 'test_means_len',
+                    'test_means_y', 'test_ends_x', 'test_ends_len', 'test_ends_y']
+    BUNDLE_ATTRS = ['word2id', 'commands', 'max_len', 'embedding_sz', 'rnn_sz', 'h1_sz', 'h2_sz', 'bsz', 'epochs',
+                    'output', 'num_sampled', 'beam']
+
     def __init__(self, means_train_path, ends_train_path, means_test_path, ends_test_path,
-                 embedding_size=30, rnn_size=50, h1_size=60, h2_size=50, epochs=10, batch_size=32):
+                 embedding_size=30, rnn_size=50, h1_size=60, h2_size=50, epochs=10, batch_size=32, restore=False, pipeline=False, output='softmax',
+                 num_sampled=64, beam=4, valid_fraction=batching.VALID_FRACTION):
         """
         Instantiate a SingleRNN Model, with the necessary parameters.
 
         :param train_en: Path to training natural language directives.
         :param train_rf: Path to training reward function strings.
+        :param output: Output layer over the reward functions, one of output_layers.OUTPUTS (a full
+                       softmax, a softmax trained on num_sampled sampled RFs, or a predicate/binding
+                       hierarchical softmax, with top-k predictions searched over beam predicates)
+        :param valid_fraction: Fraction of the training set held out as the validation split (monitored
+                               for early stopping and model selection, see eval_valid)
         """
         self.embedding_sz, self.rnn_sz, self.h1_sz, self.h2_sz = embedding_size, rnn_size, h1_size, h2_size
         self.init, self.bsz, self.epochs = tf.truncated_normal_initializer(stddev=0.5), batch_size, epochs
+        self.output, self.num_sampled, self.beam = output, num_sampled, beam
+
+        # Parse Inputs (loaded from the corpus cache, if these corpora have been parsed before)
+        sources = [means_train_path + ".en", means_train_path + "_actions.ml",
+                   ends_train_path + ".en", ends_train_path + "_npi_lifted.ml",
+                   means_test_path + ".en", means_test_path + "_actions.ml",
+                   ends_test_path + ".en", ends_test_path + "_npi_lifted.ml"]
+        parse = lambda: self.parse(means_train_path, ends_train_path, means_test_path, ends_test_path)
+        self.__dict__.update(corpus_cache.cached(self.__class__.__name__, sources, [__file__],
+                                                  lambda: corpus_cache.compile_into(self, parse)))
+
+        # Hold Out a Validation Split of the Training Set
+        (self.train_x, self.lengths, self.train_y), (self.valid_x, self.valid_len, self.valid_y) = batching.hold_out(
+            [self.train_x, self.lengths, self.train_y], valid_fraction)
+
+        # Length-bucketed, epoch-shuffled training batches
+        self.train_batches = batching.MiniBatches(self.train_x, self.lengths, self.train_y, self.bsz)
+
+        # Build Graph
+        self.build_graph(restore, pipeline)
+
+    def build_graph(self, restore=False, pipeline=False):
+        """
+        Build the model graph from the vocabulary and reward function set, then either restore
+        weights from the given checkpoint, or initialize them. With pipeline, training batches are read
+        from an in-graph input pipeline (see train_steps), rather than fed.
+        """
         self.session = tf.Session()
 
+        # Setup Input Pipeline => Placeholders read its batches unless fed
+        if pipeline:
+            self.pipeline = input_pipeline.InputPipeline(self.train_x, np.array(self.lengths), [self.train_y], self.bsz)
+            X, X_len, Y = self.pipeline.next_batch
+        else:
+            self.pipeline, X, X_len, Y = None, None, None, None
+
+        # Setup Placeholders (in the corpus dtypes, so batches are fed as stored)
+        id_dtype, len_dtype, label_dtype = map(tf.as_dtype, corpus_dtypes(len(self.word2id), self.max_len, len(self.commands)))
+        self.X = input_pipeline.placeholder(id_dtype, [None, None], 'NL_Directive', X)
+        self.Y = input_pipeline.placeholder(label_dtype, [None], 'Lifted_RF', Y)
+        self.X_len = input_pipeline.placeholder(len_dtype, [None], 'NL_Length', X_len)
+        self.keep_prob = tf.placeholder(tf.float32, name='Dropout_Prob')
+
+        # Build Inference Graph
+        hidden = self.inference()
+
+        # Build Output Layer, Loss Computation
+        self.output_layer = output_layers.build(self.output, hidden, self.h2_sz, self.commands, self.init,
+                                                self.num_sampled, self.beam)
+        labels = tf.cast(self.Y, tf.int64)
+        self.loss = self.output_layer.loss(labels)
+
+        # Top-K Predictions (Top-1 Unless K is Fed)
+        self.k = tf.placeholder_with_default(1, [], name='Top_K')
+        self.top_ids, self.top_probs = self.output_layer.top_k(self.k)
+
+        # Create Training Accuracy Operation (Over the Sampled RFs Only, for a Sampled Output)
+        self.accuracy = self.output_layer.train_accuracy(labels)
+
+        # Build Training Operation (Sampled, Hierarchical Outputs Have Sparse Gradients, Applied Lazily)
+        optimizer = tf.train.AdamOptimizer() if self.output == 'softmax' else embedding.optimizer()
+        self.train_op = optimizer.minimize(self.loss)
+
+        # Build Saver
+        self.saver = tf.train.Saver()
+
+        if restore:
+            self.saver.restore(self.session, restore)
+        else:
+            # Initialize all variables
+            self.session.run(tf.global_variables_initializer())
+
+    def save_bundle(self, path):
+        """
+        Save a self-contained bundle (checkpoint, vocabulary, reward function set, hyperparameters)
+        that can be restored with load_bundle, without the training corpora.
+        """
+        bundle.save_bundle(self, path)
+
+    def inference_weights(self):
+        """
+        Collect the trained weights used at inference time, along with a spec describing how they
+        fit together.
+
+        :return: Tuple of spec, dictionary of named weight arrays (see export.collect_weights).
+        """
+        if self.output not in output_layers.EXPORTABLE:
+            raise ValueError("Only the %s output layers can be exported (not '%s')" % (", ".join(output_layers.EXPORTABLE), self.output))
+        return export.collect_weights(self.session, {'encoder': (self.E, self.encoder_vars)},
+                                      {'output': ('encoder', self.hidden_layers + self.output_layer.layers)})
+
+    def export_numpy(self, path):
+        """
+        Export the inference weights (plus the state needed to vectorize commands), that can be
+        run without TensorFlow with numpy_backend.NumpyModel.
+        """
+        spec, weights = self.inference_weights()
+        numpy_backend.save_weights(self, spec, weights, path)
+
+    def parse(self, means_train_path, ends_train_path, means_test_path, ends_test_path):
+        """
+        Read the parallel corpora, build the vocabulary and reward function set, and vectorize the
+        training and test splits.
+
+        :return: Dictionary of the values listed in CORPUS_ATTRS, for the corpus cache.
+        """
         # Read Data + Assemble Commands, Parallel Corpus
         with open(means_train_path + ".en", 'r') as f:
             means_sentences, means_segments = [x.strip().split('|') for x in f.readlines()], []
@@ -93,34 +220,13 @@ class LiftedRNN():
         self.word2id, self.id2word = self.build_vocabulary()
 
         # Vectorize Parallel Corpus
-        self.lengths = [len(n) for n, _ in self.pc]
+        self.max_len = max(len(n) for n, _ in self.pc)
+        self.lengths = np.array([len(n) for n, _ in self.pc], dtype=corpus_dtypes(0, self.max_len, 0)[1])
         self.train_x, self.train_y = self.vectorize()
+        self.test_means_x, self.test_means_len, self.test_means_y = self.vectorize_split(self.test_means_pc)
+        self.test_ends_x, self.test_ends_len, self.test_ends_y = self.vectorize_split(self.test_ends_pc)
 
-         # Setup Placeholders
-        self.X = tf.placeholder(tf.int64, shape=[None, self.train_x.shape[-1]], name='NL_Directive')
-        self.Y = tf.placeholder(tf.int64, shape=[None], name='Lifted_RF')
-        self.X_len = tf.placeholder(tf.int64, shape=[None], name='NL_Length')
-        self.keep_prob = tf.placeholder(tf.float32, name='Dropout_Prob')
-
-        # Build Inference Graph
-        self.logits = self.inference()
-
-        # Build Loss Computation
-        self.loss = tf.losses.sparse_softmax_cross_entropy(self.Y, self.logits)
-        self.probs = tf.nn.softmax(self.logits)
-
-        # Create Accuracy Operation
-        correct_prediction = tf.equal(tf.argmax(self.logits, 1), self.Y)
-        self.accuracy = tf.reduce_mean(tf.cast(correct_prediction, tf.float32), name="Accuracy")
-
-        # Build Training Operation
-        self.train_op = tf.train.AdamOptimizer().minimize(self.loss)
-
-        # Build Saver
-        self.saver = tf.train.Saver()
-
-        # Initialize all variables
-        self.session.run(tf.global_variables_initializer())
+        return {attr: getattr(self, attr) for attr in self.CORPUS_ATTRS}
 
     def build_vocabulary(self):
         """
@@ -141,29 +247,47 @@ class LiftedRNN():
         """
         Step through the Parallel Corpus, and convert each sequence to vectors.
         """
+        id_dtype, _, label_dtype = corpus_dtypes(len(self.word2id), self.max_len, len(self.commands))
         x, y = [], []
         for nl, ml in self.pc:
-            nvec, mlab = np.zeros((max(self.lengths)), dtype=np.int32), ml
+            nvec, mlab = np.zeros((self.max_len), dtype=id_dtype), ml
             for i in range(len(nl)):
                 nvec[i] = self.word2id.get(nl[i], UNK_ID)
             x.append(nvec)
             y.append(mlab)
-        return np.array(x, dtype=np.int32), np.array(y, dtype=np.int32)
+        return np.array(x, dtype=id_dtype), np.array(y, dtype=label_dtype)
+
+    def vectorize_split(self, pc):
+        """
+        Vectorize a (sentence, label) split, truncating sentences to the training width.
+
+        :return: Tuple of sentence matrix, sentence lengths, labels.
+        """
+        width = self.max_len
+        id_dtype, len_dtype, label_dtype = corpus_dtypes(len(self.word2id), self.max_len, len(self.commands))
+        x, lengths = np.zeros((len(pc), width), dtype=id_dtype), np.zeros((len(pc)), dtype=len_dtype)
+        for i, (nl, _) in enumerate(pc):
+            lengths[i] = min(len(nl), width)
+            for j in range(lengths[i]):
+                x[i][j] = self.word2id.get(nl[j], UNK_ID)
+        return x, lengths, np.array([ml for _, ml in pc], dtype=label_dtype)
 
     def inference(self):
         """
-        Compile the LSTM Classifier, taking the input placeholder, generating the softmax
-        distribution over all possible reward functions.
+        Compile the LSTM Classifier, taking the input placeholder, generating the top hidden layer
+        (that the output layer over all possible reward functions is built on).
         """
         # Embedding
         E = tf.get_variable("Embedding", shape=[len(self.word2id), self.embedding_sz],
                             dtype=tf.float32, initializer=self.init)
-        embedding = tf.nn.embedding_lookup(E, self.X)               # Shape [None, x_len, embed_sz]
+        self.E = E
+        embedding = tf.nn.embedding_lookup(E, tf.cast(self.X, tf.int32))             # Shape [None, x_len, embed_sz]
         embedding = tf.nn.dropout(embedding, self.keep_prob)
 
         # LSTM
         cell = tf.contrib.rnn.GRUCell(self.rnn_sz)
         _, state = tf.nn.dynamic_rnn(cell, embedding, sequence_length=self.X_len, dtype=tf.float32)
+        self.encoder_vars = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope='rnn/')
         h_state = state                                             # Shape [None, lstm_sz]
 
         # ReLU Layer 1
@@ -180,71 +304,99 @@ class LiftedRNN():
                                initializer=self.init)
         hidden = tf.nn.relu(tf.matmul(h1, H2_W) + H2_B)
         hidden = tf.nn.dropout(hidden, self.keep_prob)
+        self.hidden_layers = [(H1_W, H1_B, 'relu'), (H2_W, H2_B, 'relu')]
+        return hidden
 
-        # Output Layer
-        O_W = tf.get_variable("Output_W", shape=[self.h2_sz, len(self.commands)],
-                              dtype=tf.float32, initializer=self.init)
-        O_B = tf.get_variable("Output_B", shape=[len(self.commands)], dtype=tf.float32,
-                              initializer=self.init)
-        output = tf.matmul(hidden, O_W) + O_B
-        return output
+    def train_steps(self, fetches):
+        """
+        Run the fetches (including the train op) once per batch, over one epoch of the training set,
+        reading batches from the input pipeline if there is one, and feeding them otherwise.
+
+        :return: Generator over the results of each step.
+        """
+        if self.pipeline is not None:
+            for result in self.pipeline.run_epoch(self.session, fetches, {self.keep_prob: 0.5}):
+                yield result
+            return
+
+        for X, X_len, Y in self.train_batches.epoch():
+            yield self.session.run(fetches, feed_dict={self.X: X, self.X_len: X_len, self.keep_prob: 0.5, self.Y: Y})
 
     def fit(self):
         """
         Train the model, with the specified batch size and number of epochs.
         """
         # Run through epochs
-        chunk_size = (len(self.train_x) / self.bsz) * self.bsz
         for e in range(self.epochs):
             curr_loss, curr_acc, batches = 0.0, 0.0, 0.0
-            for start, end in zip(range(0, len(self.train_x[:chunk_size]) - self.bsz, self.bsz),
-                                  range(self.bsz, len(self.train_x[:chunk_size]), self.bsz)):
-                loss, acc, _ = self.session.run([self.loss, self.accuracy, self.train_op],
-                                                feed_dict={self.X: self.train_x[start:end],
-                                                           self.X_len: self.lengths[start:end],
-                                                           self.keep_prob: 0.5,
-                                                           self.Y: self.train_y[start:end]})
+            for loss, acc, _ in self.train_steps([self.loss, self.accuracy, self.train_op]):
                 curr_loss, curr_acc, batches = curr_loss + loss, curr_acc + acc, batches + 1
             print 'Epoch %d\tAverage Loss: %.3f\tAverage Accuracy: %.3f' % (e, curr_loss / batches, curr_acc / batches)
 
-    def eval_means(self):
+    def eval_valid(self, score_batch=None):
         """
-        Perform an evaluation epoch, running through the test means data, returning accuracy.
+        Perform an evaluation epoch, running through the validation split, returning accuracy.
+
+        :param score_batch: Scoring function to evaluate (default: the model's own score_batch)
         """
-        num_correct = 0.0
-        for (nl_command, rf) in self.test_means_pc:
-            pred_rf, _ = self.score(nl_command)
-            if pred_rf == rf:
-                num_correct += 1
+        acc = evaluate.eval_labels(score_batch or self.score_batch, self.valid_x, self.valid_len, self.valid_y)
+        print "Validation Accuracy: %.3f" % acc
+        return acc
+
+    def eval_means(self, score_batch=None):
+        """
+        Perform an evaluation epoch, running through the test means data, returning accuracy.
 
-        acc = (num_correct / len(self.test_means_pc))
+        :param score_batch: Scoring function to evaluate (default: the model's own score_batch)
+        """
+        acc = evaluate.eval_labels(score_batch or self.score_batch, self.test_means_x, self.test_means_len, self.test_means_y)
         print "Means Test Accuracy: %.3f" % acc
         return acc
     
-    def eval_ends(self):
+    def eval_ends(self, score_batch=None):
         """
         Perform an evaluation epoch, running through the test ends data, returning accuracy.
-        """
-        num_correct = 0.0
-        for (nl_command, rf) in self.test_ends_pc:
-            pred_rf, _ = self.score(nl_command)
-            if pred_rf == rf:
-                num_correct += 1
 
-        acc = (num_correct / len(self.test_ends_pc))
+        :param score_batch: Scoring function to evaluate (default: the model's own score_batch)
+        """
+        acc = evaluate.eval_labels(score_batch or self.score_batch, self.test_ends_x, self.test_ends_len, self.test_ends_y)
         print "Ends Test Accuracy: %.3f" % acc
         return acc
 
+    def score_batch(self, X, X_len):
+        """
+        Given a batch of vectorized natural language commands, return the predicted reward function
+        and its probability for each, using a single forward pass.
+
+        :return: Tuple of predicted reward function ids, probabilities (each of shape [bsz]).
+        """
+        pred_command, prob = self.top_k(X, X_len, 1)
+        return pred_command[:, 0], prob[:, 0]
+
+    def top_k(self, X, X_len, k):
+        """
+        Given a batch of vectorized natural language commands, return the k most likely reward
+        functions for each, with their probabilities.
+
+        :return: Tuple of reward function ids, probabilities (each of shape [bsz, k], most likely first;
+                 fewer than k columns if the output layer has fewer candidates, see output_layers).
+        """
+        return self.session.run([self.top_ids, self.top_probs], feed_dict={self.X: X, self.X_len: X_len,
+                                                                           self.keep_prob: 1.0, self.k: k})
+
     def score(self, nl_command):
         """
         Given a natural language command, return predicted output and score.
 
         :return: List of tokens representing predicted command, and score.
         """
-        seq, seq_len = np.zeros((max(self.lengths))), len(nl_command)
-        for i in range(min(len(nl_command), len(seq))):
-            seq[i] = self.word2id.get(nl_command[i], UNK_ID)
-        y = self.session.run(self.probs, feed_dict={self.X: [seq], self.X_len: [seq_len],
-                                                    self.keep_prob: 1.0})
-        [pred_command] = np.argmax(y, axis=1)
-        return pred_command, y[0][pred_command]
+        seq, seq_len, _ = self.vectorize_split([(nl_command, 0)])
+        pred_command, prob = self.score_batch(seq, seq_len)
+        return pred_command[0], prob[0]
+
+
+def load_bundle(path):
+    """
+    Restore a LiftedRNN from the bundle at path, without reading or parsing the training corpora.
+    """
+    return bundle.load_bundle(LiftedRNN, path)
@@ -0,0 +1,140 @@
+"""
+training.py
+
+Training controller for the grounding models. Rather than a fixed number of fit/evaluate iterations,
+train runs fit until the monitored evaluation score stops improving: it evaluates every eval_every
+iterations, stops once the score hasn't improved for patience evaluations, and keeps the weights of
+the best evaluation (saved to a checkpoint, and restored at the end). The monitored evaluation is on
+the validation split held out of the training set (eval_valid), so the test splits are only scored
+once, on the selected weights (see test). Works with any model with fit, session, and saver (all the
+model classes). With a BackgroundEvaluator (see background_eval),
+evaluations run in a separate process, on snapshots of the weights, while training continues.
+"""
+import os
+import shutil
+import tempfile
+
+
+def accuracy(result):
+    """
+    Return the overall accuracy in an eval result (an accuracy, or dictionary of accuracies).
+    """
+    return float(result['overall']) if isinstance(result, dict) else float(result)
+
+
+def mean_accuracy(results):
+    """
+    Default score: the mean overall accuracy over a tuple of eval results (e.g. means and ends).
+    """
+    results = results if isinstance(results, (list, tuple)) else [results]
+    return sum(accuracy(r) for r in results) / len(results)
+
+
+class EarlyStopping():
+    def __init__(self, patience=None, min_delta=0.0):
+        """
+        Track the best score seen (and the results it was computed from), and whether to stop: after
+        patience consecutive evaluations that improve on the best by no more than min_delta (never,
+        if patience is None or 0).
+        """
+        self.patience, self.min_delta = patience, min_delta
+        self.best, self.best_iteration, self.best_results, self.bad_evals = None, None, None, 0
+
+    def update(self, iteration, score, results=None):
+        """
+        Record the score of an evaluation.
+
+        :return: True if the score is a new best.
+        """
+        if self.best is None or score > self.best + self.min_delta:
+            self.best, self.best_iteration, self.best_results, self.bad_evals = score, iteration, results, 0
+            return True
+        self.bad_evals += 1
+        return False
+
+    @property
+    def stop(self):
+        return bool(self.patience) and self.bad_evals >= self.patience
+
+
+def train(model, evaluate, iterations=25, eval_every=1, patience=None, min_delta=0.0, checkpoint=None,
+          score=mean_accuracy, evaluator=None, test=None):
+    """
+    Train a model with fit, evaluating and early stopping on the results of evaluate.
+
+    :param model: Model to train (calls model.fit once per iteration)
+    :param evaluate: Function running the model's monitored evaluation, returning its results (e.g.
+                     eval_valid, on the validation split)
+    :param iterations: Maximum number of iterations (fit calls)
+    :param eval_every: Number of iterations between evaluations (the last iteration is always evaluated)
+    :param patience: Number of evaluations without improvement before stopping (None or 0: never stop early)
+    :param checkpoint: Path to save the best weights to (with model.saver), restored once training stops
+                       (default: a temporary checkpoint, deleted once the best weights are restored)
+    :param score: Function mapping evaluate's results to the score to maximize
+    :param evaluator: BackgroundEvaluator to run the evaluations in (instead of calling evaluate
+                      between iterations); training only waits for them once it stops, so early
+                      stopping lags behind by the evaluations still running
+    :param test: Function running the model's test evaluations (e.g. the tuple of eval_means,
+                 eval_ends results), called once training stops, on the best weights
+    :return: Tuple of the results of the best evaluation (or of test, if given), and the history of
+             (iteration, score) pairs (None, and an empty history, if nothing was evaluated).
+    """
+    stopping, history = EarlyStopping(patience, min_delta), []
+    temporary = None
+    if checkpoint is None and evaluator is None:
+        # Still keep the best weights, so the model matches the best results it returns
+        temporary = tempfile.mkdtemp(prefix="training")
+        checkpoint = os.path.join(temporary, "best.ckpt")
+
+    def record(iteration, results):
+        history.append((iteration, score(results)))
+        improved = stopping.update(iteration, history[-1][1], results)
+        print 'Iteration %d Score: %.3f\tBest: %.3f (Iteration %d)' % (iteration, history[-1][1], stopping.best, stopping.best_iteration)
+        return improved
+
+    def record_snapshot(iteration, results):
+        # Keep only the snapshot of the best evaluation so far
+        previous = stopping.best_iteration
+        if results is not None and record(iteration, results):
+            if previous is not None:
+                evaluator.discard(previous)
+        else:
+            evaluator.discard(iteration)
+
+    try:
+        last = 0
+        for last in range(1, iterations + 1):
+            print 'ITERATION:', last
+            model.fit()
+            if last % eval_every == 0 or last == iterations:
+                if evaluator is None:
+                    if record(last, evaluate()):
+                        model.saver.save(model.session, checkpoint)
+                else:
+                    evaluator.submit(last)
+                    for iteration, results in evaluator.poll():
+                        record_snapshot(iteration, results)
+            if stopping.stop:
+                print 'Stopping Early: No Improvement in %d Evaluations' % patience
+                break
+
+        if evaluator is not None:
+            for iteration, results in evaluator.close():
+                record_snapshot(iteration, results)
+            if stopping.best_iteration not in [None, last]:
+                print 'Restoring Best Weights (Iteration %d)' % stopping.best_iteration
+                evaluator.restore(stopping.best_iteration)
+            if checkpoint:
+                model.saver.save(model.session, checkpoint)
+            evaluator.cleanup()
+        elif stopping.best_iteration not in [None, last]:
+            print 'Restoring Best Weights (Iteration %d)' % stopping.best_iteration
+            model.saver.restore(model.session, checkpoint)
+    finally:
+        if temporary is not None:
+            shutil.rmtree(temporary, ignore_errors=True)
+
+    if test is None or stopping.best_iteration is None:
+        return stopping.best_results, history
+    print 'TEST (ITERATION %d):' % stopping.best_iteration
+    return test(), history
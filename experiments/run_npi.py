@@ -5,6 +5,7 @@ Core script for loading, training, and evaluating the NPI model for grounding la
 to lifted reward functions.
 """
 from models.lg_npi import NPI
+from models import background_eval, training
 import tensorflow as tf
 
 FLAGS = tf.app.flags.FLAGS
@@ -12,21 +13,27 @@ tf.app.flags.DEFINE_string("means_train_path", "npi_train_test/L0_npi_train", "P
 tf.app.flags.DEFINE_string("ends_train_path", "npi_train_test/L2_train", "Path to ends training data.")
 tf.app.flags.DEFINE_string("means_test_path", "npi_train_test/L0_test", "Path to means test data.")
 tf.app.flags.DEFINE_string("ends_test_path", "npi_train_test/L2_train", "Path to ends test data.")
+tf.app.flags.DEFINE_bool("pipeline", False, "Read training batches from the in-graph input pipeline.")
+tf.app.flags.DEFINE_integer("iterations", 25, "Maximum number of fit/evaluate iterations.")
+tf.app.flags.DEFINE_integer("eval_every", 1, "Number of iterations between evaluations.")
+tf.app.flags.DEFINE_integer("patience", 5, "Number of evaluations without improvement before stopping early (0 to disable).")
+tf.app.flags.DEFINE_bool("background_eval", False, "Evaluate snapshots in a background process, while training continues.")
 
 def main(_):
     # Create Model
-    npi = NPI(FLAGS.means_train_path, FLAGS.ends_train_path, FLAGS.means_test_path, FLAGS.ends_test_path)
+    npi = NPI(FLAGS.means_train_path, FLAGS.ends_train_path, FLAGS.means_test_path, FLAGS.ends_test_path, pipeline=FLAGS.pipeline)
 
-    # Train Model + Evaluate
-    for i in range(25):
-        print 'ITERATION:', i + 1
-        npi.fit()
-        npi.eval_means()
-        npi.eval_means_all()
-        npi.eval_ends()
+    # Train Model (Stopping Early, and Keeping the Best Weights, Once Validation Accuracy Stops Improving),
+    # then Evaluate the Best Weights on the Test Sets
+    evaluate = lambda score_batch=None: npi.eval_valid(score_batch)
+    evaluator = background_eval.BackgroundEvaluator(npi, evaluate, "checkpoints/npi_metrics.jsonl") if FLAGS.background_eval else None
+    training.train(npi, evaluate, FLAGS.iterations, FLAGS.eval_every, FLAGS.patience, checkpoint="checkpoints/npi_best.ckpt",
+                   evaluator=evaluator, test=lambda: (npi.eval_means(), npi.eval_means_all(), npi.eval_ends()))
     
     # Save Model
     npi.saver.save(npi.session, "checkpoints/npi.ckpt")
+    npi.save_bundle("checkpoints/npi_bundle")
+    npi.export_frozen("checkpoints/npi_frozen")
 
 if __name__ == "__main__":
     tf.app.run()
\ No newline at end of file
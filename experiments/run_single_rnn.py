@@ -5,6 +5,7 @@ Core script for loading, training, and evaluating the Single RNN model for groun
 to grounded reward functions.
 """
 from models.single_rnn import SingleRNN
+from models import background_eval, output_layers, training
 import tensorflow as tf
 
 FLAGS = tf.app.flags.FLAGS
@@ -13,17 +14,31 @@ tf.app.flags.DEFINE_string("ends_train_path", "npi_train_test/L2_train", "Path t
 tf.app.flags.DEFINE_string("means_test_path", "npi_train_test/L0_test", "Path to means test data.")
 tf.app.flags.DEFINE_string("ends_test_path", "npi_train_test/L2_train", "Path to ends test data.")
 tf.app.flags.DEFINE_string("permuted_ends_test_path", "permuted_ends_test/L2_test", "Path to permuted ends test data.")
+tf.app.flags.DEFINE_bool("pipeline", False, "Read training batches from the in-graph input pipeline.")
+tf.app.flags.DEFINE_integer("iterations", 5, "Maximum number of fit/evaluate iterations.")
+tf.app.flags.DEFINE_integer("eval_every", 1, "Number of iterations between evaluations.")
+tf.app.flags.DEFINE_integer("patience", 2, "Number of evaluations without improvement before stopping early (0 to disable).")
+tf.app.flags.DEFINE_bool("background_eval", False, "Evaluate snapshots in a background process, while training continues.")
+tf.app.flags.DEFINE_string("output", "softmax", "Output layer over the reward functions: softmax, sampled, or hierarchical.")
+tf.app.flags.DEFINE_integer("num_sampled", 64, "Number of sampled reward functions per step (sampled output).")
+tf.app.flags.DEFINE_integer("beam", 4, "Number of predicate groups searched for top-k predictions (hierarchical output).")
 
 def main(_):
+    # Background evaluation scores NumPy exports, which need a dense output layer
+    if FLAGS.background_eval and FLAGS.output not in output_layers.EXPORTABLE:
+        raise ValueError("--background_eval needs one of the %s output layers (not '%s')" % (", ".join(output_layers.EXPORTABLE), FLAGS.output))
+
     # Create Model
-    single_rnn = SingleRNN(FLAGS.means_train_path, FLAGS.ends_train_path, FLAGS.means_test_path, FLAGS.ends_test_path)
+    single_rnn = SingleRNN(FLAGS.means_train_path, FLAGS.ends_train_path, FLAGS.means_test_path, FLAGS.ends_test_path, pipeline=FLAGS.pipeline,
+                           output=FLAGS.output, num_sampled=FLAGS.num_sampled, beam=FLAGS.beam)
 
-    # Fit Model 5 Times, Running Evaluation Epochs 
-    for _ in range(5):
-        single_rnn.fit()
-        single_rnn.eval_means()
-        single_rnn.eval_ends()
-        single_rnn.eval_permuted_ends(FLAGS.permuted_ends_test_path)
+    # Train Model (Stopping Early, and Keeping the Best Weights, Once Validation Accuracy Stops Improving),
+    # then Evaluate the Best Weights on the Test Sets
+    evaluate = lambda score_batch=None: single_rnn.eval_valid(score_batch)
+    evaluator = background_eval.BackgroundEvaluator(single_rnn, evaluate, "checkpoints/single_rnn_metrics.jsonl") if FLAGS.background_eval else None
+    training.train(single_rnn, evaluate, FLAGS.iterations, FLAGS.eval_every, FLAGS.patience, checkpoint="checkpoints/single_rnn_best.ckpt",
+                   evaluator=evaluator, test=lambda: (single_rnn.eval_means(), single_rnn.eval_ends(),
+                                                      single_rnn.eval_permuted_ends(FLAGS.permuted_ends_test_path)))
     
 if __name__ == "__main__":
     tf.app.run()
\ No newline at end of file
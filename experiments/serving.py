@@ -0,0 +1,120 @@
+"""
+serving.py
+
+Micro-batching request queue for serving grounding models. Incoming commands are queued, grouped
+into micro-batches (bounded by a maximum batch size and a maximum wait), and run through a single
+batched forward pass on one worker thread, which is also the only thread touching the TF session.
+"""
+from collections import deque
+import numpy as np
+import Queue
+import threading
+import time
+
+
+class Request():
+    def __init__(self, item):
+        """
+        A single queued command, along with the event used to hand its result back.
+        """
+        self.item, self.result, self.error = item, None, None
+        self.start, self.done = time.time(), threading.Event()
+
+
+class MicroBatcher():
+    def __init__(self, batch_fn, max_batch_size=32, max_wait_ms=5.0, latency_window=10000):
+        """
+        Instantiate a MicroBatcher, and start its worker thread.
+
+        :param batch_fn: Function mapping a list of items to a list of results (e.g. NPI.score_nl_batch)
+        :param max_batch_size: Maximum number of requests grouped into a single forward pass
+        :param max_wait_ms: Maximum time (ms) to wait for a batch to fill, after its first request
+        :param latency_window: Number of most recent request latencies kept for percentiles
+        """
+        self.batch_fn, self.max_batch_size, self.max_wait = batch_fn, max_batch_size, max_wait_ms / 1000.0
+        self.queue, self.latencies = Queue.Queue(), deque(maxlen=latency_window)
+        self.num_requests, self.num_batches, self.lock = 0, 0, threading.Lock()
+
+        self.worker = threading.Thread(target=self.run, name="MicroBatcher")
+        self.worker.daemon = True
+        self.worker.start()
+
+    def submit(self, item):
+        """
+        Queue a single item, and block until its batch has been scored.
+
+        :return: Result of batch_fn for this item.
+        """
+        request = Request(item)
+        self.queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def next_batch(self):
+        """
+        Block for the first request, then gather more until the batch is full or max_wait expires.
+        """
+        batch = [self.queue.get()]
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except Queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        """
+        Worker loop: run one batched forward pass per micro-batch, and hand back per-request results.
+        """
+        while True:
+            batch = self.next_batch()
+            self.score(batch)
+
+            end = time.time()
+            with self.lock:
+                self.num_requests, self.num_batches = self.num_requests + len(batch), self.num_batches + 1
+                self.latencies.extend([end - request.start for request in batch])
+
+            for request in batch:
+                request.done.set()
+
+    def score(self, batch):
+        """
+        Score a micro-batch with one forward pass. If the pass fails (or doesn't return one result
+        per request), score its requests one at a time, so a bad request only fails itself, rather
+        than every request batched with it.
+        """
+        try:
+            results = list(self.batch_fn([request.item for request in batch]))
+            if len(results) != len(batch):
+                raise ValueError("batch_fn returned %d results for %d requests" % (len(results), len(batch)))
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].error = e
+            else:
+                for request in batch:
+                    self.score([request])
+            return
+
+        for request, result in zip(batch, results):
+            request.result = result
+
+    def stats(self):
+        """
+        Return serving statistics: p50/p99 latency (ms) over the recent window, current queue depth,
+        and totals of requests and batches served.
+        """
+        with self.lock:
+            latencies = np.array(self.latencies) * 1000.0
+            num_requests, num_batches = self.num_requests, self.num_batches
+
+        p50, p99 = np.percentile(latencies, [50, 99]) if len(latencies) else (0.0, 0.0)
+        return {'p50_ms': float(p50), 'p99_ms': float(p99), 'queue_depth': self.queue.qsize(),
+                'requests': num_requests, 'batches': num_batches,
+                'mean_batch_size': float(num_requests) / num_batches if num_batches else 0.0}
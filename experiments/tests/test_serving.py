@@ -0,0 +1,60 @@
+"""
+Tests for serving.py.
+"""
+import threading
+import unittest
+
+from serving import MicroBatcher, Request
+
+
+def upper_batch(items):
+    return [item.upper() for item in items]
+
+
+class MicroBatcherTest(unittest.TestCase):
+    def submit_all(self, batcher, items):
+        results, errors = {}, {}
+
+        def submit(item):
+            try:
+                results[item] = batcher.submit(item)
+            except Exception as e:
+                errors[item] = e
+        threads = [threading.Thread(target=submit, args=(item,)) for item in items]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_results_are_handed_back_per_request(self):
+        batcher = MicroBatcher(upper_batch, max_batch_size=4, max_wait_ms=50.0)
+        results, errors = self.submit_all(batcher, ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(results, {'a': 'A', 'b': 'B', 'c': 'C', 'd': 'D', 'e': 'E'})
+        self.assertEqual(errors, {})
+        self.assertEqual(batcher.stats()['requests'], 5)
+
+    def test_bad_request_only_fails_itself(self):
+        batcher = MicroBatcher(upper_batch, max_batch_size=8, max_wait_ms=50.0)
+        results, errors = self.submit_all(batcher, ['a', None, 'b'])
+        self.assertEqual(results, {'a': 'A', 'b': 'B'})
+        self.assertEqual(errors.keys(), [None])
+        self.assertIsInstance(errors[None], AttributeError)
+
+    def test_missing_results_fall_back_to_single_requests(self):
+        # Drops the last result of every multi-request batch
+        batcher = MicroBatcher(lambda items: upper_batch(items)[:max(len(items) - 1, 1)])
+        batch = [Request(item) for item in ['a', 'b', 'c']]
+        batcher.score(batch)
+        self.assertEqual([request.result for request in batch], ['A', 'B', 'C'])
+        self.assertEqual([request.error for request in batch], [None, None, None])
+
+    def test_result_count_mismatch_fails_the_request(self):
+        batcher = MicroBatcher(lambda items: [], max_batch_size=1, max_wait_ms=1.0)
+        results, errors = self.submit_all(batcher, ['a'])
+        self.assertEqual(results, {})
+        self.assertIsInstance(errors['a'], ValueError)
+
+
+if __name__ == "__main__":
+    unittest.main()
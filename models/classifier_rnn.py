@@ -5,7 +5,11 @@ Model definition file for an RNN-based classifier sorting language into "low-lev
 Basically the same as the single-rnn model
 """
 import numpy as np
-import tensorflow as tf
+
+from . import batching
+from .lazy import LazyModule
+
+tf = LazyModule('tensorflow')
 
 PAD, PAD_ID = "<<PAD>>", 0
 UNK, UNK_ID = "<<UNK>>", 1
@@ -46,8 +50,11 @@ class ClassifierRNN():
 
         self.test_x = self.vectorize(self.test_data, self.vec_len)
 
+        # Length-bucketed, epoch-shuffled training batches
+        self.train_batches = batching.MiniBatches(self.train_x, self.train_lengths, self.train_labels, self.bsz)
+
         # Setup Placeholders
-        self.X = tf.placeholder(tf.int64, shape=[None, self.train_x.shape[-1]], name='NL_Command')
+        self.X = tf.placeholder(tf.int64, shape=[None, None], name='NL_Command')
         self.Y = tf.placeholder(tf.int64, shape=[None], name='Prediction')
         self.X_len = tf.placeholder(tf.int64, shape=[None], name='NL_Length')
         self.keep_prob = tf.placeholder(tf.float32, name='Dropout_Prob')
@@ -157,16 +164,11 @@ class ClassifierRNN():
         Train the model, with the specified batch size and number of epochs.
         """
         # Run through epochs
-        chunk_size = (len(self.train_x) / self.bsz) * self.bsz
         for e in range(self.epochs):
             curr_loss, curr_acc, batches = 0.0, 0.0, 0.0
-            for start, end in zip(range(0, len(self.train_x[:chunk_size]) - self.bsz, self.bsz),
-                                  range(self.bsz, len(self.train_x[:chunk_size]), self.bsz)):
+            for X, X_len, Y in self.train_batches.epoch():
                 loss, acc, _ = self.session.run([self.loss, self.accuracy, self.train_op],
-                                                feed_dict={self.X: self.train_x[start:end],
-                                                           self.X_len: self.train_lengths[start:end],
-                                                           self.keep_prob: 0.5,
-                                                           self.Y: self.train_labels[start:end]})
+                                                feed_dict={self.X: X, self.X_len: X_len, self.keep_prob: 0.5, self.Y: Y})
                 curr_loss, curr_acc, batches = curr_loss + loss, curr_acc + acc, batches + 1
             print 'Epoch %d\tAverage Loss: %.3f\tAverage Accuracy: %.3f' % (e, curr_loss / batches, curr_acc / batches)
 
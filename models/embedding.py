@@ -0,0 +1,42 @@
+"""
+embedding.py
+
+Padding-aware embedding layer. PAD tokens (PAD_ID) embed to the zero vector by masking the
+looked-up rows, rather than multiplying the whole table by a zero mask before the lookup, so the
+gradient w.r.t. the table stays a sparse set of row updates (IndexedSlices over the batch's tokens).
+Paired with the lazy Adam optimizer (which only updates the moment slots of rows in the batch), the
+cost of a training step no longer grows with the size of the vocabulary.
+"""
+from .lazy import LazyModule
+
+tf = LazyModule('tensorflow')
+
+PAD_ID = 0
+
+
+def lookup(E, X, pad_id=PAD_ID):
+    """
+    Embed a batch of token ids, with PAD tokens embedded as zero vectors.
+
+    :param E: Embedding table variable, shape [vocab_sz, embed_sz]
+    :param X: Token ids, shape [bsz, sent_len]
+    :return: Embedded tokens, shape [bsz, sent_len, embed_sz]
+    """
+    mask = tf.expand_dims(tf.cast(tf.not_equal(X, pad_id), E.dtype), -1)
+    return tf.nn.embedding_lookup(E, X) * mask
+
+
+def masked_table(E, pad_id=PAD_ID):
+    """
+    Return the embedding table with the PAD row zeroed, for exporting (a plain lookup into the
+    result matches lookup). Not used on the training path, as it is a dense op over the table.
+    """
+    return tf.concat([E[:pad_id], tf.zeros_like(E[pad_id:pad_id + 1]), E[pad_id + 1:]], 0)
+
+
+def optimizer(learning_rate=0.001):
+    """
+    Return the training optimizer: Adam, that applies sparse (embedding) gradients lazily, updating
+    the moment slots of only the rows in the batch. Dense variables are updated as by Adam.
+    """
+    return tf.contrib.opt.LazyAdamOptimizer(learning_rate)
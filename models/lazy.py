@@ -0,0 +1,25 @@
+"""
+lazy.py
+
+Deferred imports for the model modules. TensorFlow (and tflearn, which imports it) takes seconds to
+import, so the model modules bind it to a LazyModule, which only imports the real module on first
+attribute access: importing a model class (e.g. from a script's imports) is instant, and only
+building a model pays for TensorFlow.
+"""
+import importlib
+
+
+class LazyModule():
+    def __init__(self, name):
+        """
+        Stand in for the module with the given name, until one of its attributes is needed.
+        """
+        self._name, self._module = name, None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return "<lazy module '%s'%s>" % (self._name, "" if self._module is None else " (loaded)")
@@ -4,24 +4,29 @@ lifted_npi.py
 Core model definition file for the NPI for Lifted RF Grounding.
 """
 import numpy as np
-import tensorflow as tf
-import tflearn
+
+from . import batching, embedding
+from .lazy import LazyModule
+
+tf, tflearn = LazyModule('tensorflow'), LazyModule('tflearn')
 
 TERMINATE, CONTINUE = 1, 0
 P_IDX, A1_IDX, T_IDX = 0, 1, 2
 
 class NPI():
     def __init__(self, train_path, test_path, embedding_size=30, num_args=1, npi_core_dim=64,
-                 key_dim=32, batch_size=16, num_epochs=5, initializer=tf.random_normal_initializer(stddev=0.1)):
+                 key_dim=32, batch_size=16, num_epochs=5, initializer=None):
         """
         Instantiate an NPI for grounding language to lifted Reward Functions, with the necessary
         parameters.
 
         :param train_path: Path to training data
         :param test_path: Path to test data
+        :param initializer: Weight initializer (default: random normal, with stddev 0.1)
         """
         self.train_path, self.test_path = train_path, test_path
-        self.embed_sz, self.num_args, self.init = embedding_size, num_args, initializer
+        self.embed_sz, self.num_args = embedding_size, num_args
+        self.init = initializer or tf.random_normal_initializer(stddev=0.1)
         self.npi_core_dim, self.key_dim, self.bsz = npi_core_dim, key_dim, batch_size
         self.epochs = num_epochs
         self.session = tf.Session()
@@ -32,6 +37,9 @@ class NPI():
         # Build up Program Set
         self.progs, self.args, self.trainY, self.testY = self.parse_programs()
 
+        # Length-bucketed, epoch-shuffled training batches
+        self.train_batches = batching.MiniBatches(self.trainX, self.trainX_len, self.trainY, self.bsz)
+
         # Add GO Program
         self.progs["<<GO>>"] = len(self.progs)
         #create id2prog hashmap
@@ -40,7 +48,7 @@ class NPI():
         self.id2arg = {i:arg for arg, i in self.args.iteritems()}
 
         # Setup Placeholders
-        self.X = tf.placeholder(tf.int32, shape=[None, self.trainX.shape[1]], name='NL_Directive')
+        self.X = tf.placeholder(tf.int32, shape=[None, None], name='NL_Directive')
         self.X_len = tf.placeholder(tf.int32, shape=[None], name="NL_Length")
         self.P = tf.placeholder(tf.int32, shape=[None], name='Program_ID')
         self.P_out = tf.placeholder(tf.int64, shape=[None], name='Program_Out')
@@ -71,7 +79,7 @@ class NPI():
         self.loss = 1 * sum([self.t_loss, self.p_loss]) + sum(self.a_losses)
 
         # Build Training Operation
-        self.train_op = tf.train.AdamOptimizer().minimize(self.loss)
+        self.train_op = embedding.optimizer().minimize(self.loss)
 
         # Build Accuracy Operation
         correct_prog = tf.equal(tf.argmax(self.program_distribution, 1), self.P_out)
@@ -86,11 +94,8 @@ class NPI():
         """
         Instantiate all network weights, including NPI Core GRU Cell.
         """
-        # Create NL Embedding Matrix, with 0 Vector for PAD_ID (0)
-        E = tf.get_variable("Embedding", [len(self.word2id), self.embed_sz], initializer=self.init)
-        zero_mask = tf.constant([0 if i == 0 else 1 for i in range(len(self.word2id))],
-                                    dtype=tf.float32, shape=[len(self.word2id), 1])
-        self.E = E * zero_mask
+        # Create NL Embedding Matrix (PAD_ID (0) is embedded as the 0 Vector by embedding.lookup)
+        self.E = tf.get_variable("Embedding", [len(self.word2id), self.embed_sz], initializer=self.init)
 
         # Create Learnable Mask
         # self.inp_mask = tf.get_variable("Inp_Mask", [self.trainX.shape[1], 1], initializer=tf.constant_initializer(1.0))
@@ -105,7 +110,7 @@ class NPI():
         """
         Map Natural Language Directive to Fixed Size Vector Embedding.
         """
-        directive_embedding = tf.nn.embedding_lookup(self.E, self.X)          # [None, sent_len, embed_sz]
+        directive_embedding = embedding.lookup(self.E, self.X)                # [None, sent_len, embed_sz]
         directive_embedding = tf.nn.dropout(directive_embedding, self.keep_prob)
 
         with tf.variable_scope("Encoder"):
@@ -189,19 +194,17 @@ class NPI():
         Train the model, with the specified batch size and number of epochs.
         """
         # Run through epochs
-        chunk_size = (len(self.trainX) / self.bsz) * self.bsz
         for e in range(self.epochs):
             curr_loss, curr_p_acc, curr_a1_acc, curr_a2_acc, batches = 0.0, 0.0, 0.0, 0.0, 0.0
-            for start, end in zip(range(0, len(self.trainX[:chunk_size]) - self.bsz, self.bsz),
-                                  range(self.bsz, len(self.trainX[:chunk_size]), self.bsz)):
+            for X, X_len, Y in self.train_batches.epoch():
                 loss, p_acc, a1_acc, _ = self.session.run([self.loss, self.p_accuracy, self.a1_accuracy,
                                                            self.train_op], feed_dict={
-                                                                       self.X: self.trainX[start:end],
-                                                                       self.X_len: self.trainX_len[start:end],
-                                                                       self.P: [self.progs["<<GO>>"]] * self.bsz,
-                                                                       self.P_out: self.trainY[start:end, P_IDX],
-                                                                       self.A1_out: self.trainY[start:end, A1_IDX],
-                                                                       self.T_out: self.trainY[start:end, T_IDX],
+                                                                       self.X: X,
+                                                                       self.X_len: X_len,
+                                                                       self.P: [self.progs["<<GO>>"]] * len(X),
+                                                                       self.P_out: Y[:, P_IDX],
+                                                                       self.A1_out: Y[:, A1_IDX],
+                                                                       self.T_out: Y[:, T_IDX],
                                                                        self.keep_prob: 0.5})
                 curr_loss, batches = curr_loss + loss, batches + 1
                 curr_p_acc, curr_a1_acc = curr_p_acc + p_acc, curr_a1_acc + a1_acc
@@ -4,7 +4,10 @@ segmenter_rnn.py
 Core class defining the two-layer Segmenter RNN Network.
 """
 import numpy as np
-import tensorflow as tf
+
+from .lazy import LazyModule
+
+tf = LazyModule('tensorflow')
 
 PAD, PAD_ID = "<<PAD>>", 0
 UNK, UNK_ID = "<<UNK>>", 1
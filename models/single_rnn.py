@@ -6,7 +6,11 @@ the total set of possible reward functions as possible outputs, and predicts
 singular labels.
 """
 import numpy as np
-import tensorflow as tf
+
+from . import batching
+from .lazy import LazyModule
+
+tf = LazyModule('tensorflow')
 
 PAD, PAD_ID = "<<PAD>>", 0
 UNK, UNK_ID = "<<UNK>>", 1
@@ -44,8 +48,11 @@ class SingleRNN():
         self.lengths = [len(n) for n, _ in self.pc]
         self.train_x, self.train_y = self.vectorize()
 
+        # Length-bucketed, epoch-shuffled training batches
+        self.train_batches = batching.MiniBatches(self.train_x, self.lengths, self.train_y, self.bsz)
+
          # Setup Placeholders
-        self.X = tf.placeholder(tf.int64, shape=[None, self.train_x.shape[-1]], name='NL_Directive')
+        self.X = tf.placeholder(tf.int64, shape=[None, None], name='NL_Directive')
         self.Y = tf.placeholder(tf.int64, shape=[None], name='Lifted_RF')
         self.X_len = tf.placeholder(tf.int64, shape=[None], name='NL_Length')
         self.keep_prob = tf.placeholder(tf.float32, name='Dropout_Prob')
@@ -142,16 +149,11 @@ class SingleRNN():
         Train the model, with the specified batch size and number of epochs.
         """
         # Run through epochs
-        chunk_size = (len(self.train_x) / self.bsz) * self.bsz
         for e in range(self.epochs):
             curr_loss, curr_acc, batches = 0.0, 0.0, 0.0
-            for start, end in zip(range(0, len(self.train_x[:chunk_size]) - self.bsz, self.bsz),
-                                  range(self.bsz, len(self.train_x[:chunk_size]), self.bsz)):
+            for X, X_len, Y in self.train_batches.epoch():
                 loss, acc, _ = self.session.run([self.loss, self.accuracy, self.train_op],
-                                                feed_dict={self.X: self.train_x[start:end],
-                                                           self.X_len: self.lengths[start:end],
-                                                           self.keep_prob: 0.5,
-                                                           self.Y: self.train_y[start:end]})
+                                                feed_dict={self.X: X, self.X_len: X_len, self.keep_prob: 0.5, self.Y: Y})
                 curr_loss, curr_acc, batches = curr_loss + loss, curr_acc + acc, batches + 1
             print 'Epoch %d\tAverage Loss: %.3f\tAverage Accuracy: %.3f' % (e, curr_loss / batches, curr_acc / batches)
 
@@ -0,0 +1,46 @@
+"""
+benchmark_idraggn.py
+
+Benchmarks I-DRAGGN training throughput (steps/sec), with separate program and argument train ops
+versus the single fused step (see IDRAGGN.fused_train_op).
+"""
+from models.i_draggn import IDRAGGN
+import tensorflow as tf
+import time
+
+FLAGS = tf.app.flags.FLAGS
+
+# Vanilla Dataset
+tf.app.flags.DEFINE_string("means_train_path", "data/vanilla/train_actions.pik", "Path to means training data.")
+tf.app.flags.DEFINE_string("ends_train_path", "data/vanilla/goals", "Path to ends training data.")
+tf.app.flags.DEFINE_string("means_test_path", "data/vanilla/test_actions.pik", "Path to means test data.")
+tf.app.flags.DEFINE_string("ends_test_path", "data/vanilla/goals", "Path to ends test data.")
+tf.app.flags.DEFINE_bool("pipeline", False, "Read training batches from the in-graph input pipeline.")
+tf.app.flags.DEFINE_bool("fused_encoder", False, "Run both encoders as a single block-diagonal GRU.")
+tf.app.flags.DEFINE_integer("epochs", 3, "Number of timed epochs (after one warm-up epoch).")
+
+
+def steps_per_sec(fused):
+    tf.reset_default_graph()
+    idraggn = IDRAGGN(FLAGS.means_train_path, FLAGS.ends_train_path, FLAGS.means_test_path, FLAGS.ends_test_path,
+                      pipeline=FLAGS.pipeline, fused=fused, fused_encoder=FLAGS.fused_encoder)
+    fetches = [idraggn.loss, idraggn.p_accuracy, idraggn.a1_accuracy, idraggn.train_ops]
+
+    # Warm-up Epoch
+    for _ in idraggn.train_steps(fetches):
+        pass
+
+    steps, start = 0, time.time()
+    for _ in range(FLAGS.epochs):
+        for _ in idraggn.train_steps(fetches):
+            steps += 1
+    return steps / (time.time() - start)
+
+
+def main(_):
+    separate, fused = steps_per_sec(False), steps_per_sec(True)
+    print 'Separate Train Ops: %.1f steps/sec' % separate
+    print 'Fused Train Step: %.1f steps/sec (%.2fx)' % (fused, fused / separate)
+
+if __name__ == "__main__":
+    tf.app.run()
@@ -0,0 +1,125 @@
+"""
+background_eval.py
+
+Evaluation in a background process, so training doesn't block on it. At each evaluation point the
+training process only snapshots the weights (a checkpoint, to restore the best from, and a NumPy
+export, see numpy_backend) and queues the snapshot; a worker process, forked from the training
+process (so it shares the vectorized splits, and never calls into TensorFlow), scores the snapshot
+on the monitored (validation) split with the NumPy backend, appends the results to a metrics log
+(one JSON line per evaluation), and streams them back while training continues.
+"""
+import json
+import multiprocessing
+import os
+import Queue
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+from . import numpy_backend
+
+CHECKPOINT = "model.ckpt"
+
+
+def evaluate_snapshots(evaluate, jobs, results, metrics_path):
+    """
+    Worker loop: score each queued (iteration, snapshot path) with evaluate, until a None job.
+    """
+    for iteration, path in iter(jobs.get, None):
+        start = time.time()
+        print 'EVALUATION (ITERATION %d):' % iteration
+        try:
+            result = evaluate(numpy_backend.NumpyModel(path).score_batch)
+        except Exception:
+            traceback.print_exc(file=sys.stdout)
+            result = None
+        sys.stdout.flush()
+
+        with open(metrics_path, 'a') as f:
+            f.write(json.dumps({'iteration': iteration, 'results': result, 'seconds': round(time.time() - start, 2)},
+                               default=float) + '\n')
+        results.put((iteration, result))
+
+
+class BackgroundEvaluator():
+    def __init__(self, model, evaluate, metrics_path, snapshot_dir=None):
+        """
+        Start the evaluation worker for a model (after the model is built, so the worker inherits its
+        validation split).
+
+        :param evaluate: Function running the model's evaluations with a given score_batch, and
+                         returning their results (e.g. eval_valid)
+        :param metrics_path: Path of the metrics log (truncated, then one JSON line per evaluation)
+        :param snapshot_dir: Directory to write snapshots to (default: a temporary directory)
+        """
+        self.model, self.metrics_path, self.temporary = model, metrics_path, snapshot_dir is None
+        self.snapshot_dir = snapshot_dir or tempfile.mkdtemp(prefix="snapshots")
+        open(metrics_path, 'w').close()
+
+        self.jobs, self.results, self.pending = multiprocessing.Queue(), multiprocessing.Queue(), 0
+        self.worker = multiprocessing.Process(target=evaluate_snapshots, name="BackgroundEvaluator",
+                                              args=(evaluate, self.jobs, self.results, metrics_path))
+        self.worker.daemon = True
+        self.worker.start()
+
+    def snapshot_path(self, iteration):
+        return os.path.join(self.snapshot_dir, "iteration%d" % iteration)
+
+    def submit(self, iteration):
+        """
+        Snapshot the model's current weights, and queue the snapshot for evaluation.
+        """
+        path = self.snapshot_path(iteration)
+        self.model.export_numpy(path)
+        self.model.saver.save(self.model.session, os.path.join(path, CHECKPOINT), write_meta_graph=False,
+                               write_state=False)
+        self.jobs.put((iteration, path))
+        self.pending += 1
+
+    def poll(self, block=False):
+        """
+        Collect the evaluations finished so far (with block, wait for all pending evaluations).
+
+        :return: List of (iteration, results) pairs, in the order they finished (results are None
+                 if the evaluation failed).
+        """
+        finished = []
+        while self.pending:
+            try:
+                finished.append(self.results.get(block))
+            except Queue.Empty:
+                break
+            self.pending -= 1
+        return finished
+
+    def restore(self, iteration):
+        """
+        Restore the model's weights from the snapshot of the given iteration.
+        """
+        self.model.saver.restore(self.model.session, os.path.join(self.snapshot_path(iteration), CHECKPOINT))
+
+    def discard(self, iteration):
+        """
+        Delete the snapshot of the given iteration.
+        """
+        shutil.rmtree(self.snapshot_path(iteration), ignore_errors=True)
+
+    def close(self):
+        """
+        Wait for the pending evaluations, and stop the worker.
+
+        :return: List of the remaining (iteration, results) pairs, as from poll.
+        """
+        finished = self.poll(block=True)
+        self.jobs.put(None)
+        self.worker.join()
+        return finished
+
+    def cleanup(self):
+        """
+        Delete the snapshot directory, if it is a temporary one.
+        """
+        if self.temporary:
+            shutil.rmtree(self.snapshot_dir, ignore_errors=True)
@@ -0,0 +1,109 @@
+"""
+dual_gru.py
+
+Fused encoder for models with several independent GRU encoders over the same sentences (I-DRAGGN's
+program and argument encoders). The encoders' weights are assembled into one block-diagonal GRU over
+the concatenated embeddings, so each timestep is a single while-loop iteration (and a single pair of
+matmuls) instead of one per encoder, while computing exactly what the separate encoders compute.
+
+The weights stay in the per-encoder variables, under the same names tf.contrib.rnn.GRUCell gives them
+(<scope>/rnn/gru_cell/...), so checkpoints restore into either layout, and the exporters keep
+reading the per-encoder weights. The block-diagonal kernels are assembled once per run, outside the
+loop.
+"""
+import tensorflow as tf
+
+from .export import GRU_WEIGHTS
+
+
+def gru_variables(input_sz, num_units):
+    """
+    Create the weights of a tf.contrib.rnn.GRUCell (same names, shapes, and initializers) in the
+    current variable scope.
+
+    :return: List of variables, in GRU_WEIGHTS order.
+    """
+    with tf.variable_scope("rnn"), tf.variable_scope("gru_cell"):
+        return [tf.get_variable("gates/kernel", [input_sz + num_units, 2 * num_units]),
+                tf.get_variable("gates/bias", [2 * num_units], initializer=tf.constant_initializer(1.0)),
+                tf.get_variable("candidate/kernel", [input_sz + num_units, num_units]),
+                tf.get_variable("candidate/bias", [num_units], initializer=tf.zeros_initializer())]
+
+
+def block_diagonal(blocks):
+    """
+    Assemble a block-diagonal matrix from a list of 2-D tensors.
+    """
+    cols = [int(block.shape[1]) for block in blocks]
+    return tf.concat([tf.pad(block, [[0, 0], [sum(cols[:i]), sum(cols[i + 1:])]]) for i, block in enumerate(blocks)], 0)
+
+
+def fuse(weights, input_sizes, num_units):
+    """
+    Fuse the weights of several GRUs (each as a list in GRU_WEIGHTS order) into those of one GRU,
+    over the concatenated inputs and states, with every encoder's gates and candidate computed only
+    from its own input and state.
+
+    :return: Tuple of fused gates kernel, gates bias, candidate kernel, candidate bias.
+    """
+    def kernel(key, chunks):
+        # Rows: [inputs..., states...]; columns: [chunk 0 of each encoder, ..., chunk n of each encoder]
+        parts = [tf.split(w[GRU_WEIGHTS.index(key)], [input_sz, num_units], 0) for w, input_sz in zip(weights, input_sizes)]
+        columns = [[tf.split(part, chunks, 1) for part in encoder] for encoder in parts]
+        return tf.concat([tf.concat([block_diagonal([columns[e][row][c] for e in range(len(weights))]) for row in range(2)], 0)
+                          for c in range(chunks)], 1)
+
+    def bias(key, chunks):
+        biases = [tf.split(w[GRU_WEIGHTS.index(key)], chunks) for w in weights]
+        return tf.concat([biases[e][c] for c in range(chunks) for e in range(len(weights))], 0)
+
+    return kernel('gates/kernel', 2), bias('gates/bias', 2), kernel('candidate/kernel', 1), bias('candidate/bias', 1)
+
+
+class FusedGRUCell(tf.contrib.rnn.RNNCell):
+    def __init__(self, gates_kernel, gates_bias, candidate_kernel, candidate_bias):
+        """
+        GRU cell (tf.contrib.rnn.GRUCell semantics) over precomputed (e.g. fused) weight tensors.
+        """
+        super(FusedGRUCell, self).__init__()
+        self.gates_kernel, self.gates_bias = gates_kernel, gates_bias
+        self.candidate_kernel, self.candidate_bias = candidate_kernel, candidate_bias
+        self.num_units = int(candidate_bias.shape[0])
+
+    @property
+    def state_size(self):
+        return self.num_units
+
+    @property
+    def output_size(self):
+        return self.num_units
+
+    def call(self, inputs, state):
+        gates = tf.sigmoid(tf.nn.bias_add(tf.matmul(tf.concat([inputs, state], 1), self.gates_kernel), self.gates_bias))
+        r, u = tf.split(gates, 2, axis=1)
+        c = tf.tanh(tf.nn.bias_add(tf.matmul(tf.concat([inputs, r * state], 1), self.candidate_kernel), self.candidate_bias))
+        new_h = u * state + (1 - u) * c
+        return new_h, new_h
+
+
+def encode(inputs, sequence_length, scopes, num_units):
+    """
+    Run one GRU encoder per input (each with its weights in its own variable scope), as a single
+    fused, block-diagonal GRU.
+
+    :param inputs: List of embedded sentences, each of shape [bsz, sent_len, input_sz]
+    :param sequence_length: Sentence lengths, shape [bsz]
+    :param scopes: Variable scope of each encoder
+    :return: Tuple of list of final states (each of shape [bsz, num_units]), list of each encoder's
+             variables (in GRU_WEIGHTS order).
+    """
+    input_sizes = [int(x.shape[-1]) for x in inputs]
+    weights = []
+    for scope, input_sz in zip(scopes, input_sizes):
+        with tf.variable_scope(scope):
+            weights.append(gru_variables(input_sz, num_units))
+
+    cell = FusedGRUCell(*fuse(weights, input_sizes, num_units))
+    with tf.variable_scope("Fused_Encoder"):
+        _, state = tf.nn.dynamic_rnn(cell, tf.concat(inputs, 2), sequence_length=sequence_length, dtype=tf.float32)
+    return tf.split(state, len(inputs), axis=1), weights
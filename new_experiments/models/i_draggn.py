@@ -8,14 +8,32 @@ import pickle
 import tensorflow as tf
 import tflearn
 
+from . import batching, bundle, corpus_cache, dual_gru, embedding, evaluate, export, input_pipeline, numpy_backend, rf_utils, sessions
+
 TERMINATE, CONTINUE = 1, 0
 P_IDX, A1_IDX, T_IDX = 0, 1, 2
 
+
+def corpus_dtypes(vocab_size, max_len, num_progs, num_args):
+    """
+    Return the dtypes of the vectorized corpus (see corpus_cache.index_dtype): of its token ids,
+    sentence lengths, and traces (program ids, including GO, argument ids, and termination flags).
+    """
+    return (corpus_cache.index_dtype(vocab_size), corpus_cache.index_dtype(max_len + 1),
+            corpus_cache.index_dtype(max(num_progs, num_args, 2)))
+
+
 class IDRAGGN():
+    CORPUS_ATTRS = ['word2id', 'progs', 'args', 'trainX', 'trainX_len', 'testMeansX', 'testMeans_len', 'testEndsX',
+                    'testEnds_len', 'trainY', 'testMeansY', 'testEndsY', 'max_len']
+    BUNDLE_ATTRS = ['word2id', 'progs', 'args', 'max_len', 'embed_sz', 'num_args', 'npi_core_dim', 'key_dim', 'bsz', 'epochs']
+    HEAD_LR = {'program': 0.001, 'argument': 0.001}
+
     def __init__(self, means_train_path, ends_train_path, means_test_path, ends_test_path,
                  is_pik=False, pik_train_path=None, pik_test_path=None, embedding_size=30, 
                  num_args=1, npi_core_dim=64, key_dim=32, batch_size=16, num_epochs=5, 
-                 initializer=tf.random_normal_initializer(stddev=0.1), restore=False):
+                 initializer=tf.random_normal_initializer(stddev=0.1), restore=False, pipeline=False, fused=False,
+                 fused_encoder=False, valid_fraction=batching.VALID_FRACTION):
         """
         Instantiate an NPI for grounding language to lifted Reward Functions, with the necessary
         parameters.
@@ -24,6 +42,11 @@ class IDRAGGN():
         :param ends_train_path: Path to ends training data
         :param means_test_path: Path to means test data
         :param ends_test_path: Path to ends test data
+        :param fused: Train both heads with a single fused step (see fused_train_op)
+        :param fused_encoder: Run both encoders as one block-diagonal GRU (see dual_gru); best with
+                              fused, so the shared encoder loop is backpropagated once per step
+        :param valid_fraction: Fraction of the training set held out as the validation split (monitored
+                               for early stopping and model selection, see eval_valid)
         """
         self.means_train_path, self.ends_train_path = means_train_path, ends_train_path
         self.means_test_path, self.ends_test_path = means_test_path, ends_test_path
@@ -31,34 +54,67 @@ class IDRAGGN():
         self.embed_sz, self.num_args, self.init = embedding_size, num_args, initializer
         self.npi_core_dim, self.key_dim, self.bsz = npi_core_dim, key_dim, batch_size
         self.epochs = num_epochs
-        self.session = tf.Session()
 
-        # Parse Inputs
-        self.word2id, self.progs, self.args, self.trainX, self.trainX_len, self.testMeansX, self.testMeans_len, self.testEndsX, self.testEnds_len, self.trainY, self.testMeansY, self.testEndsY = self.parse()
+        # Parse Inputs (loaded from the corpus cache, if these corpora have been parsed before)
+        self.__dict__.update(corpus_cache.cached(self.__class__.__name__, self.corpus_sources(), [__file__],
+                                                  lambda: corpus_cache.compile_into(self, self.compile_corpus)))
 
         # Add GO Program
         self.progs["<<GO>>"] = len(self.progs)
-        
+
+        # Hold Out a Validation Split of the Training Set
+        (self.trainX, self.trainX_len, self.trainY), (self.validX, self.validX_len, self.validY) = batching.hold_out(
+            [self.trainX, self.trainX_len, self.trainY], valid_fraction)
+
+        # Length-bucketed, epoch-shuffled training batches
+        self.train_batches = batching.MiniBatches(self.trainX, self.trainX_len, self.trainY, self.bsz)
+
+        # Build Graph
+        self.build_graph(restore, pipeline, fused, fused_encoder)
+
+    def build_graph(self, restore=False, pipeline=False, fused=False, fused_encoder=False):
+        """
+        Build the model graph from the vocabulary and program/argument maps, then either restore
+        weights from the given checkpoint, or initialize them. With pipeline, training batches are read
+        from an in-graph input pipeline (see train_steps), rather than fed. With fused, both heads are
+        trained by a single fused step, rather than by separate program and argument train ops. With
+        fused_encoder, the program and argument encoders run as a single block-diagonal GRU (same
+        variables, so checkpoints restore in either layout).
+        """
+        self.session = sessions.new_session()
+
         # Create id2prog Map
         self.id2prog = {i:prog for prog, i in self.progs.iteritems()}
 
         # Create id2arg Map
         self.id2arg = {i:arg for arg, i in self.args.iteritems()}
 
-        # Setup Placeholders
-        self.X = tf.placeholder(tf.int32, shape=[None, self.trainX.shape[1]], name='NL_Directive')
-        self.X_len = tf.placeholder(tf.int32, shape=[None], name="NL_Length")
+        # Create Argument Mask => [num_progs, num_args], True where argument is valid for program
+        self.arg_mask = rf_utils.arg_mask(self.id2prog, self.id2arg)
+
+        # Setup Input Pipeline => Placeholders read its batches unless fed
+        if pipeline:
+            labels = [self.trainY[:, P_IDX], self.trainY[:, A1_IDX], self.trainY[:, T_IDX]]
+            self.pipeline = input_pipeline.InputPipeline(self.trainX, self.trainX_len, labels, self.bsz)
+            X, X_len, P_out, A1_out, T_out = self.pipeline.next_batch
+        else:
+            self.pipeline, X, X_len, P_out, A1_out, T_out = None, None, None, None, None, None
+
+        # Setup Placeholders (in the corpus dtypes, so batches are fed as stored)
+        id_dtype, len_dtype, trace_dtype = map(tf.as_dtype, corpus_dtypes(len(self.word2id), self.max_len, len(self.progs), len(self.args)))
+        self.X = input_pipeline.placeholder(id_dtype, [None, None], 'NL_Directive', X)
+        self.X_len = input_pipeline.placeholder(len_dtype, [None], "NL_Length", X_len)
         self.P = tf.placeholder(tf.int32, shape=[None], name='Program_ID')
-        self.P_out = tf.placeholder(tf.int64, shape=[None], name='Program_Out')
-        self.A1_out = tf.placeholder(tf.int64, shape=[None], name='Argument1_Out')
-        self.T_out = tf.placeholder(tf.int64, shape=[None], name='Termination_Out')
+        self.P_out = input_pipeline.placeholder(trace_dtype, [None], 'Program_Out', P_out)
+        self.A1_out = input_pipeline.placeholder(trace_dtype, [None], 'Argument1_Out', A1_out)
+        self.T_out = input_pipeline.placeholder(trace_dtype, [None], 'Termination_Out', T_out)
         self.keep_prob = tf.placeholder(tf.float32, name="Dropout_Prob")
 
         # Instantiate Network Weights
         self.instantiate_weights()
 
         # Generate Input Representation
-        self.prog_s, self.arg_s = self.encode_input()
+        self.prog_s, self.arg_s = self.encode_input(fused_encoder)
 
         # Build Termination Network => Returns Probability of Terminating
         self.terminate = self.terminate_net()
@@ -73,14 +129,19 @@ class IDRAGGN():
         self.t_loss, self.p_loss, self.a_losses = self.build_losses()
         self.loss = self.p_loss + sum(self.a_losses)
 
-        # Build Training Operation
-        self.p_train_op = tf.train.AdamOptimizer().minimize(self.p_loss)
-        self.a_train_op = tf.train.AdamOptimizer().minimize(sum(self.a_losses))
+        # Build Training Operation(s)
+        if fused:
+            self.train_ops = [self.fused_train_op()]
+        else:
+            head_vars = self.head_variables()
+            self.p_train_op = embedding.optimizer(self.HEAD_LR['program']).minimize(self.p_loss, var_list=head_vars['program'])
+            self.a_train_op = embedding.optimizer(self.HEAD_LR['argument']).minimize(sum(self.a_losses), var_list=head_vars['argument'])
+            self.train_ops = [self.p_train_op, self.a_train_op]
 
         # Build Accuracy Operation
-        correct_prog = tf.equal(tf.argmax(self.program_distribution, 1), self.P_out)
+        correct_prog = tf.equal(tf.argmax(self.program_distribution, 1), tf.cast(self.P_out, tf.int64))
         self.p_accuracy = tf.reduce_mean(tf.cast(correct_prog, tf.float32), name="Prog_Accuracy")
-        correct_a1 = tf.equal(tf.argmax(self.arguments[0], 1), self.A1_out)
+        correct_a1 = tf.equal(tf.argmax(self.arguments[0], 1), tf.cast(self.A1_out, tf.int64))
         self.a1_accuracy = tf.reduce_mean(tf.cast(correct_a1, tf.float32), name="A1_Accuracy")
 
         # Create Saver
@@ -92,37 +153,74 @@ class IDRAGGN():
             # Initialize all Variables
             self.session.run(tf.global_variables_initializer())
 
+    def save_bundle(self, path):
+        """
+        Save a self-contained bundle (checkpoint, vocabulary, program/argument maps, hyperparameters)
+        that can be restored with load_bundle, without the training corpora.
+        """
+        bundle.save_bundle(self, path)
+
+    def inference_weights(self):
+        """
+        Collect the trained weights used at inference time (PAD mask folded into the embeddings,
+        no termination head), along with a spec describing how they fit together.
+
+        :return: Tuple of spec, dictionary of named weight arrays (see export.collect_weights).
+        """
+        return export.collect_weights(self.session,
+                                      {'p_encoder': (embedding.masked_table(self.PE), self.p_encoder_vars),
+                                       'a_encoder': (embedding.masked_table(self.AE), self.a_encoder_vars)},
+                                      {'program': ('p_encoder', self.program_layers), 'argument': ('a_encoder', self.argument_layers[0])})
+
+    def export_frozen(self, path):
+        """
+        Export a frozen, inference-only graph (plus vocabulary and program/argument maps), that can
+        be served with export.FrozenModel.
+        """
+        export.export_frozen(self, path)
+
+    def export_numpy(self, path):
+        """
+        Export the inference weights (plus the state needed to vectorize commands), that can be
+        run without TensorFlow with numpy_backend.NumpyModel.
+        """
+        spec, weights = self.inference_weights()
+        numpy_backend.save_weights(self, spec, weights, path)
+
     def instantiate_weights(self):
         """
         Instantiate all network weights, including NPI Core GRU Cell.
         """
-        # Create NL Embedding Matrix, with 0 Vector for PAD_ID (0) [Program Net]
-        PE = tf.get_variable("P_Embedding", [len(self.word2id), self.embed_sz], initializer=self.init)
-        zero_mask = tf.constant([0 if i == 0 else 1 for i in range(len(self.word2id))],
-                                    dtype=tf.float32, shape=[len(self.word2id), 1])
-        self.PE = PE * zero_mask
+        # Create NL Embedding Matrix (PAD_ID (0) is embedded as the 0 Vector by embedding.lookup) [Program Net]
+        self.PE = tf.get_variable("P_Embedding", [len(self.word2id), self.embed_sz], initializer=self.init)
 
-        # Create NL Embedding Matrix, with 0 Vector for PAD_ID (0) [Arg Net]
-        AE = tf.get_variable("A_Embedding", [len(self.word2id), self.embed_sz], initializer=self.init)
-        self.AE = AE * zero_mask
+        # Create NL Embedding Matrix (PAD_ID (0) is embedded as the 0 Vector by embedding.lookup) [Arg Net]
+        self.AE = tf.get_variable("A_Embedding", [len(self.word2id), self.embed_sz], initializer=self.init)
 
-    def encode_input(self):
+    def encode_input(self, fused_encoder=False):
         """
         Map Natural Language Directive to Fixed Size Vector Embedding.
         """
-        p_directive_embedding = tf.nn.embedding_lookup(self.PE, self.X)          # [None, sent_len, embed_sz]
+        p_directive_embedding = embedding.lookup(self.PE, self.X)                # [None, sent_len, embed_sz]
         p_directive_embedding = tf.nn.dropout(p_directive_embedding, self.keep_prob)
 
-        a_directive_embedding = tf.nn.embedding_lookup(self.AE, self.X)          # [None, sent_len, embed_sz]
+        a_directive_embedding = embedding.lookup(self.AE, self.X)                # [None, sent_len, embed_sz]
         a_directive_embedding = tf.nn.dropout(a_directive_embedding, self.keep_prob)
 
+        if fused_encoder:
+            (p_state, a_state), (self.p_encoder_vars, self.a_encoder_vars) = dual_gru.encode(
+                [p_directive_embedding, a_directive_embedding], self.X_len, ["P_Encoder", "A_Encoder"], self.embed_sz)
+            return p_state, a_state
+
         with tf.variable_scope("P_Encoder"):
             self.p_encoder_gru = tf.contrib.rnn.GRUCell(self.embed_sz)
             _, p_state = tf.nn.dynamic_rnn(self.p_encoder_gru, p_directive_embedding, sequence_length=self.X_len, dtype=tf.float32)
+            self.p_encoder_vars = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope=tf.get_variable_scope().name + '/')
         
         with tf.variable_scope("A_Encoder"):
             self.a_encoder_gru = tf.contrib.rnn.GRUCell(self.embed_sz)
             _, a_state = tf.nn.dynamic_rnn(self.a_encoder_gru, a_directive_embedding, sequence_length=self.X_len, dtype=tf.float32)
+            self.a_encoder_vars = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope=tf.get_variable_scope().name + '/')
         
         return p_state, a_state
 
@@ -141,8 +239,10 @@ class IDRAGGN():
         """
         # Compute Distribution over Programs
         hidden = tflearn.fully_connected(self.prog_s, self.key_dim, activation='relu', regularizer='L2')
+        self.program_layers = [(hidden.W, hidden.b, 'relu')]
         hidden = tf.nn.dropout(hidden, self.keep_prob)
         prog_dist = tflearn.fully_connected(hidden, len(self.progs))         # Shape: [bsz, num_progs]
+        self.program_layers.append((prog_dist.W, prog_dist.b, 'linear'))
         return prog_dist
 
     def argument_net(self):
@@ -150,13 +250,15 @@ class IDRAGGN():
         Build the NPI Argument Networks (a separate net for each argument), each of which takes in
         the NPI Core Hidden State, and returns a softmax over the argument dimension.
         """
-        args = []
+        args, self.argument_layers = [], []
         for i in range(self.num_args):
             arg_hidden = tflearn.fully_connected(self.arg_s, self.key_dim, activation='relu', regularizer='L2')
+            self.argument_layers.append([(arg_hidden.W, arg_hidden.b, 'relu')])
             arg_hidden = tf.nn.dropout(arg_hidden, self.keep_prob)
             arg = tflearn.fully_connected(arg_hidden, len(self.args), activation='linear',
                                           name='Argument_{}'.format(str(i)))
             args.append(arg)
+            self.argument_layers[-1].append((arg.W, arg.b, 'linear'))
         return args                                                          # Shape: [bsz, num_args]
 
     def build_losses(self):
@@ -164,67 +266,126 @@ class IDRAGGN():
         Build separate loss computations, using the logits from each of the sub-networks.
         """
         # Termination Network Loss
-        termination_loss = tf.losses.sparse_softmax_cross_entropy(self.T_out, self.terminate)
+        termination_loss = tf.losses.sparse_softmax_cross_entropy(tf.cast(self.T_out, tf.int64), self.terminate)
 
         # Program Network Loss
-        program_loss = tf.losses.sparse_softmax_cross_entropy(self.P_out, self.program_distribution)
+        program_loss = tf.losses.sparse_softmax_cross_entropy(tf.cast(self.P_out, tf.int64), self.program_distribution)
 
         # Argument Network Losses
         arg_losses = []
         for i in range(self.num_args):
             if i == 0:
-                arg_losses.append(tf.losses.sparse_softmax_cross_entropy(self.A1_out, self.arguments[i]))
+                arg_losses.append(tf.losses.sparse_softmax_cross_entropy(tf.cast(self.A1_out, tf.int64), self.arguments[i]))
 
         return termination_loss, program_loss, arg_losses
 
+    def head_variables(self):
+        """
+        Map each head ('program', 'argument') to the variables of its network (embedding, encoder,
+        and dense layers), which its loss trains.
+        """
+        return {'program': [self.PE] + self.p_encoder_vars + [v for W, b, _ in self.program_layers for v in (W, b)],
+                'argument': [self.AE] + self.a_encoder_vars + [v for W, b, _ in self.argument_layers[0] for v in (W, b)]}
+
+    def fused_train_op(self):
+        """
+        Build a single training step for both heads: one backward pass through the summed program and
+        argument losses, and one optimizer applying all the gradients. The program and argument
+        networks share no weights, so each still only receives its own head's gradients, at its own
+        learning rate (HEAD_LR); heads with different rates get an optimizer per rate, as Adam's step
+        size is invariant to scaling the gradients.
+        """
+        head_vars = self.head_variables()
+        variables = head_vars['program'] + head_vars['argument']
+        # Gate each op's gradients (as minimize does), so no update races the backward pass
+        grads = dict(zip(variables, tf.gradients(self.p_loss + sum(self.a_losses), variables, gate_gradients=True)))
+
+        rates = {}
+        for head in sorted(head_vars):
+            rates.setdefault(self.HEAD_LR[head], []).extend(head_vars[head])
+        return tf.group(*[embedding.optimizer(lr).apply_gradients([(grads[v], v) for v in rates[lr]]) for lr in sorted(rates)])
+
+    def train_steps(self, fetches):
+        """
+        Run the fetches (including the train op) once per batch, over one epoch of the training set,
+        reading batches from the input pipeline if there is one, and feeding them otherwise.
+
+        :return: Generator over the results of each step.
+        """
+        if self.pipeline is not None:
+            for result in self.pipeline.run_epoch(self.session, fetches, {self.keep_prob: 0.5}):
+                yield result
+            return
+
+        for X, X_len, Y in self.train_batches.epoch():
+            yield self.session.run(fetches, feed_dict={self.X: X,
+                                                       self.X_len: X_len,
+                                                       self.P: [self.progs["<<GO>>"]] * len(X),
+                                                       self.P_out: Y[:, P_IDX],
+                                                       self.A1_out: Y[:, A1_IDX],
+                                                       self.T_out: Y[:, T_IDX],
+                                                       self.keep_prob: 0.5})
+
     def fit(self):
         """
         Train the model, with the specified batch size and number of epochs.
         """
         # Run through epochs
-        chunk_size = (len(self.trainX) / self.bsz) * self.bsz
+        fetches = [self.loss, self.p_accuracy, self.a1_accuracy, self.train_ops]
         for e in range(self.epochs):
             curr_loss, curr_p_acc, curr_a1_acc, curr_a2_acc, batches = 0.0, 0.0, 0.0, 0.0, 0.0
-            for start, end in zip(range(0, len(self.trainX[:chunk_size]) - self.bsz, self.bsz),
-                                  range(self.bsz, len(self.trainX[:chunk_size]), self.bsz)):
-                loss, p_acc, a1_acc, _, _ = self.session.run([self.loss, self.p_accuracy, self.a1_accuracy,
-                                                              self.p_train_op, self.a_train_op], feed_dict={
-                                                                       self.X: self.trainX[start:end],
-                                                                       self.X_len: self.trainX_len[start:end],
-                                                                       self.P: [self.progs["<<GO>>"]] * self.bsz,
-                                                                       self.P_out: self.trainY[start:end, P_IDX],
-                                                                       self.A1_out: self.trainY[start:end, A1_IDX],
-                                                                       self.T_out: self.trainY[start:end, T_IDX],
-                                                                       self.keep_prob: 0.5})
+            for loss, p_acc, a1_acc, _ in self.train_steps(fetches):
                 curr_loss, batches = curr_loss + loss, batches + 1
                 curr_p_acc, curr_a1_acc = curr_p_acc + p_acc, curr_a1_acc + a1_acc
             print 'Epoch %d\tAverage Loss: %.3f\tProgram Accuracy: %.3f\tArg1 Accuracy: %.3f' % (e, curr_loss / batches, curr_p_acc / batches, curr_a1_acc / batches)
 
-    def eval_means(self):
+    def eval_valid(self, score_batch=None):
         """
-        Evaluate the model on the test data.
+        Evaluate the model on the validation split.
+
+        :param score_batch: Scoring function to evaluate (default: the model's own score_batch)
+        """
+        acc = evaluate.eval_programs(score_batch or self.score_batch, self.validX, self.validX_len,
+                                     self.validY[:, P_IDX], self.validY[:, A1_IDX])
+        print "Validation Program: %.3f Argument: %.3f Overall: %.3f" % (acc['program'], acc['argument'], acc['overall'])
+        return acc
+
+    def eval_means(self, score_batch=None):
         """
-        num_correct, total = 0.0, 0.0
-        for i in range(len(self.testMeansX)):
-            pred_prog, pred_a1 = self.score(self.testMeansX[i], self.testMeans_len[i])
-            true_prog, true_a1 = self.testMeansY[i, P_IDX], self.testMeansY[i, A1_IDX]
-            if (pred_prog == int(true_prog)) and (pred_a1 == int(true_a1)):
-                num_correct += 1
+        Evaluate the model on the test data.
 
-        print "Means Per-Segment Test Accuracy: %.3f" % (float(num_correct) / float(len(self.testMeansX)))
+        :param score_batch: Scoring function to evaluate (default: the model's own score_batch)
+        """
+        acc = evaluate.eval_programs(score_batch or self.score_batch, self.testMeansX, self.testMeans_len,
+                                     self.testMeansY[:, P_IDX], self.testMeansY[:, A1_IDX])
+        print "Means Per-Segment Test Program: %.3f Argument: %.3f Overall: %.3f" % (acc['program'], acc['argument'], acc['overall'])
+        return acc
 
-    def eval_ends(self):
+    def eval_ends(self, score_batch=None):
         """
         Evaluate the model on the test data.
+
+        :param score_batch: Scoring function to evaluate (default: the model's own score_batch)
         """
-        num_correct, total = 0.0, 0.0
-        for i in range(len(self.testEndsX)):
-            pred_prog, pred_a1 = self.score(self.testEndsX[i], self.testEnds_len[i])
-            true_prog, true_a1 = self.testEndsY[i, P_IDX], self.testEndsY[i, A1_IDX]
-            if (pred_prog == int(true_prog)) and (pred_a1 == int(true_a1)):
-                num_correct += 1
+        acc = evaluate.eval_programs(score_batch or self.score_batch, self.testEndsX, self.testEnds_len,
+                                     self.testEndsY[:, P_IDX], self.testEndsY[:, A1_IDX])
+        print "Ends Test Program: %.3f Argument: %.3f Overall: %.3f" % (acc['program'], acc['argument'], acc['overall'])
+        return acc
 
-        print "Ends Test Accuracy: %.3f" % (float(num_correct) / float(len(self.testEndsX)))
+    def score_batch(self, X, X_len):
+        """
+        Given a batch of vectorized natural language commands, return the predicted program and
+        argument for each, using a single forward pass.
+
+        :param X: Vectorized commands, shape [bsz, max_len]
+        :param X_len: Command lengths, shape [bsz]
+        :return: Tuple of predicted program ids, predicted argument ids (each of shape [bsz]).
+        """
+        prog, a1 = self.session.run([self.program_distribution, self.arguments[0]],
+                                    feed_dict={self.X: X, self.X_len: X_len, self.keep_prob: 1.0})
+
+        # Restrict arguments to those valid for the predicted program (-1 if none are valid)
+        return rf_utils.masked_argmax(prog, a1, self.arg_mask)
 
     def score(self, nl_command, length):
         """
@@ -232,49 +393,24 @@ class IDRAGGN():
 
         :return: List of tokens representing predicted command, and score.
         """
-        prog, a1 = self.session.run([self.program_distribution, self.arguments[0]],
-                                    feed_dict={self.X: [nl_command], self.X_len: [length], self.P: [self.progs["<<GO>>"]], self.keep_prob: 1.0})
-        pred_prog = np.argmax(prog, axis=1)[0]
-        
-        best_a, best_val = -1, -1000000000
-        for a in range(len(a1[0])):
-            if self.id2prog[pred_prog] in ['Down', 'Left', 'Up', 'Right', 'down', 'West', 'North', 'South']:
-                if not self.id2arg[a].isdigit():
-                    continue 
-                else:
-                   if a1[0][a] > best_val:
-                       best_a, best_val = a, a1[0][a]
-            else:
-                if self.id2arg[a].isdigit():
-                    continue
-                else:
-                    if a1[0][a] > best_val:
-                       best_a, best_val = a, a1[0][a]
-
-        return pred_prog, best_a
+        pred_prog, pred_a1 = self.score_batch([nl_command], [length])
+        return pred_prog[0], pred_a1[0]
 
     def score_nl(self, nl_command):
         """
         Given a natural language string, return a string representing the lifted RF
         """
-        vec, length = self.vectorize_sentence(nl_command)
-        pred_prog, pred_a1 = self.score(vec, length)
-
-        # Produce string representation of RF
-        prog_split = self.id2prog[pred_prog].split("_")
-        args = self.id2arg[pred_a1].split("_")
-
-        # Handle AgentInRegion_BlockInRegion
-        if len(prog_split) == 2:
-            if len(args) != 2:
-                args.append("NONE")
-            return prog_split[0] + " | " + args[0] + " | " + prog_split[1] + " | " + args[1]
-        elif len(prog_split) == 1:
-            if prog_split[0] in ["Up", "Down", "Left", "Right"]:
-                if args[0].isdigit():
-                    return " | ".join([prog_split[0] for _ in range(int(args[0]))])    
-            return prog_split[0] + " | " + args[0]
-    
+        return self.score_nl_batch([nl_command])[0]
+
+    def score_nl_batch(self, nl_commands):
+        """
+        Given a list of natural language strings, return a list of strings representing the
+        lifted RFs, using a single forward pass.
+        """
+        X, X_len = self.vectorize_batch(nl_commands)
+        pred_progs, pred_a1s = self.score_batch(X, X_len)
+        return [rf_utils.rf_string(self.id2prog[p], self.id2arg[a]) for p, a in zip(pred_progs, pred_a1s)]
+
     def vectorize_sentence(self, nl_sentence):
         """
         Vectorizes a single sentence.
@@ -282,7 +418,7 @@ class IDRAGGN():
         sent = nl_sentence.split()
         sentence_len = len(sent)
 
-        vec = np.zeros((self.max_len,))
+        vec = np.zeros((self.max_len,), dtype=corpus_cache.index_dtype(len(self.word2id)))
 
         # Truncate Sentences that are too long
         for i in range(min(sentence_len, self.max_len)):
@@ -290,6 +426,31 @@ class IDRAGGN():
 
         return vec, sentence_len
 
+    def vectorize_batch(self, nl_sentences):
+        """
+        Vectorizes a list of sentences, clipping lengths to the maximum sentence length.
+        """
+        return rf_utils.vectorize(nl_sentences, self.word2id, self.max_len, self.word2id['UNK'])
+
+    def corpus_sources(self):
+        """
+        List the corpus files read by parse (their contents key the corpus cache).
+        """
+        sources = [self.means_train_path, self.ends_train_path + ".en", self.ends_train_path + ".ml",
+                   self.means_test_path, self.ends_test_path + ".en", self.ends_test_path + ".ml"]
+        if self.is_pik:
+            sources += [self.pik_train, self.pik_test]
+        return sources
+
+    def compile_corpus(self):
+        """
+        Parse the corpora into the values listed in CORPUS_ATTRS (parse's outputs, in order, then the
+        attributes it sets), for the corpus cache.
+        """
+        corpus = dict(zip(self.CORPUS_ATTRS, self.parse()))
+        corpus.update({attr: getattr(self, attr) for attr in self.CORPUS_ATTRS if attr not in corpus})
+        return corpus
+
     def parse(self, max_sentence_len=50):
         """
         Parse the english sentences in the training and test data, generating vocabularies,
@@ -388,9 +549,10 @@ class IDRAGGN():
             self.max_len = max_sentence_len
         
         # Vectorize English Data
-        trainX, trainX_len = np.zeros((len(self.train_set), self.max_len)), np.zeros((len(self.train_set)), dtype=np.int32)
-        testMeansX, testEndsX = np.zeros((len(self.test_means), self.max_len)), np.zeros((len(self.test_ends), self.max_len))
-        testMeans_len, testEnds_len = np.zeros((len(self.test_means)), dtype=np.int32), np.zeros((len(self.test_ends)), dtype=np.int32)
+        id_dtype, len_dtype, _ = corpus_dtypes(len(word2id), self.max_len, 0, 0)
+        trainX, trainX_len = np.zeros((len(self.train_set), self.max_len), dtype=id_dtype), np.zeros((len(self.train_set)), dtype=len_dtype)
+        testMeansX, testEndsX = np.zeros((len(self.test_means), self.max_len), dtype=id_dtype), np.zeros((len(self.test_ends), self.max_len), dtype=id_dtype)
+        testMeans_len, testEnds_len = np.zeros((len(self.test_means)), dtype=len_dtype), np.zeros((len(self.test_ends)), dtype=len_dtype)
 
         for i in range(len(self.train_set)):
             nl_sentence = self.train_set[i][0]
@@ -438,9 +600,10 @@ class IDRAGGN():
             test_ends_traces.append((program_set[prog_key], arg_set[arg], TERMINATE))
         assert(len(test_ends_traces) == len(testEndsX))
 
-        # Vectorize Traces
-        vtrain_traces = np.zeros([len(train_traces), 3])
-        vtest_means_traces, vtest_ends_traces = np.zeros([len(test_means_traces), 3]), np.zeros([len(test_ends_traces), 3])
+        # Vectorize Traces (Programs, plus GO)
+        _, _, trace_dtype = corpus_dtypes(0, 0, len(program_set) + 1, len(arg_set))
+        vtrain_traces = np.zeros([len(train_traces), 3], dtype=trace_dtype)
+        vtest_means_traces, vtest_ends_traces = np.zeros([len(test_means_traces), 3], dtype=trace_dtype), np.zeros([len(test_ends_traces), 3], dtype=trace_dtype)
         for i in range(len(train_traces)):
             trace = train_traces[i]
             vtrain_traces[i][P_IDX] = trace[0]
@@ -459,4 +622,11 @@ class IDRAGGN():
             vtest_ends_traces[i][A1_IDX] = trace[1]
             vtest_ends_traces[i][T_IDX] = trace[2]
 
-        return word2id, program_set, arg_set, trainX, trainX_len, testMeansX, testMeans_len, testEndsX, testEnds_len, vtrain_traces, vtest_means_traces, vtest_ends_traces
\ No newline at end of file
+        return word2id, program_set, arg_set, trainX, trainX_len, testMeansX, testMeans_len, testEndsX, testEnds_len, vtrain_traces, vtest_means_traces, vtest_ends_traces
+
+
+def load_bundle(path):
+    """
+    Restore an IDRAGGN from the bundle at path, without reading or parsing the training corpora.
+    """
+    return bundle.load_bundle(IDRAGGN, path)
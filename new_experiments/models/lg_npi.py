@@ -8,14 +8,31 @@ import pickle
 import tensorflow as tf
 import tflearn
 
+from . import batching, bundle, corpus_cache, embedding, evaluate, export, input_pipeline, numpy_backend, rf_utils, sessions
+
 TERMINATE, CONTINUE = 1, 0
 P_IDX, A1_IDX, T_IDX = 0, 1, 2
 
+
+def corpus_dtypes(vocab_size, max_len, num_progs, num_args):
+    """
+    Return the dtypes of the vectorized corpus (see corpus_cache.index_dtype): of its token ids,
+    sentence lengths, and traces (program ids, including GO, argument ids, and termination flags).
+    """
+    return (corpus_cache.index_dtype(vocab_size), corpus_cache.index_dtype(max_len + 1),
+            corpus_cache.index_dtype(max(num_progs, num_args, 2)))
+
+
 class NPI():
+    CORPUS_ATTRS = ['word2id', 'progs', 'args', 'trainX', 'trainX_len', 'testMeansX', 'testMeans_len', 'testEndsX',
+                    'testEnds_len', 'trainY', 'testMeansY', 'testEndsY', 'max_len']
+    BUNDLE_ATTRS = ['word2id', 'progs', 'args', 'max_len', 'embed_sz', 'num_args', 'npi_core_dim', 'key_dim', 'bsz', 'epochs']
+
     def __init__(self, means_train_path, ends_train_path, means_test_path, ends_test_path,
                  is_pik=False, pik_train_path=None, pik_test_path=None, embedding_size=30, 
                  num_args=1, npi_core_dim=64, key_dim=32, batch_size=16, num_epochs=5, 
-                 initializer=tf.random_normal_initializer(stddev=0.1), restore=False):
+                 initializer=tf.random_normal_initializer(stddev=0.1), restore=False, pipeline=False,
+                 valid_fraction=batching.VALID_FRACTION):
         """
         Instantiate an NPI for grounding language to lifted Reward Functions, with the necessary
         parameters.
@@ -24,6 +41,8 @@ class NPI():
         :param ends_train_path: Path to ends training data
         :param means_test_path: Path to means test data
         :param ends_test_path: Path to ends test data
+        :param valid_fraction: Fraction of the training set held out as the validation split (monitored
+                               for early stopping and model selection, see eval_valid)
         """
         self.means_train_path, self.ends_train_path = means_train_path, ends_train_path
         self.means_test_path, self.ends_test_path = means_test_path, ends_test_path
@@ -31,27 +50,57 @@ class NPI():
         self.embed_sz, self.num_args, self.init = embedding_size, num_args, initializer
         self.npi_core_dim, self.key_dim, self.bsz = npi_core_dim, key_dim, batch_size
         self.epochs = num_epochs
-        self.session = tf.Session()
 
-        # Parse Inputs
-        self.word2id, self.progs, self.args, self.trainX, self.trainX_len, self.testMeansX, self.testMeans_len, self.testEndsX, self.testEnds_len, self.trainY, self.testMeansY, self.testEndsY = self.parse()
+        # Parse Inputs (loaded from the corpus cache, if these corpora have been parsed before)
+        self.__dict__.update(corpus_cache.cached(self.__class__.__name__, self.corpus_sources(), [__file__],
+                                                  lambda: corpus_cache.compile_into(self, self.compile_corpus)))
 
         # Add GO Program
         self.progs["<<GO>>"] = len(self.progs)
-        
+
+        # Hold Out a Validation Split of the Training Set
+        (self.trainX, self.trainX_len, self.trainY), (self.validX, self.validX_len, self.validY) = batching.hold_out(
+            [self.trainX, self.trainX_len, self.trainY], valid_fraction)
+
+        # Length-bucketed, epoch-shuffled training batches
+        self.train_batches = batching.MiniBatches(self.trainX, self.trainX_len, self.trainY, self.bsz)
+
+        # Build Graph
+        self.build_graph(restore, pipeline)
+
+    def build_graph(self, restore=False, pipeline=False):
+        """
+        Build the model graph from the vocabulary and program/argument maps, then either restore
+        weights from the given checkpoint, or initialize them. With pipeline, training batches are read
+        from an in-graph input pipeline (see train_steps), rather than fed.
+        """
+        self.session = sessions.new_session()
+
         # Create id2prog Map
         self.id2prog = {i:prog for prog, i in self.progs.iteritems()}
 
         # Create id2arg Map
         self.id2arg = {i:arg for arg, i in self.args.iteritems()}
 
-        # Setup Placeholders
-        self.X = tf.placeholder(tf.int32, shape=[None, self.trainX.shape[1]], name='NL_Directive')
-        self.X_len = tf.placeholder(tf.int32, shape=[None], name="NL_Length")
+        # Create Argument Mask => [num_progs, num_args], True where argument is valid for program
+        self.arg_mask = rf_utils.arg_mask(self.id2prog, self.id2arg)
+
+        # Setup Input Pipeline => Placeholders read its batches unless fed
+        if pipeline:
+            labels = [self.trainY[:, P_IDX], self.trainY[:, A1_IDX], self.trainY[:, T_IDX]]
+            self.pipeline = input_pipeline.InputPipeline(self.trainX, self.trainX_len, labels, self.bsz)
+            X, X_len, P_out, A1_out, T_out = self.pipeline.next_batch
+        else:
+            self.pipeline, X, X_len, P_out, A1_out, T_out = None, None, None, None, None, None
+
+        # Setup Placeholders (in the corpus dtypes, so batches are fed as stored)
+        id_dtype, len_dtype, trace_dtype = map(tf.as_dtype, corpus_dtypes(len(self.word2id), self.max_len, len(self.progs), len(self.args)))
+        self.X = input_pipeline.placeholder(id_dtype, [None, None], 'NL_Directive', X)
+        self.X_len = input_pipeline.placeholder(len_dtype, [None], "NL_Length", X_len)
         self.P = tf.placeholder(tf.int32, shape=[None], name='Program_ID')
-        self.P_out = tf.placeholder(tf.int64, shape=[None], name='Program_Out')
-        self.A1_out = tf.placeholder(tf.int64, shape=[None], name='Argument1_Out')
-        self.T_out = tf.placeholder(tf.int64, shape=[None], name='Termination_Out')
+        self.P_out = input_pipeline.placeholder(trace_dtype, [None], 'Program_Out', P_out)
+        self.A1_out = input_pipeline.placeholder(trace_dtype, [None], 'Argument1_Out', A1_out)
+        self.T_out = input_pipeline.placeholder(trace_dtype, [None], 'Termination_Out', T_out)
         self.keep_prob = tf.placeholder(tf.float32, name="Dropout_Prob")
 
         # Instantiate Network Weights
@@ -77,12 +126,12 @@ class NPI():
         self.loss = self.p_loss + sum(self.a_losses)
 
         # Build Training Operation
-        self.train_op = tf.train.AdamOptimizer().minimize(self.loss)
+        self.train_op = embedding.optimizer().minimize(self.loss)
 
         # Build Accuracy Operation
-        correct_prog = tf.equal(tf.argmax(self.program_distribution, 1), self.P_out)
+        correct_prog = tf.equal(tf.argmax(self.program_distribution, 1), tf.cast(self.P_out, tf.int64))
         self.p_accuracy = tf.reduce_mean(tf.cast(correct_prog, tf.float32), name="Prog_Accuracy")
-        correct_a1 = tf.equal(tf.argmax(self.arguments[0], 1), self.A1_out)
+        correct_a1 = tf.equal(tf.argmax(self.arguments[0], 1), tf.cast(self.A1_out, tf.int64))
         self.a1_accuracy = tf.reduce_mean(tf.cast(correct_a1, tf.float32), name="A1_Accuracy")
 
         # Create Saver
@@ -94,15 +143,44 @@ class NPI():
             # Initialize all Variables
             self.session.run(tf.global_variables_initializer())
 
+    def save_bundle(self, path):
+        """
+        Save a self-contained bundle (checkpoint, vocabulary, program/argument maps, hyperparameters)
+        that can be restored with load_bundle, without the training corpora.
+        """
+        bundle.save_bundle(self, path)
+
+    def inference_weights(self):
+        """
+        Collect the trained weights used at inference time (PAD mask folded into the embeddings,
+        no termination head), along with a spec describing how they fit together.
+
+        :return: Tuple of spec, dictionary of named weight arrays (see export.collect_weights).
+        """
+        return export.collect_weights(self.session, {'encoder': (embedding.masked_table(self.E), self.encoder_vars)},
+                                      {'program': ('encoder', self.program_layers), 'argument': ('encoder', self.argument_layers[0])})
+
+    def export_frozen(self, path):
+        """
+        Export a frozen, inference-only graph (plus vocabulary and program/argument maps), that can
+        be served with export.FrozenModel.
+        """
+        export.export_frozen(self, path)
+
+    def export_numpy(self, path):
+        """
+        Export the inference weights (plus the state needed to vectorize commands), that can be
+        run without TensorFlow with numpy_backend.NumpyModel.
+        """
+        spec, weights = self.inference_weights()
+        numpy_backend.save_weights(self, spec, weights, path)
+
     def instantiate_weights(self):
         """
         Instantiate all network weights, including NPI Core GRU Cell.
         """
-        # Create NL Embedding Matrix, with 0 Vector for PAD_ID (0)
-        E = tf.get_variable("Embedding", [len(self.word2id), self.embed_sz], initializer=self.init)
-        zero_mask = tf.constant([0 if i == 0 else 1 for i in range(len(self.word2id))],
-                                    dtype=tf.float32, shape=[len(self.word2id), 1])
-        self.E = E * zero_mask
+        # Create NL Embedding Matrix (PAD_ID (0) is embedded as the 0 Vector by embedding.lookup)
+        self.E = tf.get_variable("Embedding", [len(self.word2id), self.embed_sz], initializer=self.init)
 
         # Create Program Embedding Matrix
         # self.PE = tf.get_variable("Program_Embedding", [len(self.progs), self.embed_sz], initializer=self.init)
@@ -114,12 +192,13 @@ class NPI():
         """
         Map Natural Language Directive to Fixed Size Vector Embedding.
         """
-        directive_embedding = tf.nn.embedding_lookup(self.E, self.X)          # [None, sent_len, embed_sz]
+        directive_embedding = embedding.lookup(self.E, self.X)                # [None, sent_len, embed_sz]
         directive_embedding = tf.nn.dropout(directive_embedding, self.keep_prob)
 
         with tf.variable_scope("Encoder"):
             self.encoder_gru = tf.contrib.rnn.GRUCell(self.embed_sz)
             _, state = tf.nn.dynamic_rnn(self.encoder_gru, directive_embedding, sequence_length=self.X_len, dtype=tf.float32)
+            self.encoder_vars = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope=tf.get_variable_scope().name + '/')
         return state
 
     def terminate_net(self):
@@ -137,8 +216,10 @@ class NPI():
         """
         # Compute Distribution over Programs
         hidden = tflearn.fully_connected(self.h, self.key_dim, activation='relu', regularizer='L2')
+        self.program_layers = [(hidden.W, hidden.b, 'relu')]
         hidden = tf.nn.dropout(hidden, self.keep_prob)
         prog_dist = tflearn.fully_connected(hidden, len(self.progs))         # Shape: [bsz, num_progs]
+        self.program_layers.append((prog_dist.W, prog_dist.b, 'linear'))
         return prog_dist
 
     def argument_net(self):
@@ -146,13 +227,15 @@ class NPI():
         Build the NPI Argument Networks (a separate net for each argument), each of which takes in
         the NPI Core Hidden State, and returns a softmax over the argument dimension.
         """
-        args = []
+        args, self.argument_layers = [], []
         for i in range(self.num_args):
             arg_hidden = tflearn.fully_connected(self.h, self.key_dim, activation='relu', regularizer='L2')
+            self.argument_layers.append([(arg_hidden.W, arg_hidden.b, 'relu')])
             arg_hidden = tf.nn.dropout(arg_hidden, self.keep_prob)
             arg = tflearn.fully_connected(arg_hidden, len(self.args), activation='linear',
                                           name='Argument_{}'.format(str(i)))
             args.append(arg)
+            self.argument_layers[-1].append((arg.W, arg.b, 'linear'))
         return args                                                          # Shape: [bsz, num_args]
 
     def build_losses(self):
@@ -160,75 +243,100 @@ class NPI():
         Build separate loss computations, using the logits from each of the sub-networks.
         """
         # Termination Network Loss
-        termination_loss = tf.losses.sparse_softmax_cross_entropy(self.T_out, self.terminate)
+        termination_loss = tf.losses.sparse_softmax_cross_entropy(tf.cast(self.T_out, tf.int64), self.terminate)
 
         # Program Network Loss
-        program_loss = tf.losses.sparse_softmax_cross_entropy(self.P_out, self.program_distribution)
+        program_loss = tf.losses.sparse_softmax_cross_entropy(tf.cast(self.P_out, tf.int64), self.program_distribution)
 
         # Argument Network Losses
         arg_losses = []
         for i in range(self.num_args):
             if i == 0:
-                arg_losses.append(tf.losses.sparse_softmax_cross_entropy(self.A1_out, self.arguments[i]))
+                arg_losses.append(tf.losses.sparse_softmax_cross_entropy(tf.cast(self.A1_out, tf.int64), self.arguments[i]))
 
         return termination_loss, program_loss, arg_losses
 
+    def train_steps(self, fetches):
+        """
+        Run the fetches (including the train op) once per batch, over one epoch of the training set,
+        reading batches from the input pipeline if there is one, and feeding them otherwise.
+
+        :return: Generator over the results of each step.
+        """
+        if self.pipeline is not None:
+            for result in self.pipeline.run_epoch(self.session, fetches, {self.keep_prob: 0.5}):
+                yield result
+            return
+
+        for X, X_len, Y in self.train_batches.epoch():
+            yield self.session.run(fetches, feed_dict={self.X: X,
+                                                       self.X_len: X_len,
+                                                       self.P: [self.progs["<<GO>>"]] * len(X),
+                                                       self.P_out: Y[:, P_IDX],
+                                                       self.A1_out: Y[:, A1_IDX],
+                                                       self.T_out: Y[:, T_IDX],
+                                                       self.keep_prob: 0.5})
+
     def fit(self):
         """
         Train the model, with the specified batch size and number of epochs.
         """
         # Run through epochs
-        chunk_size = (len(self.trainX) / self.bsz) * self.bsz
+        fetches = [self.loss, self.p_accuracy, self.a1_accuracy, self.train_op]
         for e in range(self.epochs):
             curr_loss, curr_p_acc, curr_a1_acc, curr_a2_acc, batches = 0.0, 0.0, 0.0, 0.0, 0.0
-            for start, end in zip(range(0, len(self.trainX[:chunk_size]) - self.bsz, self.bsz),
-                                  range(self.bsz, len(self.trainX[:chunk_size]), self.bsz)):
-                loss, p_acc, a1_acc, _ = self.session.run([self.loss, self.p_accuracy, self.a1_accuracy,
-                                                           self.train_op], feed_dict={
-                                                                       self.X: self.trainX[start:end],
-                                                                       self.X_len: self.trainX_len[start:end],
-                                                                       self.P: [self.progs["<<GO>>"]] * self.bsz,
-                                                                       self.P_out: self.trainY[start:end, P_IDX],
-                                                                       self.A1_out: self.trainY[start:end, A1_IDX],
-                                                                       self.T_out: self.trainY[start:end, T_IDX],
-                                                                       self.keep_prob: 0.5})
+            for loss, p_acc, a1_acc, _ in self.train_steps(fetches):
                 curr_loss, batches = curr_loss + loss, batches + 1
                 curr_p_acc, curr_a1_acc = curr_p_acc + p_acc, curr_a1_acc + a1_acc
             print 'Epoch %d\tAverage Loss: %.3f\tProgram Accuracy: %.3f\tArg1 Accuracy: %.3f' % (e, curr_loss / batches, curr_p_acc / batches, curr_a1_acc / batches)
 
-    def eval_means(self):
+    def eval_valid(self, score_batch=None):
         """
-        Evaluate the model on the test data.
+        Evaluate the model on the validation split.
+
+        :param score_batch: Scoring function to evaluate (default: the model's own score_batch)
+        """
+        acc = evaluate.eval_programs(score_batch or self.score_batch, self.validX, self.validX_len,
+                                     self.validY[:, P_IDX], self.validY[:, A1_IDX])
+        print "Validation Program: %.3f Argument: %.3f Overall: %.3f" % (acc['program'], acc['argument'], acc['overall'])
+        return acc
+
+    def eval_means(self, score_batch=None):
         """
-        num_correct, num_prog, num_arg, total = 0.0, 0.0, 0.0, 0.0
-        for i in range(len(self.testMeansX)):
-            pred_prog, pred_a1 = self.score(self.testMeansX[i], self.testMeans_len[i])
-            true_prog, true_a1 = self.testMeansY[i, P_IDX], self.testMeansY[i, A1_IDX]
-            if (pred_prog == int(true_prog)) and (pred_a1 == int(true_a1)):
-                num_correct += 1
-            if pred_prog == int(true_prog):
-                num_prog += 1
-            if pred_a1 == int(true_a1):
-                num_arg += 1
+        Evaluate the model on the test data.
 
-        print "Means Per-Segment Test Program: %.3f Argument: %.3f Overall: %.3f" % ((float(num_prog) / float(len(self.testMeansX))), (float(num_arg) / float(len(self.testMeansX))), (float(num_correct) / float(len(self.testMeansX))))
+        :param score_batch: Scoring function to evaluate (default: the model's own score_batch)
+        """
+        acc = evaluate.eval_programs(score_batch or self.score_batch, self.testMeansX, self.testMeans_len,
+                                     self.testMeansY[:, P_IDX], self.testMeansY[:, A1_IDX])
+        print "Means Per-Segment Test Program: %.3f Argument: %.3f Overall: %.3f" % (acc['program'], acc['argument'], acc['overall'])
+        return acc
 
-    def eval_ends(self):
+    def eval_ends(self, score_batch=None):
         """
         Evaluate the model on the test data.
+
+        :param score_batch: Scoring function to evaluate (default: the model's own score_batch)
         """
-        num_correct, num_prog, num_arg, total = 0.0, 0.0, 0.0, 0.0
-        for i in range(len(self.testEndsX)):
-            pred_prog, pred_a1 = self.score(self.testEndsX[i], self.testEnds_len[i])
-            true_prog, true_a1 = self.testEndsY[i, P_IDX], self.testEndsY[i, A1_IDX]
-            if (pred_prog == int(true_prog)) and (pred_a1 == int(true_a1)):
-                num_correct += 1
-            if pred_prog == int(true_prog):
-                num_prog += 1
-            if pred_a1 == int(true_a1):
-                num_arg += 1
+        acc = evaluate.eval_programs(score_batch or self.score_batch, self.testEndsX, self.testEnds_len,
+                                     self.testEndsY[:, P_IDX], self.testEndsY[:, A1_IDX])
+        print "Ends Test Program: %.3f Argument: %.3f Overall: %.3f" % (acc['program'], acc['argument'], acc['overall'])
+        return acc
 
-        print "Ends Test Program: %.3f Argument: %.3f Overall: %.3f" % ((float(num_prog) / float(len(self.testEndsX))), (float(num_arg) / float(len(self.testEndsX))), (float(num_correct) / float(len(self.testEndsX))))
+    def score_batch(self, X, X_len):
+        """
+        Given a batch of vectorized natural language commands, return the predicted program and
+        argument for each, using a single forward pass.
+
+        :param X: Vectorized commands, shape [bsz, max_len]
+        :param X_len: Command lengths, shape [bsz]
+        :return: Tuple of predicted program ids, predicted argument ids (each of shape [bsz]).
+        """
+        prog, a1 = self.session.run([self.program_distribution, self.arguments[0]],
+                                    feed_dict={self.X: X, self.X_len: X_len, self.keep_prob: 1.0})
+
+        # Restrict arguments to those valid for the predicted program (-1 if none are valid)
+        return rf_utils.masked_argmax(prog, a1, self.arg_mask)
 
     def score(self, nl_command, length):
         """
@@ -236,49 +344,24 @@ class NPI():
 
         :return: List of tokens representing predicted command, and score.
         """
-        prog, a1 = self.session.run([self.program_distribution, self.arguments[0]],
-                                    feed_dict={self.X: [nl_command], self.X_len: [length], self.P: [self.progs["<<GO>>"]], self.keep_prob: 1.0})
-        pred_prog = np.argmax(prog, axis=1)[0]
-        
-        best_a, best_val = -1, -1000000000
-        for a in range(len(a1[0])):
-            if self.id2prog[pred_prog] in ['Down', 'Left', 'Up', 'Right', 'down', 'West', 'North', 'South']:
-                if not self.id2arg[a].isdigit():
-                    continue 
-                else:
-                   if a1[0][a] > best_val:
-                       best_a, best_val = a, a1[0][a]
-            else:
-                if self.id2arg[a].isdigit():
-                    continue
-                else:
-                    if a1[0][a] > best_val:
-                       best_a, best_val = a, a1[0][a]
-
-        return pred_prog, best_a
+        pred_prog, pred_a1 = self.score_batch([nl_command], [length])
+        return pred_prog[0], pred_a1[0]
 
     def score_nl(self, nl_command):
         """
         Given a natural language string, return a string representing the lifted RF
         """
-        vec, length = self.vectorize_sentence(nl_command)
-        pred_prog, pred_a1 = self.score(vec, length)
-
-        # Produce string representation of RF
-        prog_split = self.id2prog[pred_prog].split("_")
-        args = self.id2arg[pred_a1].split("_")
-
-        # Handle AgentInRegion_BlockInRegion
-        if len(prog_split) == 2:
-            if len(args) != 2:
-                args.append("NONE")
-            return prog_split[0] + " | " + args[0] + " | " + prog_split[1] + " | " + args[1]
-        elif len(prog_split) == 1:
-            if prog_split[0] in ["Up", "Down", "Left", "Right"]:
-                if args[0].isdigit():
-                    return " | ".join([prog_split[0] for _ in range(int(args[0]))])    
-            return prog_split[0] + " | " + args[0]
-    
+        return self.score_nl_batch([nl_command])[0]
+
+    def score_nl_batch(self, nl_commands):
+        """
+        Given a list of natural language strings, return a list of strings representing the
+        lifted RFs, using a single forward pass.
+        """
+        X, X_len = self.vectorize_batch(nl_commands)
+        pred_progs, pred_a1s = self.score_batch(X, X_len)
+        return [rf_utils.rf_string(self.id2prog[p], self.id2arg[a]) for p, a in zip(pred_progs, pred_a1s)]
+
     def vectorize_sentence(self, nl_sentence):
         """
         Vectorizes a single sentence.
@@ -286,7 +369,7 @@ class NPI():
         sent = nl_sentence.split()
         sentence_len = len(sent)
 
-        vec = np.zeros((self.max_len,))
+        vec = np.zeros((self.max_len,), dtype=corpus_cache.index_dtype(len(self.word2id)))
 
         # Truncate Sentences that are too long
         for i in range(min(sentence_len, self.max_len)):
@@ -294,6 +377,31 @@ class NPI():
 
         return vec, sentence_len
 
+    def vectorize_batch(self, nl_sentences):
+        """
+        Vectorizes a list of sentences, clipping lengths to the maximum sentence length.
+        """
+        return rf_utils.vectorize(nl_sentences, self.word2id, self.max_len, self.word2id['UNK'])
+
+    def corpus_sources(self):
+        """
+        List the corpus files read by parse (their contents key the corpus cache).
+        """
+        sources = [self.means_train_path, self.ends_train_path + ".en", self.ends_train_path + ".ml",
+                   self.means_test_path, self.ends_test_path + ".en", self.ends_test_path + ".ml"]
+        if self.is_pik:
+            sources += [self.pik_train, self.pik_test]
+        return sources
+
+    def compile_corpus(self):
+        """
+        Parse the corpora into the values listed in CORPUS_ATTRS (parse's outputs, in order, then the
+        attributes it sets), for the corpus cache.
+        """
+        corpus = dict(zip(self.CORPUS_ATTRS, self.parse()))
+        corpus.update({attr: getattr(self, attr) for attr in self.CORPUS_ATTRS if attr not in corpus})
+        return corpus
+
     def parse(self, max_sentence_len=50):
         """
         Parse the english sentences in the training and test data, generating vocabularies,
@@ -392,9 +500,10 @@ class NPI():
             self.max_len = max_sentence_len
         
         # Vectorize English Data
-        trainX, trainX_len = np.zeros((len(self.train_set), self.max_len)), np.zeros((len(self.train_set)), dtype=np.int32)
-        testMeansX, testEndsX = np.zeros((len(self.test_means), self.max_len)), np.zeros((len(self.test_ends), self.max_len))
-        testMeans_len, testEnds_len = np.zeros((len(self.test_means)), dtype=np.int32), np.zeros((len(self.test_ends)), dtype=np.int32)
+        id_dtype, len_dtype, _ = corpus_dtypes(len(word2id), self.max_len, 0, 0)
+        trainX, trainX_len = np.zeros((len(self.train_set), self.max_len), dtype=id_dtype), np.zeros((len(self.train_set)), dtype=len_dtype)
+        testMeansX, testEndsX = np.zeros((len(self.test_means), self.max_len), dtype=id_dtype), np.zeros((len(self.test_ends), self.max_len), dtype=id_dtype)
+        testMeans_len, testEnds_len = np.zeros((len(self.test_means)), dtype=len_dtype), np.zeros((len(self.test_ends)), dtype=len_dtype)
 
         for i in range(len(self.train_set)):
             nl_sentence = self.train_set[i][0]
@@ -442,9 +551,10 @@ class NPI():
             test_ends_traces.append((program_set[prog_key], arg_set[arg], TERMINATE))
         assert(len(test_ends_traces) == len(testEndsX))
 
-        # Vectorize Traces
-        vtrain_traces = np.zeros([len(train_traces), 3])
-        vtest_means_traces, vtest_ends_traces = np.zeros([len(test_means_traces), 3]), np.zeros([len(test_ends_traces), 3])
+        # Vectorize Traces (Programs, plus GO)
+        _, _, trace_dtype = corpus_dtypes(0, 0, len(program_set) + 1, len(arg_set))
+        vtrain_traces = np.zeros([len(train_traces), 3], dtype=trace_dtype)
+        vtest_means_traces, vtest_ends_traces = np.zeros([len(test_means_traces), 3], dtype=trace_dtype), np.zeros([len(test_ends_traces), 3], dtype=trace_dtype)
         for i in range(len(train_traces)):
             trace = train_traces[i]
             vtrain_traces[i][P_IDX] = trace[0]
@@ -463,4 +573,11 @@ class NPI():
             vtest_ends_traces[i][A1_IDX] = trace[1]
             vtest_ends_traces[i][T_IDX] = trace[2]
 
-        return word2id, program_set, arg_set, trainX, trainX_len, testMeansX, testMeans_len, testEndsX, testEnds_len, vtrain_traces, vtest_means_traces, vtest_ends_traces
\ No newline at end of file
+        return word2id, program_set, arg_set, trainX, trainX_len, testMeansX, testMeans_len, testEndsX, testEnds_len, vtrain_traces, vtest_means_traces, vtest_ends_traces
+
+
+def load_bundle(path):
+    """
+    Restore an NPI from the bundle at path, without reading or parsing the training corpora.
+    """
+    return bundle.load_bundle(NPI, path)
@@ -0,0 +1,148 @@
+"""
+numpy_backend.py
+
+Pure-NumPy inference for the GRU grounding models (SingleRNN, LiftedRNN, NPI, I-DRAGGN). A trained
+model's inference weights (see the models' inference_weights) are exported to a weights.npz file,
+next to its bundle state, and can then be run batched without importing TensorFlow: embedding
+lookup, a GRU masked over variable sentence lengths, and the dense heads.
+"""
+import json
+import numpy as np
+import os
+
+from . import bundle, rf_utils
+
+WEIGHTS_FILE, SPEC_KEY = "weights.npz", "__spec__"
+UNK_TOKENS = ['UNK', '<<UNK>>']
+ACTIVATIONS = {'relu': lambda x: np.maximum(x, 0),
+               'elu': lambda x: np.where(x > 0, x, np.expm1(np.minimum(x, 0))),
+               'linear': lambda x: x}
+
+
+def save_weights(model, spec, weights, path):
+    """
+    Save a model's bundle state, and its inference weights (with the spec describing how they fit
+    together), to the directory at path.
+    """
+    bundle.save_state(model, path)
+    arrays = {key: np.asarray(value, dtype=np.float32) for key, value in weights.items()}
+    arrays[SPEC_KEY] = np.array(json.dumps(spec))
+    np.savez(os.path.join(path, WEIGHTS_FILE), **arrays)
+
+
+def load_weights(path):
+    """
+    Load the inference weights saved by save_weights.
+
+    :return: Tuple of spec, dictionary of named weight arrays.
+    """
+    with np.load(os.path.join(path, WEIGHTS_FILE)) as f:
+        spec = json.loads(str(f[SPEC_KEY]))
+        weights = {key: f[key] for key in f.files if key != SPEC_KEY}
+    return spec, weights
+
+
+def sigmoid(x):
+    return 0.5 * (np.tanh(0.5 * x) + 1.0)
+
+
+def gru(inputs, lengths, gates_kernel, gates_bias, candidate_kernel, candidate_bias):
+    """
+    Run a GRU (tf.contrib.rnn.GRUCell semantics) over a batch of padded sequences, returning the
+    state at the last valid step of each (zeros for empty sequences).
+
+    :param inputs: Embedded sequences, shape [bsz, max_len, input_sz]
+    :param lengths: Sequence lengths, shape [bsz]
+    :return: Final states, shape [bsz, rnn_sz]
+    """
+    bsz, max_len, input_sz = inputs.shape
+    rnn_sz = candidate_bias.shape[0]
+
+    # Input projections don't depend on the state, so compute them for all steps at once
+    x_gates = np.dot(inputs, gates_kernel[:input_sz]) + gates_bias
+    x_candidate = np.dot(inputs, candidate_kernel[:input_sz]) + candidate_bias
+    h_gates, h_candidate = gates_kernel[input_sz:], candidate_kernel[input_sz:]
+
+    h = np.zeros((bsz, rnn_sz), dtype=np.float32)
+    for t in range(min(max_len, lengths.max() if bsz else 0)):
+        r, u = np.split(sigmoid(x_gates[:, t] + np.dot(h, h_gates)), 2, axis=1)
+        c = np.tanh(x_candidate[:, t] + np.dot(r * h, h_candidate))
+        new_h = u * h + (1 - u) * c
+
+        # Sequences that have already ended keep their final state
+        h = np.where((t < lengths)[:, None], new_h, h)
+    return h
+
+
+class NumpyModel():
+    def __init__(self, path):
+        """
+        Load a model exported with save_weights (e.g. via model.export_numpy), without TensorFlow.
+        """
+        self.model_name, state = bundle.load_state(path)
+        self.word2id, self.max_len = state['word2id'], state['max_len']
+        self.unk_id = [self.word2id[w] for w in UNK_TOKENS if w in self.word2id][0]
+        self.spec, self.weights = load_weights(path)
+
+        if 'commands' in state:
+            # Label models (SingleRNN, LiftedRNN): a single head over all reward functions
+            self.id2command = {i: rf for rf, i in state['commands'].iteritems()}
+        else:
+            # Program/argument models (NPI, I-DRAGGN)
+            self.id2prog = {i: prog for prog, i in state['progs'].iteritems()}
+            self.id2arg = {i: arg for arg, i in state['args'].iteritems()}
+            self.arg_mask = rf_utils.arg_mask(self.id2prog, self.id2arg)
+
+    def forward(self, X, X_len):
+        """
+        Run the full forward pass on a batch of vectorized commands.
+
+        :return: Dictionary mapping head name to logits, each of shape [bsz, num_outputs].
+        """
+        X, X_len = np.asarray(X, dtype=np.int64)[:, :self.max_len], np.minimum(X_len, self.max_len)
+        states = {}
+        for name in self.spec['encoders']:
+            w = lambda key: self.weights[name + '/' + key]
+            states[name] = gru(w('embedding')[X], X_len, w('gates/kernel'), w('gates/bias'),
+                               w('candidate/kernel'), w('candidate/bias'))
+
+        logits = {}
+        for name, head in self.spec['heads'].items():
+            hidden = states[head['encoder']]
+            for i, activation in enumerate(head['activations']):
+                W, b = self.weights['%s/%d/W' % (name, i)], self.weights['%s/%d/b' % (name, i)]
+                hidden = ACTIVATIONS[activation](np.dot(hidden, W) + b)
+            logits[name] = hidden
+        return logits
+
+    def score_batch(self, X, X_len):
+        """
+        Given a batch of vectorized natural language commands, return the same predictions as the
+        exported model's score_batch: (reward function ids, probabilities) for label models, and
+        (program ids, argument ids) for program/argument models.
+        """
+        logits = self.forward(X, X_len)
+        if 'output' in logits:
+            output = logits['output']
+            probs = np.exp(output - output.max(axis=1, keepdims=True))
+            probs /= probs.sum(axis=1, keepdims=True)
+            pred_command = np.argmax(probs, axis=1)
+            return pred_command, probs[np.arange(len(probs)), pred_command]
+        return rf_utils.masked_argmax(logits['program'], logits['argument'], self.arg_mask)
+
+    def score_nl_batch(self, nl_commands):
+        """
+        Given a list of natural language strings, return a list of strings representing the
+        predicted reward functions, using a single forward pass.
+        """
+        X, X_len = rf_utils.vectorize(nl_commands, self.word2id, self.max_len, self.unk_id)
+        preds, scores = self.score_batch(X, X_len)
+        if hasattr(self, 'id2command'):
+            return [self.id2command[p] for p in preds]
+        return [rf_utils.rf_string(self.id2prog[p], self.id2arg[a]) for p, a in zip(preds, scores)]
+
+    def score_nl(self, nl_command):
+        """
+        Given a natural language string, return a string representing the predicted reward function.
+        """
+        return self.score_nl_batch([nl_command])[0]
@@ -0,0 +1,179 @@
+"""
+output_layers.py
+
+Output layers for the classifier models (SingleRNN, LiftedRNN), over their set of reward functions.
+Each takes the top hidden layer, and provides the training loss and accuracy, greedy predictions,
+and top-k predictions (with probabilities):
+    - DenseSoftmax: a full softmax over every RF. The cost of a training step (forward, gradient,
+      and Adam update of the output weights) grows linearly with the number of RFs.
+    - SampledSoftmax: the same full softmax at inference time, but trained with a sampled softmax:
+      each step only scores (and updates the output rows of) the true RFs plus num_sampled
+      sampled ones, and its training accuracy is measured over the same candidates.
+    - HierarchicalSoftmax: a two-level softmax, P(rf) = P(predicate group) P(rf | group), with RFs
+      grouped by predicate template (see rf_utils.rf_hierarchy). Training only scores the groups
+      and the members of the true group; top-k inference only scores the groups and the members of
+      the top beam groups, so both grow with the number of groups plus the group size (about the
+      square root of the number of RFs), rather than the number of RFs.
+"""
+import tensorflow as tf
+
+from . import rf_utils
+
+OUTPUTS = ['softmax', 'sampled', 'hierarchical']
+EXPORTABLE = ['softmax', 'sampled']  # Dense at inference time, so they can be exported (see numpy_backend)
+MASKED = -1e9
+
+
+def accuracy(predictions, labels):
+    return tf.reduce_mean(tf.cast(tf.equal(predictions, labels), tf.float32), name="Accuracy")
+
+
+class DenseSoftmax():
+    def __init__(self, hidden, hidden_sz, commands, init):
+        """
+        Build a dense softmax layer over the given RF set, on top of hidden.
+        """
+        self.W = tf.get_variable("Output_W", shape=[hidden_sz, len(commands)], dtype=tf.float32, initializer=init)
+        self.B = tf.get_variable("Output_B", shape=[len(commands)], dtype=tf.float32, initializer=init)
+        self.logits = tf.matmul(hidden, self.W) + self.B
+        self.layers = [(self.W, self.B, 'linear')]
+
+    def loss(self, labels):
+        return tf.losses.sparse_softmax_cross_entropy(labels, self.logits)
+
+    def predict(self):
+        return tf.argmax(self.logits, 1)
+
+    def train_accuracy(self, labels):
+        return accuracy(self.predict(), labels)
+
+    def top_k(self, k):
+        probs, ids = tf.nn.top_k(tf.nn.softmax(self.logits), tf.minimum(k, tf.shape(self.logits)[1]))
+        return tf.cast(ids, tf.int64), probs
+
+
+class SampledSoftmax(DenseSoftmax):
+    def __init__(self, hidden, hidden_sz, commands, init, num_sampled=64):
+        """
+        Build a softmax layer over the given RF set, trained with a sampled softmax over
+        num_sampled RFs (drawn uniformly, as the RF labels have no frequency order).
+        """
+        # Output weights are stored one row per RF, so sampled rows are gathered (sparse gradients)
+        self.W = tf.get_variable("Output_W", shape=[len(commands), hidden_sz], dtype=tf.float32, initializer=init)
+        self.B = tf.get_variable("Output_B", shape=[len(commands)], dtype=tf.float32, initializer=init)
+        self.hidden, self.num_classes, self.num_sampled = hidden, len(commands), min(num_sampled, len(commands))
+        self.samples = {}
+
+        # Full logits, only run for predictions (evaluation, serving) and export, never by a training step
+        self.logits = tf.matmul(hidden, self.W, transpose_b=True) + self.B
+        self.layers = [(tf.transpose(self.W), self.B, 'linear')]
+
+    def sample(self, labels):
+        """
+        Draw the sampled RFs for a batch of labels (once per labels tensor, so the loss and the
+        training accuracy score the same candidates).
+        """
+        if labels not in self.samples:
+            self.samples[labels] = tf.nn.uniform_candidate_sampler(tf.expand_dims(labels, 1), 1, self.num_sampled,
+                                                                   True, self.num_classes)
+        return self.samples[labels]
+
+    def loss(self, labels):
+        return tf.reduce_mean(tf.nn.sampled_softmax_loss(self.W, self.B, tf.expand_dims(labels, 1), self.hidden,
+                                                         self.num_sampled, self.num_classes,
+                                                         sampled_values=self.sample(labels)))
+
+    def train_accuracy(self, labels):
+        """
+        Training accuracy over the candidates the loss scores: the fraction of examples whose true RF
+        outscores every sampled RF (other than itself).
+        """
+        sampled = self.sample(labels)[0]
+        true_logits = tf.reduce_sum(self.hidden * tf.gather(self.W, labels), 1) + tf.gather(self.B, labels)
+        sampled_logits = tf.matmul(self.hidden, tf.gather(self.W, sampled), transpose_b=True) + tf.gather(self.B, sampled)
+        hits = tf.equal(tf.expand_dims(labels, 1), tf.expand_dims(sampled, 0))
+        sampled_logits = tf.where(hits, MASKED * tf.ones_like(sampled_logits), sampled_logits)
+        correct = tf.greater_equal(true_logits, tf.reduce_max(sampled_logits, 1))
+        return tf.reduce_mean(tf.cast(correct, tf.float32), name="Accuracy")
+
+
+class HierarchicalSoftmax():
+    def __init__(self, hidden, hidden_sz, commands, init, beam=4, max_group=None):
+        """
+        Build a two-level (predicate group, then RF within the group) softmax layer over the given
+        RF set. Top-k predictions are searched over the top beam groups.
+        """
+        group_of, member_of, members = rf_utils.rf_hierarchy(commands, max_group)
+        num_groups, group_sz = members.shape
+        self.group_of, self.member_of = tf.constant(group_of), tf.constant(member_of)
+        self.members, self.valid = tf.constant(members), tf.constant(members >= 0)
+        self.hidden, self.beam = hidden, min(beam, num_groups)
+
+        # Group Layer
+        self.G_W = tf.get_variable("Group_W", shape=[hidden_sz, num_groups], dtype=tf.float32, initializer=init)
+        self.G_B = tf.get_variable("Group_B", shape=[num_groups], dtype=tf.float32, initializer=init)
+        self.group_logits = tf.matmul(hidden, self.G_W) + self.G_B
+
+        # Member Layers (one per group, gathered by group, so only the scored groups are updated)
+        self.M_W = tf.get_variable("Member_W", shape=[num_groups, hidden_sz, group_sz], dtype=tf.float32,
+                                   initializer=init)
+        self.M_B = tf.get_variable("Member_B", shape=[num_groups, group_sz], dtype=tf.float32, initializer=init)
+        self.layers = None
+
+    def member_logits(self, groups):
+        """
+        Score the members of the given groups (shape [bsz] or [bsz, beam]), with padding masked out.
+
+        :return: Member logits, shape [bsz, group_sz] or [bsz, beam, group_sz].
+        """
+        W, B = tf.gather(self.M_W, groups), tf.gather(self.M_B, groups)
+        if groups.shape.ndims == 1:
+            logits = tf.einsum('bh,bhm->bm', self.hidden, W) + B
+        else:
+            logits = tf.einsum('bh,bkhm->bkm', self.hidden, W) + B
+        return tf.where(tf.gather(self.valid, groups), logits, MASKED * tf.ones_like(logits))
+
+    def loss(self, labels):
+        groups, positions = tf.gather(self.group_of, labels), tf.gather(self.member_of, labels)
+        return (tf.losses.sparse_softmax_cross_entropy(groups, self.group_logits) +
+                tf.losses.sparse_softmax_cross_entropy(positions, self.member_logits(groups)))
+
+    def predict(self):
+        groups = tf.argmax(self.group_logits, 1, output_type=tf.int32)
+        positions = tf.argmax(self.member_logits(groups), 1, output_type=tf.int32)
+        return tf.cast(tf.gather_nd(self.members, tf.stack([groups, positions], 1)), tf.int64)
+
+    def train_accuracy(self, labels):
+        # Greedy predictions only score the groups and the members of the top group
+        return accuracy(self.predict(), labels)
+
+    def top_k(self, k):
+        # Score the members of the top beam groups, by joint log-probability
+        group_logp, groups = tf.nn.top_k(tf.nn.log_softmax(self.group_logits), self.beam)
+        joint = tf.expand_dims(group_logp, 2) + tf.nn.log_softmax(self.member_logits(groups))
+        group_sz = tf.shape(joint)[2]
+
+        # Never return padding: k is clamped to the number of RFs in the top beam groups (the fewest
+        # over the batch), just as the dense softmax clamps it to the number of RFs
+        num_valid = tf.reduce_sum(tf.cast(tf.gather(self.valid, groups), tf.int32), [1, 2])
+        k = tf.minimum(tf.minimum(k, self.beam * group_sz), tf.reduce_min(num_valid))
+        logp, flat = tf.nn.top_k(tf.reshape(joint, [tf.shape(joint)[0], -1]), k)
+
+        # Map (beam, position) back to RF ids
+        ranks = tf.range(tf.shape(flat)[0])[:, None] * tf.ones_like(flat)
+        beam_groups = tf.gather_nd(groups, tf.stack([ranks, flat // group_sz], 2))
+        ids = tf.gather_nd(self.members, tf.stack([beam_groups, flat % group_sz], 2))
+        return tf.cast(ids, tf.int64), tf.exp(logp)
+
+
+def build(output, hidden, hidden_sz, commands, init, num_sampled=64, beam=4):
+    """
+    Build the output layer of the given kind (one of OUTPUTS).
+    """
+    if output == 'softmax':
+        return DenseSoftmax(hidden, hidden_sz, commands, init)
+    elif output == 'sampled':
+        return SampledSoftmax(hidden, hidden_sz, commands, init, num_sampled)
+    elif output == 'hierarchical':
+        return HierarchicalSoftmax(hidden, hidden_sz, commands, init, beam)
+    raise ValueError("Unknown output layer '%s' (expected one of %s)" % (output, ", ".join(OUTPUTS)))
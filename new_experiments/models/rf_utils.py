@@ -0,0 +1,117 @@
+"""
+rf_utils.py
+
+TensorFlow-free helpers shared by the program/argument models (NPI, I-DRAGGN) and their inference
+runners: sentence vectorization, the program-conditioned argument mask, and conversion of
+predicted (program, argument) pairs back into lifted RF strings. Also groups the RF labels of the
+classifier models (SingleRNN, LiftedRNN) by predicate, for their hierarchical output layer.
+"""
+import math
+import re
+
+import numpy as np
+
+from .corpus_cache import index_dtype
+
+ACTION_PROGS = ['Down', 'Left', 'Up', 'Right', 'down', 'West', 'North', 'South']
+
+# RF label tokens that bind a predicate's arguments (e.g. "room1", "4", "roomIsGreen")
+BINDING = re.compile(r'\d|^[a-z]+Is[A-Z]')
+
+
+def vectorize(nl_sentences, word2id, max_len, unk_id):
+    """
+    Vectorize a list of natural language strings, truncating each to max_len tokens.
+
+    :return: Tuple of sentence matrix [N, max_len], sentence lengths [N] (in the corpus dtypes, see
+             corpus_cache.index_dtype).
+    """
+    X = np.zeros((len(nl_sentences), max_len), dtype=index_dtype(len(word2id)))
+    X_len = np.zeros((len(nl_sentences)), dtype=index_dtype(max_len + 1))
+    for i, nl_sentence in enumerate(nl_sentences):
+        sent = nl_sentence.split()[:max_len]
+        X_len[i] = len(sent)
+        X[i, :len(sent)] = [word2id.get(word, unk_id) for word in sent]
+    return X, X_len
+
+
+def arg_mask(id2prog, id2arg):
+    """
+    Precompute which arguments are valid for each program: action programs (Up, Down, etc.)
+    take digit arguments, all other programs take non-digit arguments.
+
+    :return: Boolean matrix of shape [num_progs, num_args].
+    """
+    is_digit = np.array([id2arg[a].isdigit() for a in range(len(id2arg))], dtype=bool)
+    is_action = np.array([id2prog[p] in ACTION_PROGS for p in range(len(id2prog))], dtype=bool)
+    return is_action[:, None] == is_digit[None, :]
+
+
+def masked_argmax(prog_logits, arg_logits, mask):
+    """
+    Pick the most likely program, then the most likely argument that is valid for it.
+
+    :param prog_logits: Program scores, shape [bsz, num_progs]
+    :param arg_logits: Argument scores, shape [bsz, num_args]
+    :param mask: Argument mask, as built by arg_mask
+    :return: Tuple of predicted program ids, predicted argument ids (-1 if none are valid).
+    """
+    pred_prog = np.argmax(prog_logits, axis=1)
+    valid = mask[pred_prog]
+    pred_arg = np.argmax(np.where(valid, arg_logits, -np.inf), axis=1)
+    pred_arg[~valid.any(axis=1)] = -1
+    return pred_prog, pred_arg
+
+
+def rf_string(prog, arg):
+    """
+    Produce the string representation of a predicted (program, argument) RF.
+    """
+    prog_split = prog.split("_")
+    args = arg.split("_")
+
+    # Handle AgentInRegion_BlockInRegion
+    if len(prog_split) == 2:
+        if len(args) != 2:
+            args.append("NONE")
+        return prog_split[0] + " | " + args[0] + " | " + prog_split[1] + " | " + args[1]
+    elif len(prog_split) == 1:
+        if prog_split[0] in ["Up", "Down", "Left", "Right"]:
+            if args[0].isdigit():
+                return " | ".join([prog_split[0] for _ in range(int(args[0]))])
+        return prog_split[0] + " | " + args[0]
+
+
+def rf_predicate(rf):
+    """
+    Return the predicate template of an RF label: its tokens, minus the argument bindings (e.g.
+    "agentInRegion agent0 room1" => "agentInRegion", "Right 4" => "Right").
+    """
+    return " ".join(token for token in rf.split() if not BINDING.search(token))
+
+
+def rf_hierarchy(commands, max_group=None):
+    """
+    Group a set of RF labels by predicate template, for a two-level (predicate, then binding) output
+    layer. Groups larger than max_group (default: the square root of the number of RFs, rounded up)
+    are split into chunks, so no group dominates the cost of scoring its members.
+
+    :param commands: Dictionary mapping RF labels to ids (0 to num_rfs - 1)
+    :return: Tuple of group ids [num_rfs], positions within the group [num_rfs], and the member RF
+             ids of each group [num_groups, max_members] (padded with -1).
+    """
+    max_group = max_group or int(math.ceil(math.sqrt(len(commands))))
+    templates = {}
+    for rf, rf_id in sorted(commands.items(), key=lambda x: x[1]):
+        templates.setdefault(rf_predicate(rf), []).append(rf_id)
+
+    groups = []
+    for template in sorted(templates):
+        rf_ids = templates[template]
+        groups.extend(rf_ids[i:i + max_group] for i in range(0, len(rf_ids), max_group))
+
+    group_of, member_of = np.zeros(len(commands), dtype=np.int32), np.zeros(len(commands), dtype=np.int32)
+    members = -np.ones((len(groups), max(len(g) for g in groups)), dtype=np.int32)
+    for g, rf_ids in enumerate(groups):
+        group_of[rf_ids], member_of[rf_ids], members[g, :len(rf_ids)] = g, np.arange(len(rf_ids)), rf_ids
+    return group_of, member_of, members
@@ -5,6 +5,7 @@ Core script for loading, training, and evaluating the NPI model for grounding la
 to lifted reward functions.
 """
 from models.lg_npi import NPI
+from models import background_eval, training
 import tensorflow as tf
 
 FLAGS = tf.app.flags.FLAGS
@@ -26,21 +27,28 @@ tf.app.flags.DEFINE_string("ends_test_path", "data/unseen/goals", "Path to ends
 tf.app.flags.DEFINE_bool("is_pik", True, "Use pickled version of goals commands.")
 tf.app.flags.DEFINE_string("pik_train", "data/unseen/goals_train.pik", "Path to train pickle file.")
 tf.app.flags.DEFINE_string("pik_test", "data/unseen/goals_test.pik", "Path to test pickle file.")
+tf.app.flags.DEFINE_bool("pipeline", False, "Read training batches from the in-graph input pipeline.")
+tf.app.flags.DEFINE_integer("iterations", 25, "Maximum number of fit/evaluate iterations.")
+tf.app.flags.DEFINE_integer("eval_every", 1, "Number of iterations between evaluations.")
+tf.app.flags.DEFINE_integer("patience", 5, "Number of evaluations without improvement before stopping early (0 to disable).")
+tf.app.flags.DEFINE_bool("background_eval", False, "Evaluate snapshots in a background process, while training continues.")
 
 def main(_):
     # Create Model
     npi = NPI(FLAGS.means_train_path, FLAGS.ends_train_path, FLAGS.means_test_path, FLAGS.ends_test_path, is_pik=FLAGS.is_pik,
-              pik_train_path=FLAGS.pik_train, pik_test_path=FLAGS.pik_test)
+              pik_train_path=FLAGS.pik_train, pik_test_path=FLAGS.pik_test, pipeline=FLAGS.pipeline)
 
-    # Train Model + Evaluate
-    for i in range(25):
-        print 'ITERATION:', i + 1
-        npi.fit()
-        npi.eval_means()
-        npi.eval_ends()
+    # Train Model (Stopping Early, and Keeping the Best Weights, Once Validation Accuracy Stops Improving),
+    # then Evaluate the Best Weights on the Test Sets
+    evaluate = lambda score_batch=None: npi.eval_valid(score_batch)
+    evaluator = background_eval.BackgroundEvaluator(npi, evaluate, "checkpoints/npi_metrics.jsonl") if FLAGS.background_eval else None
+    training.train(npi, evaluate, FLAGS.iterations, FLAGS.eval_every, FLAGS.patience, checkpoint="checkpoints/npi_best.ckpt",
+                   evaluator=evaluator, test=lambda: (npi.eval_means(), npi.eval_ends()))
     
     # Save Model
     npi.saver.save(npi.session, "checkpoints/npi.ckpt")
+    npi.save_bundle("checkpoints/npi_bundle")
+    npi.export_frozen("checkpoints/npi_frozen")
 
 if __name__ == "__main__":
     tf.app.run()
\ No newline at end of file
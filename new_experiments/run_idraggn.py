@@ -5,6 +5,7 @@ Core script for loading, training, and evaluating the Conditionally Independent
 DRAGGN (I-DRAGGN) model for grounding language to lifted reward functions.
 """
 from models.i_draggn import IDRAGGN
+from models import background_eval, training
 import tensorflow as tf
 
 FLAGS = tf.app.flags.FLAGS
@@ -17,6 +18,13 @@ tf.app.flags.DEFINE_string("ends_test_path", "data/vanilla/goals", "Path to ends
 tf.app.flags.DEFINE_bool("is_pik", False, "Use pickled version of goals commands.")
 tf.app.flags.DEFINE_string("pik_train", "data/unseen/goals_train.pik", "Path to train pickle file.")
 tf.app.flags.DEFINE_string("pik_test", "data/unseen/goals_test.pik", "Path to test pickle file.")
+tf.app.flags.DEFINE_bool("pipeline", False, "Read training batches from the in-graph input pipeline.")
+tf.app.flags.DEFINE_bool("fused", False, "Train both heads with a single fused gradient step.")
+tf.app.flags.DEFINE_bool("fused_encoder", False, "Run both encoders as a single block-diagonal GRU.")
+tf.app.flags.DEFINE_integer("iterations", 25, "Maximum number of fit/evaluate iterations.")
+tf.app.flags.DEFINE_integer("eval_every", 1, "Number of iterations between evaluations.")
+tf.app.flags.DEFINE_integer("patience", 5, "Number of evaluations without improvement before stopping early (0 to disable).")
+tf.app.flags.DEFINE_bool("background_eval", False, "Evaluate snapshots in a background process, while training continues.")
 
 # Unseen Dataset
 # tf.app.flags.DEFINE_string("means_train_path", "data/unseen/unseen_train_actions.pik", "Path to means training data.")
@@ -30,17 +38,20 @@ tf.app.flags.DEFINE_string("pik_test", "data/unseen/goals_test.pik", "Path to te
 def main(_):
     # Create Model
     idraggn = IDRAGGN(FLAGS.means_train_path, FLAGS.ends_train_path, FLAGS.means_test_path, FLAGS.ends_test_path, is_pik=FLAGS.is_pik,
-                      pik_train_path=FLAGS.pik_train, pik_test_path=FLAGS.pik_test)
+                      pik_train_path=FLAGS.pik_train, pik_test_path=FLAGS.pik_test, pipeline=FLAGS.pipeline,
+                      fused=FLAGS.fused, fused_encoder=FLAGS.fused_encoder)
 
-    # Train Model + Evaluate
-    for i in range(25):
-        print 'ITERATION:', i + 1
-        idraggn.fit()
-        idraggn.eval_means()
-        idraggn.eval_ends()
+    # Train Model (Stopping Early, and Keeping the Best Weights, Once Validation Accuracy Stops Improving),
+    # then Evaluate the Best Weights on the Test Sets
+    evaluate = lambda score_batch=None: idraggn.eval_valid(score_batch)
+    evaluator = background_eval.BackgroundEvaluator(idraggn, evaluate, "checkpoints/idraggn_metrics.jsonl") if FLAGS.background_eval else None
+    training.train(idraggn, evaluate, FLAGS.iterations, FLAGS.eval_every, FLAGS.patience, checkpoint="checkpoints/idraggn_best.ckpt",
+                   evaluator=evaluator, test=lambda: (idraggn.eval_means(), idraggn.eval_ends()))
     
     # Save Model
     idraggn.saver.save(idraggn.session, "checkpoints/idraggn.ckpt")
+    idraggn.save_bundle("checkpoints/idraggn_bundle")
+    idraggn.export_frozen("checkpoints/idraggn_frozen")
 
 if __name__ == "__main__":
     tf.app.run()
\ No newline at end of file
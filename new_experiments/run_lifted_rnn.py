@@ -2,6 +2,7 @@
 run_lifted_rnn.py 
 """
 from models.lifted_rnn import LiftedRNN
+from models import background_eval, output_layers, training
 import tensorflow as tf
 
 FLAGS = tf.app.flags.FLAGS
@@ -13,6 +14,14 @@ tf.app.flags.DEFINE_string("ends_test_path", "data/vanilla/goals", "Path to ends
 tf.app.flags.DEFINE_bool("is_pik", False, "Use pickled version of goals commands.")
 tf.app.flags.DEFINE_string("pik_train", "data/unseen/goals_train.pik", "Path to train pickle file.")
 tf.app.flags.DEFINE_string("pik_test", "data/unseen/goals_test.pik", "Path to test pickle file.")
+tf.app.flags.DEFINE_bool("pipeline", False, "Read training batches from the in-graph input pipeline.")
+tf.app.flags.DEFINE_integer("iterations", 5, "Maximum number of fit/evaluate iterations.")
+tf.app.flags.DEFINE_integer("eval_every", 1, "Number of iterations between evaluations.")
+tf.app.flags.DEFINE_integer("patience", 2, "Number of evaluations without improvement before stopping early (0 to disable).")
+tf.app.flags.DEFINE_bool("background_eval", False, "Evaluate snapshots in a background process, while training continues.")
+tf.app.flags.DEFINE_string("output", "softmax", "Output layer over the reward functions: softmax, sampled, or hierarchical.")
+tf.app.flags.DEFINE_integer("num_sampled", 64, "Number of sampled reward functions per step (sampled output).")
+tf.app.flags.DEFINE_integer("beam", 4, "Number of predicate groups searched for top-k predictions (hierarchical output).")
 
 # Unseen Dataset
 # tf.app.flags.DEFINE_string("means_train_path", "data/unseen/unseen_train_actions.pik", "Path to means training data.")
@@ -24,15 +33,21 @@ tf.app.flags.DEFINE_string("pik_test", "data/unseen/goals_test.pik", "Path to te
 # tf.app.flags.DEFINE_string("pik_test", "data/unseen/goals_test.pik", "Path to test pickle file.")
 
 def main(_):
+    # Background evaluation scores NumPy exports, which need a dense output layer
+    if FLAGS.background_eval and FLAGS.output not in output_layers.EXPORTABLE:
+        raise ValueError("--background_eval needs one of the %s output layers (not '%s')" % (", ".join(output_layers.EXPORTABLE), FLAGS.output))
+
     # Create Model
     lifted_rnn = LiftedRNN(FLAGS.means_train_path, FLAGS.ends_train_path, FLAGS.means_test_path, FLAGS.ends_test_path,
-                           is_pik=FLAGS.is_pik, pik_train_path=FLAGS.pik_train, pik_test_path=FLAGS.pik_test)
+                           is_pik=FLAGS.is_pik, pik_train_path=FLAGS.pik_train, pik_test_path=FLAGS.pik_test, pipeline=FLAGS.pipeline,
+                           output=FLAGS.output, num_sampled=FLAGS.num_sampled, beam=FLAGS.beam)
 
-    # Fit Model 5 Times, Running Evaluation Epochs 
-    for _ in range(5):
-        lifted_rnn.fit()
-        lifted_rnn.eval_means()
-        lifted_rnn.eval_ends()
+    # Train Model (Stopping Early, and Keeping the Best Weights, Once Validation Accuracy Stops Improving),
+    # then Evaluate the Best Weights on the Test Sets
+    evaluate = lambda score_batch=None: lifted_rnn.eval_valid(score_batch)
+    evaluator = background_eval.BackgroundEvaluator(lifted_rnn, evaluate, "checkpoints/lifted_rnn_metrics.jsonl") if FLAGS.background_eval else None
+    training.train(lifted_rnn, evaluate, FLAGS.iterations, FLAGS.eval_every, FLAGS.patience, checkpoint="checkpoints/lifted_rnn_best.ckpt",
+                   evaluator=evaluator, test=lambda: (lifted_rnn.eval_means(), lifted_rnn.eval_ends()))
     
 if __name__ == "__main__":
     tf.app.run()
\ No newline at end of file
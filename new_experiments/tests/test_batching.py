@@ -0,0 +1,82 @@
+"""
+Tests for models/batching.py.
+"""
+import threading
+import unittest
+
+import numpy as np
+
+from models import batching
+
+
+class BucketBatchesTest(unittest.TestCase):
+    def test_covers_every_example_once(self):
+        lengths = np.random.RandomState(0).randint(1, 30, 1000)
+        batches = batching.bucket_batches(lengths, 32, np.random.RandomState(1))
+        self.assertEqual(sorted(np.concatenate(batches)), range(1000))
+        self.assertTrue(all(len(b) <= 32 for b in batches))
+
+    def test_batches_are_sorted_within_pools(self):
+        lengths = np.random.RandomState(0).randint(1, 30, 640)
+        batches = batching.bucket_batches(lengths, 32, np.random.RandomState(1), pool_batches=20)
+        spread = np.mean([lengths[b].max() - lengths[b].min() for b in batches])
+        self.assertLess(spread, 5)
+
+    def test_reproducible(self):
+        lengths = np.arange(100) % 7
+        first = batching.bucket_batches(lengths, 8, np.random.RandomState(3))
+        second = batching.bucket_batches(lengths, 8, np.random.RandomState(3))
+        self.assertTrue(all((a == b).all() for a, b in zip(first, second)))
+
+
+class MiniBatchesTest(unittest.TestCase):
+    def setUp(self):
+        self.X_len = np.random.RandomState(0).randint(1, 10, 100)
+        self.X = np.zeros((100, 10), dtype=np.int32)
+        self.Y = np.arange(100)
+
+    def test_epoch_trims_to_longest_sentence(self):
+        for prefetch in [0, 2]:
+            batches = list(batching.MiniBatches(self.X, self.X_len, self.Y, 16, prefetch=prefetch).epoch())
+            self.assertEqual(sorted(np.concatenate([Y for _, _, Y in batches])), range(100))
+            for X, X_len, _ in batches:
+                self.assertEqual(X.shape[1], X_len.max())
+
+    def test_gather_error_is_reraised(self):
+        minibatches = batching.MiniBatches(self.X, self.X_len, self.Y, 16)
+
+        def gather(idx):
+            raise ValueError("bad batch")
+        minibatches.gather = gather
+        with self.assertRaises(ValueError):
+            list(minibatches.epoch())
+
+    def test_stopping_early_stops_the_producer(self):
+        epoch = batching.MiniBatches(self.X, self.X_len, self.Y, 1, prefetch=1).epoch()
+        next(epoch)
+        epoch.close()
+        self.assertFalse([t for t in threading.enumerate() if t.name == "MiniBatches"])
+
+
+class HoldOutTest(unittest.TestCase):
+    def test_splits_every_example_once(self):
+        X, Y = np.arange(200).reshape(100, 2), np.arange(100)
+        (train_X, train_Y), (valid_X, valid_Y) = batching.hold_out([X, Y], 0.1)
+        self.assertEqual((len(train_Y), len(valid_Y)), (90, 10))
+        self.assertEqual(sorted(np.concatenate([train_Y, valid_Y])), range(100))
+        self.assertTrue((train_X[:, 1] == 2 * train_Y + 1).all() and (valid_X[:, 1] == 2 * valid_Y + 1).all())
+
+    def test_seeded(self):
+        first = batching.hold_out([np.arange(50)])[1][0]
+        self.assertTrue((first == batching.hold_out([np.arange(50)])[1][0]).all())
+        self.assertFalse((first == batching.hold_out([np.arange(50)], seed=8)[1][0]).all())
+
+    def test_keeps_a_training_example(self):
+        self.assertEqual([len(a[0]) for a in batching.hold_out([np.arange(3)], 0.9)], [1, 2])
+        self.assertEqual([len(a[0]) for a in batching.hold_out([np.arange(1)], 0.1)], [1, 0])
+        with self.assertRaises(ValueError):
+            batching.hold_out([np.arange(10)], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
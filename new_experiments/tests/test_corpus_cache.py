@@ -0,0 +1,72 @@
+"""
+Tests for models/corpus_cache.py.
+"""
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from models import corpus_cache
+
+
+class Parser():
+    def __init__(self):
+        self.path, self.parses = "corpus", 0
+
+    def parse(self):
+        self.parses += 1
+        self.raw = ["go to the red room", "go to the blue room"]
+        self.x = np.arange(6, dtype=np.uint8).reshape(2, 3)
+        return {'x': self.x, 'vocab': {'go': 0, 'to': 1}}
+
+
+class CorpusCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.source = tempfile.NamedTemporaryFile(dir=self.cache_dir, delete=False)
+        self.source.write("go to the red room\n")
+        self.source.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def load(self, parser):
+        return corpus_cache.cached("Parser", [self.source.name], [__file__],
+                                   lambda: corpus_cache.compile_into(parser, parser.parse), self.cache_dir)
+
+    def test_hit_matches_miss(self):
+        miss_parser, hit_parser = Parser(), Parser()
+        miss, hit = self.load(miss_parser), self.load(hit_parser)
+        self.assertEqual((miss_parser.parses, hit_parser.parses), (1, 0))
+        self.assertEqual(sorted(miss), ['vocab', 'x'])
+        self.assertTrue((hit['x'] == np.arange(6).reshape(2, 3)).all())
+        self.assertEqual(hit['x'].dtype, np.uint8)
+        self.assertEqual(hit['vocab'], miss['vocab'])
+
+    def test_compile_into_drops_parse_side_effects(self):
+        parser = Parser()
+        self.load(parser)
+        self.assertEqual(sorted(vars(parser)), ['parses', 'path'])
+
+    def test_source_change_invalidates(self):
+        self.load(Parser())
+        with open(self.source.name, 'a') as f:
+            f.write("go to the blue room\n")
+        parser = Parser()
+        self.load(parser)
+        self.assertEqual(parser.parses, 1)
+
+    def test_index_dtype(self):
+        self.assertEqual(corpus_cache.index_dtype(256), np.uint8)
+        self.assertEqual(corpus_cache.index_dtype(257), np.uint16)
+        self.assertEqual(corpus_cache.index_dtype(1 << 16), np.uint16)
+        self.assertEqual(corpus_cache.index_dtype((1 << 16) + 1), np.int32)
+
+    def test_renumber(self):
+        lookup = corpus_cache.renumber([0, 7, 3, 7, 1, 5], 8, reserved=2)
+        self.assertEqual(list(lookup), [0, 1, -1, 3, -1, 4, -1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
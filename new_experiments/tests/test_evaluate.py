@@ -0,0 +1,51 @@
+"""
+Tests for models/evaluate.py.
+"""
+import unittest
+
+import numpy as np
+
+from models import evaluate
+
+
+def first_token(X, X_len):
+    return X[:, 0].copy(), X_len.copy()
+
+
+class EvaluateTest(unittest.TestCase):
+    def test_predict_concatenates_batches(self):
+        X, X_len = np.arange(20).reshape(10, 2), np.arange(10)
+        first, lengths = evaluate.predict(first_token, X, X_len, batch_size=3)
+        self.assertEqual(list(first), range(0, 20, 2))
+        self.assertEqual(list(lengths), range(10))
+
+    def test_predict_empty_split(self):
+        outputs = evaluate.predict(first_token, np.zeros((0, 2)), np.zeros(0))
+        self.assertEqual([len(out) for out in outputs], [0, 0])
+
+    def test_segment_index(self):
+        self.assertEqual(list(evaluate.segment_index([2, 1, 3])), [0, 0, 1, 2, 2, 2])
+        self.assertEqual(list(evaluate.segment_index([])), [])
+
+    def test_sentence_accuracy(self):
+        sentence_idx = evaluate.segment_index([2, 1, 3])
+        correct = np.array([True, True, False, True, False, True])
+        self.assertAlmostEqual(evaluate.sentence_accuracy(correct, sentence_idx), 1.0 / 3)
+        self.assertAlmostEqual(evaluate.sentence_accuracy(np.ones(6, dtype=bool), sentence_idx), 1.0)
+
+    def test_eval_programs(self):
+        X, X_len = np.array([[1, 0], [2, 0], [3, 0]]), np.array([1, 1, 1])
+        metrics = evaluate.eval_programs(lambda X, X_len: (X[:, 0], X[:, 1]), X, X_len, np.array([1, 2, 0]),
+                                         np.array([0, 0, 1]), evaluate.segment_index([2, 1]))
+        self.assertAlmostEqual(metrics['program'], 2.0 / 3)
+        self.assertAlmostEqual(metrics['argument'], 2.0 / 3)
+        self.assertAlmostEqual(metrics['overall'], 2.0 / 3)
+        self.assertAlmostEqual(metrics['sentence'], 0.5)
+
+    def test_eval_labels(self):
+        X, X_len = np.array([[4], [5], [6]]), np.ones(3)
+        self.assertAlmostEqual(evaluate.eval_labels(first_token, X, X_len, np.array([4, 0, 6])), 2.0 / 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
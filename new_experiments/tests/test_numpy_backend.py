@@ -0,0 +1,38 @@
+"""
+Tests for models/numpy_backend.py: the NumPy GRU against tf.contrib.rnn.GRUCell, with the same weights.
+"""
+import unittest
+
+import numpy as np
+import tensorflow as tf
+
+from models import export, numpy_backend
+
+
+class GRUTest(unittest.TestCase):
+    def test_matches_tensorflow(self):
+        rng = np.random.RandomState(0)
+        bsz, max_len, input_sz, rnn_sz = 5, 7, 4, 6
+        inputs = rng.randn(bsz, max_len, input_sz).astype(np.float32)
+        lengths = np.array([7, 3, 1, 0, 5])
+
+        graph = tf.Graph()
+        with graph.as_default():
+            cell = tf.contrib.rnn.GRUCell(rnn_sz)
+            _, state = tf.nn.dynamic_rnn(cell, tf.constant(inputs), sequence_length=lengths, dtype=tf.float32)
+            gru_vars = tf.trainable_variables()
+            with tf.Session(graph=graph) as session:
+                session.run(tf.global_variables_initializer())
+                expected, weights = session.run([state, dict(zip(export.GRU_WEIGHTS, gru_vars))])
+
+        actual = numpy_backend.gru(inputs, lengths, *[weights[key] for key in export.GRU_WEIGHTS])
+        np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=1e-5)
+        self.assertFalse(actual[3].any())
+
+    def test_empty_batch(self):
+        weights = [np.zeros((5, 4)), np.zeros(4), np.zeros((5, 2)), np.zeros(2)]
+        self.assertEqual(numpy_backend.gru(np.zeros((0, 3, 3)), np.zeros(0, dtype=int), *weights).shape, (0, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
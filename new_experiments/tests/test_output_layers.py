@@ -0,0 +1,66 @@
+"""
+Tests for models/output_layers.py.
+"""
+import unittest
+
+import numpy as np
+import tensorflow as tf
+
+from models import embedding, output_layers
+
+HIDDEN_SZ = 8
+
+
+def commands(num_rfs):
+    return {"agentInRegion agent0 room%d" % i: i for i in range(num_rfs)}
+
+
+class OutputLayerTest(unittest.TestCase):
+    def build(self, output, num_rfs, **kwargs):
+        graph = tf.Graph()
+        with graph.as_default():
+            tf.set_random_seed(0)
+            hidden = tf.placeholder(tf.float32, [None, HIDDEN_SZ])
+            labels = tf.placeholder(tf.int64, [None])
+            layer = output_layers.build(output, hidden, HIDDEN_SZ, commands(num_rfs),
+                                        tf.truncated_normal_initializer(stddev=0.5), **kwargs)
+            loss, accuracy = layer.loss(labels), layer.train_accuracy(labels)
+            train_op = embedding.optimizer().minimize(loss)
+        return graph, hidden, labels, layer, (loss, accuracy, train_op)
+
+    def test_sampled_training_step_skips_full_logits(self):
+        graph, _, _, layer, fetches = self.build('sampled', 500, num_sampled=16)
+        sub_graph = tf.graph_util.extract_sub_graph(graph.as_graph_def(), [getattr(t, 'op', t).name for t in fetches])
+        self.assertNotIn(layer.logits.op.name, [node.name for node in sub_graph.node])
+
+    def test_sampled_training_accuracy(self):
+        # With every RF sampled, the sampled accuracy is the full accuracy
+        graph, hidden, labels, layer, (_, accuracy, _) = self.build('sampled', HIDDEN_SZ, num_sampled=HIDDEN_SZ)
+        with tf.Session(graph=graph) as session:
+            session.run(tf.global_variables_initializer())
+            session.run([layer.W.assign(np.eye(HIDDEN_SZ)), layer.B.assign(np.zeros(HIDDEN_SZ))])
+            h = np.eye(HIDDEN_SZ)[[0, 3, 5, 7]]
+            self.assertEqual(session.run(accuracy, {hidden: h, labels: [0, 3, 5, 7]}), 1.0)
+            self.assertEqual(session.run(accuracy, {hidden: h, labels: [0, 3, 6, 6]}), 0.5)
+
+    def test_hierarchical_top_k_never_returns_padding(self):
+        # 3 groups (Right: 1 RF, agentInRegion: 3 + 2 RFs) of 3 slots, so 3 of the 9 beam slots are padding
+        rfs = ["agentInRegion agent0 room%d" % i for i in range(5)] + ["Right 1"]
+        graph = tf.Graph()
+        with graph.as_default():
+            hidden, k = tf.placeholder(tf.float32, [None, HIDDEN_SZ]), tf.placeholder(tf.int32, [])
+            layer = output_layers.build('hierarchical', hidden, HIDDEN_SZ, {rf: i for i, rf in enumerate(rfs)},
+                                        tf.truncated_normal_initializer(stddev=0.5), beam=4)
+            top_ids, top_probs = layer.top_k(k)
+            with tf.Session(graph=graph) as session:
+                session.run(tf.global_variables_initializer())
+                h = np.random.RandomState(0).randn(4, HIDDEN_SZ)
+                ids, probs = session.run([top_ids, top_probs], {hidden: h, k: 9})
+                self.assertEqual(ids.shape, (4, 6))
+                self.assertTrue(all(sorted(row) == range(6) for row in ids.tolist()))
+                np.testing.assert_allclose(probs.sum(axis=1), 1.0, rtol=1e-5)
+                self.assertEqual(session.run(top_ids, {hidden: h, k: 2}).shape, (4, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
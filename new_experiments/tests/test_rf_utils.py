@@ -0,0 +1,80 @@
+"""
+Tests for models/rf_utils.py.
+"""
+import unittest
+
+import numpy as np
+
+from models import rf_utils
+
+
+class ProgramArgumentTest(unittest.TestCase):
+    def setUp(self):
+        self.id2prog = {0: 'Up', 1: 'agentInRegion', 2: 'Left'}
+        self.id2arg = {0: '3', 1: 'roomIsRed', 2: '5', 3: 'roomIsBlue'}
+
+    def test_arg_mask(self):
+        mask = rf_utils.arg_mask(self.id2prog, self.id2arg)
+        self.assertEqual(mask.tolist(), [[True, False, True, False], [False, True, False, True],
+                                         [True, False, True, False]])
+
+    def test_masked_argmax(self):
+        mask = rf_utils.arg_mask(self.id2prog, self.id2arg)
+        prog_logits = np.array([[0.9, 0.1, 0.0], [0.1, 0.9, 0.0], [0.0, 0.1, 0.9]])
+        arg_logits = np.array([[0.1, 0.9, 0.5, 0.0], [0.9, 0.1, 0.5, 0.3], [0.3, 0.2, 0.1, 0.0]])
+        pred_prog, pred_arg = rf_utils.masked_argmax(prog_logits, arg_logits, mask)
+        self.assertEqual(pred_prog.tolist(), [0, 1, 2])
+        self.assertEqual(pred_arg.tolist(), [2, 3, 0])
+
+    def test_masked_argmax_without_valid_arguments(self):
+        mask = np.array([[False, False], [True, False]])
+        pred_prog, pred_arg = rf_utils.masked_argmax(np.array([[1.0, 0.0], [0.0, 1.0]]), np.ones((2, 2)), mask)
+        self.assertEqual(pred_prog.tolist(), [0, 1])
+        self.assertEqual(pred_arg.tolist(), [-1, 0])
+
+    def test_vectorize(self):
+        X, X_len = rf_utils.vectorize(["go up", "go to the red room"], {'PAD': 0, 'UNK': 1, 'go': 2, 'up': 3}, 3, 1)
+        self.assertEqual(X.tolist(), [[2, 3, 0], [2, 1, 1]])
+        self.assertEqual(X_len.tolist(), [2, 3])
+        self.assertEqual(X.dtype, np.uint8)
+
+    def test_rf_string(self):
+        self.assertEqual(rf_utils.rf_string('Up', '3'), "Up | Up | Up")
+        self.assertEqual(rf_utils.rf_string('agentInRegion', 'roomIsRed'), "agentInRegion | roomIsRed")
+        self.assertEqual(rf_utils.rf_string('agentInRegion_blockInRegion', 'roomIsRed'),
+                         "agentInRegion | roomIsRed | blockInRegion | NONE")
+
+
+class HierarchyTest(unittest.TestCase):
+    def setUp(self):
+        rfs = ["agentInRegion agent0 room%d" % i for i in range(5)] + ["Right %d" % i for i in range(1, 4)] + \
+              ["agentInRegion agent0 room1 blockInRegion block0 room2"]
+        self.commands = {rf: i for i, rf in enumerate(rfs)}
+
+    def test_rf_predicate(self):
+        self.assertEqual(rf_utils.rf_predicate("agentInRegion agent0 room1"), "agentInRegion")
+        self.assertEqual(rf_utils.rf_predicate("Right 4"), "Right")
+        self.assertEqual(rf_utils.rf_predicate("agentInRegion roomIsRed blockInRegion roomIsBlue"),
+                         "agentInRegion blockInRegion")
+
+    def test_groups_cover_every_rf_once(self):
+        group_of, member_of, members = rf_utils.rf_hierarchy(self.commands)
+        self.assertEqual(members[group_of, member_of].tolist(), range(len(self.commands)))
+        self.assertEqual(sorted(members[members >= 0].tolist()), range(len(self.commands)))
+
+    def test_groups_share_a_predicate(self):
+        group_of, _, members = rf_utils.rf_hierarchy(self.commands)
+        id2rf = {i: rf for rf, i in self.commands.items()}
+        for row in members:
+            self.assertEqual(len(set(rf_utils.rf_predicate(id2rf[i]) for i in row if i >= 0)), 1)
+
+    def test_large_groups_are_split(self):
+        _, _, members = rf_utils.rf_hierarchy(self.commands)
+        self.assertEqual(members.shape, (4, 3))
+        _, _, members = rf_utils.rf_hierarchy(self.commands, max_group=2)
+        self.assertEqual(members.shape, (6, 2))
+        self.assertEqual((members >= 0).sum(axis=1).tolist(), [2, 1, 2, 2, 1, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
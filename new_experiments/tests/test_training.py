@@ -0,0 +1,65 @@
+"""
+Tests for models/training.py, with a stand-in model whose "weights" are an iteration counter.
+"""
+import unittest
+
+from models import training
+
+
+class CounterSaver():
+    def __init__(self, model):
+        self.model, self.saved = model, {}
+
+    def save(self, session, path):
+        self.saved[path] = self.model.weights
+
+    def restore(self, session, path):
+        self.model.weights = self.saved[path]
+
+
+class CounterModel():
+    def __init__(self):
+        self.weights, self.session = 0, None
+        self.saver = CounterSaver(self)
+
+    def fit(self):
+        self.weights += 1
+
+
+class TrainTest(unittest.TestCase):
+    def test_restores_best_weights_without_checkpoint(self):
+        model, scores = CounterModel(), [0.5, 0.9, 0.3, 0.2]
+        best, history = training.train(model, lambda: scores[model.weights - 1], iterations=4)
+        self.assertEqual(best, 0.9)
+        self.assertEqual(history, [(1, 0.5), (2, 0.9), (3, 0.3), (4, 0.2)])
+        self.assertEqual(model.weights, 2)
+
+    def test_stops_early(self):
+        model, scores = CounterModel(), [0.5, 0.9, 0.3, 0.2, 0.1, 0.95]
+        _, history = training.train(model, lambda: scores[model.weights - 1], iterations=6, patience=2)
+        self.assertEqual([i for i, _ in history], [1, 2, 3, 4])
+        self.assertEqual(model.weights, 2)
+
+    def test_last_iteration_is_always_evaluated(self):
+        _, history = training.train(CounterModel(), lambda: 1.0, iterations=3, eval_every=5)
+        self.assertEqual(history, [(3, 1.0)])
+
+    def test_no_iterations(self):
+        self.assertEqual(training.train(CounterModel(), lambda: 1.0, iterations=0), (None, []))
+
+    def test_tests_best_weights_once(self):
+        model, scores, tested = CounterModel(), [0.5, 0.9, 0.3], []
+        test = lambda: tested.append(model.weights) or 'test results'
+        results, history = training.train(model, lambda: scores[model.weights - 1], iterations=3, test=test)
+        self.assertEqual(results, 'test results')
+        self.assertEqual(tested, [2])
+        self.assertEqual(len(history), 3)
+
+    def test_no_test_without_evaluations(self):
+        tested = []
+        self.assertEqual(training.train(CounterModel(), lambda: 1.0, iterations=0, test=lambda: tested.append(1)), (None, []))
+        self.assertEqual(tested, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+#array-backed domains and bulk grounding of lifted RFs
+
+#domains are rows of an integer table (the room ID bound to each binding constraint, start and block position), and
+#lifted RFs are interned once as arrays of prop function IDs and binding constraint IDs. grounding N RFs in their
+#domains (or in each of M domains) is then a single gather from the table, and grounded RFs are only formatted once
+#per distinct (lifted RF, rooms) combination.
+
+from itertools import permutations, product
+
+import numpy as np
+from domains import id2domain
+
+BINDINGS = ['roomIsGreen', 'roomIsRed', 'roomIsBlue', 'start', 'block'] #columns of the domain table
+ROOMS = ['room0', 'room1', 'room2']
+OBJECTS = {'agentInRegion': 'agent0'} #object bound by each prop function (any other prop binds block0)
+
+class DomainTable():
+    def __init__(self, domains, names=None):
+        self.rooms = sorted(set(ROOMS) | set(room for domain in domains for room in domain.values()))
+        room_ids = {room: i for i, room in enumerate(self.rooms)}
+        self.table = np.array([[room_ids[domain[binding]] for binding in BINDINGS] for domain in domains], dtype=np.int32)
+        self.names = names or [str(i) for i in range(len(domains))]
+
+    #table of the predefined domains (rows in order of domain ID), named by domain ID
+    @staticmethod
+    def predefined():
+        ids = sorted(id2domain, key=int)
+        return DomainTable([id2domain[i] for i in ids], ids)
+
+    #table of every domain configuration: each assignment of the colors to the rooms, start room and block room
+    @staticmethod
+    def configurations(rooms=ROOMS):
+        domains = []
+        for colors, start, block in product(permutations(rooms), rooms, rooms):
+            domain = dict(zip(BINDINGS[:3], colors))
+            domain.update({'start': start, 'block': block})
+            domains.append(domain)
+        return DomainTable(domains, ['c{}'.format(i) for i in range(len(domains))])
+
+    def __len__(self):
+        return len(self.table)
+
+    def domain(self, i):
+        return {binding: self.rooms[room] for binding, room in zip(BINDINGS, self.table[i])}
+
+    #domains as lines of binding=room pairs (loaded back with load)
+    def save(self, filename):
+        with open(filename, 'w') as f:
+            f.write("\n".join("{} {}".format(name, " ".join("{}={}".format(b, r) for b, r in sorted(self.domain(i).items())))
+                              for i, name in enumerate(self.names)))
+
+    #domains by name, as dictionaries (like domains.id2domain)
+    def id2domain(self):
+        return {name: self.domain(i) for i, name in enumerate(self.names)}
+
+    @staticmethod
+    def load(filename):
+        with open(filename, 'r') as f:
+            lines = [line.split() for line in f if line.strip()]
+        return DomainTable([dict(pair.split('=') for pair in line[1:]) for line in lines], [line[0] for line in lines])
+
+#lifted RFs interned as arrays: the distinct RFs, the distinct RF ID of each RF, and for each distinct RF its prop
+#function and binding constraint IDs (shape [num_distinct, max_props], padded with -1)
+class InternedRFs():
+    def __init__(self, lifted_rfs):
+        self.lifted, self.rf_ids = np.unique([" ".join(rf.split()) for rf in lifted_rfs], return_inverse=True)
+        self.props = sorted(set(prop for rf in self.lifted for prop in rf.split()[::2]))
+        prop_ids = {prop: i for i, prop in enumerate(self.props)}
+
+        pairs = [rf.split() for rf in self.lifted]
+        for rf, rf_list in zip(self.lifted, pairs):
+            assert len(rf_list) % 2 == 0, "reward function {} is invalid".format(rf)
+        width = max([len(rf_list) // 2 for rf_list in pairs] + [1])
+        self.prop_ids = -np.ones((len(self.lifted), width), dtype=np.int32)
+        self.binding_ids = -np.ones((len(self.lifted), width), dtype=np.int32)
+        for i, rf_list in enumerate(pairs):
+            self.prop_ids[i, :len(rf_list) // 2] = [prop_ids[prop] for prop in rf_list[::2]]
+            self.binding_ids[i, :len(rf_list) // 2] = [BINDINGS.index(binding) for binding in rf_list[1::2]]
+
+    def __len__(self):
+        return len(self.rf_ids)
+
+#grounds lifted RFs in bulk. ground returns integer codes of the grounded RFs (one per (lifted RF, rooms) combination),
+#and strings formats codes into grounded RF strings, formatting each distinct code once
+class Grounder():
+    def __init__(self, interned, domains):
+        self.interned, self.domains = interned, domains
+        self.base = len(domains.rooms)
+        self.width = interned.binding_ids.shape[1]
+        self.formatted = {}
+
+    #codes of the lifted RFs grounded in the given domains: with a domain ID per RF (shape [N]), one code per RF;
+    #with cross, every RF in every domain (shape [N, M])
+    def ground(self, domain_ids=None, cross=False):
+        bindings = self.interned.binding_ids[self.interned.rf_ids]                         #[N, width]
+        if cross:
+            rooms = self.domains.table[:, np.maximum(bindings, 0)].transpose(1, 0, 2)   #[N, M, width]
+            rf_ids = self.interned.rf_ids[:, None]
+        else:
+            rooms = self.domains.table[np.asarray(domain_ids)[:, None], np.maximum(bindings, 0)] #[N, width]
+            rf_ids = self.interned.rf_ids
+        rooms = np.where((bindings >= 0)[:, None, :] if cross else bindings >= 0, rooms, 0)
+        codes = rf_ids.astype(np.int64)
+        for p in range(self.width):
+            codes = codes * self.base + rooms[..., p]
+        return codes
+
+    #grounded RF string of a code
+    def format(self, code):
+        if code not in self.formatted:
+            rf_id, rooms = code, []
+            for _ in range(self.width):
+                rf_id, room = divmod(rf_id, self.base)
+                rooms.append(room)
+            grounded = []
+            for prop, room in zip(self.interned.prop_ids[rf_id], rooms[::-1]):
+                if prop >= 0:
+                    prop = self.interned.props[prop]
+                    grounded.append("{} {} {}".format(prop, OBJECTS.get(prop, 'block0'), self.domains.rooms[room]))
+            self.formatted[code] = " ".join(grounded)
+        return self.formatted[code]
+
+    #grounded RF strings of an array of codes
+    def strings(self, codes):
+        distinct, inverse = np.unique(codes, return_inverse=True)
+        return np.array([self.format(code) for code in distinct], dtype=object)[inverse].reshape(np.shape(codes))
+
+#streams grounded RFs (and their domain names) to files, formatting and writing chunk_size RFs at a time
+def write_grounded(grounder, codes, domain_ids, rf_file, domain_file, chunk_size=100000):
+    codes, domain_ids = np.asarray(codes).ravel(), np.asarray(domain_ids).ravel()
+    names = np.array(grounder.domains.names, dtype=object)
+    with open(rf_file, 'w') as rf_f, open(domain_file, 'w') as domain_f:
+        for start in range(0, len(codes), chunk_size):
+            separator = "\n" if start > 0 else ""
+            rf_f.write(separator + "\n".join(grounder.strings(codes[start:start + chunk_size])))
+            domain_f.write(separator + "\n".join(names[domain_ids[start:start + chunk_size]]))
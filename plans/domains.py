@@ -23,3 +23,9 @@ cd_6 = {'roomIsGreen': 'room0', 'roomIsRed':'room2', 'roomIsBlue':'room1', 'star
 
 #mapping from domain ID to dictionary
 id2domain = {'1':cd_1, '2':cd_2, '3':cd_3, '4':cd_4, '5':cd_5, '6':cd_6}
+
+#grid layout of the cleanupclassic map, shared by all the domains above (they only differ in room colors, and agent/block start rooms)
+#rooms are (left, right, bottom, top) wall coordinates, doors are (x, y) gaps in the walls
+cleanup_classic = {'rooms': {'room0': (0, 8, 0, 4), 'room1': (0, 4, 4, 8), 'room2': (4, 8, 4, 8)},
+                   'doors': [(6, 4), (2, 4)], #room0 opens onto room2 and room1 (as in the RSS traces)
+                   'cells': {'room0': (2, 2), 'room1': (2, 6), 'room2': (6, 6)}} #start position of an agent/block in each room
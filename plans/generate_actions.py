@@ -3,36 +3,40 @@
 from sys import argv
 from argparse import ArgumentParser
 from ground_rf import ground_rf
+from randomize_grounding import save_strings, load_strings
+from domain_table import DomainTable
+import domains
 import plans
 
 def parse(args):
     parser = ArgumentParser()
-    parser.parse_args("--rf", help="list of reward functions")
-    parser.parse_args("--domain", help="domain ID") #TODO: multiple domains in same file?
-    parser.parse_args("--lifted", help="if reward functions are lifted", action="store_true")
-    parser.parse_args("--out", help="list of action sequences")
+    parser.add_argument("--rf", help="list of reward functions")
+    parser.add_argument("--domain", help="domain ID")
+    parser.add_argument("--domains", help="list of corresponding domain IDs for each RF (instead of --domain)")
+    parser.add_argument("--domain_table", help="domain table the domain IDs refer to (as saved by randomize_grounding.py --configurations)")
+    parser.add_argument("--lifted", help="if reward functions are lifted", action="store_true")
+    parser.add_argument("--out", help="list of action sequences")
     return parser.parse_args(args)
 
 def run(args):
-    domain = domains.id2domain[args.domain]
-    plan_dict = plans.id2plans[args.domain]
-
-    #load reward functions
-    with open(args.rf, 'r') as f:
-        rfs = [rf.strip() for rf in f]
+    #load reward functions, and the domain of each
+    rfs = load_strings(args.rf)
+    domain_ids = load_strings(args.domains) if args.domains else [args.domain] * len(rfs)
+    id2domain = DomainTable.load(args.domain_table).id2domain() if args.domain_table else domains.id2domain
 
     #if lifted, produce grounded rfs
-
     if args.lifted:
-        grounded_rfs = [ground_rf(lifted, domain) for lifted in rfs]
+        grounded_rfs = [ground_rf(lifted, id2domain[domain_id]) for lifted, domain_id in zip(rfs, domain_ids)]
     else:
         grounded_rfs = rfs
 
-    #get pre-computed actions from dictionary
-    actions = [" ".join(plan_dict[grounded_rf]) for grounded_rfs in grounded_rfs]
+    #plan actions (memoized, so repeated (domain, RF) pairs are only planned once)
+    actions = []
+    for grounded_rf, domain_id in zip(grounded_rfs, domain_ids):
+        plan = plans.get_plan(id2domain[domain_id], grounded_rf)
+        actions.append("NONE" if plan is None else " ".join(plan))
 
-    with open(args.out, 'w') as f:
-        f.write("\n".join(actions))
+    save_strings(args.out, actions)
 
 if __name__=="__main__":
     run(parse(argv[1:]))
@@ -1,8 +1,8 @@
 #grounding lifted reward functions
 
-import domains
 from sys import argv
 from argparse import ArgumentParser
+from domain_table import DomainTable, InternedRFs, Grounder
 
 #produces a grounded reward function for the given domain.
 def ground_rf(lifted, domain):
@@ -26,12 +26,15 @@ def parse(args):
     return parser.parse_args(args)
 
 def run(args):
-    domain = domains.id2domain[args.domain]
     with open(args.rf, 'r') as f:
         lifted_rfs = [line.strip() for line in f]
     with open(args.domain, 'r') as f:
         domain_nums = [line.strip() for line in f]
-    grounded_rfs = [ground_rf(lifted.strip(), domains.id2domain[domain_id]) for lifted, domain_id in zip(lifted_rfs, domain_nums)]
+
+    #ground all RFs at once, from the table of predefined domains
+    table = DomainTable.predefined()
+    grounder = Grounder(InternedRFs(lifted_rfs), table)
+    grounded_rfs = grounder.strings(grounder.ground([table.names.index(domain_id) for domain_id in domain_nums]))
     with open(args.out, 'w') as f:
         f.write("\n".join(grounded_rfs))
 
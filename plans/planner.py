@@ -0,0 +1,106 @@
+#grid planner for the Cleanup domain: computes action plans for grounded agentInRegion/blockInRegion reward functions
+
+#states are (agent x, agent y, agent direction, block x, block y), flattened into indices of a state table.
+#the transitions of every state are precomputed with NumPy, and plans are found with a breadth-first search
+#over the whole state table at once (one search from a start state gives shortest plans to every goal).
+
+import numpy as np
+from domains import cleanup_classic
+from reward import RFEvaluator
+
+NORTH, SOUTH, EAST, WEST = 0, 1, 2, 3 #agent directions (the direction it last moved in)
+DX, DY = np.array([0, 0, 1, -1]), np.array([1, -1, 0, 0])
+
+#actions, with the direction they move the agent in (PULL pulls the block the agent is facing)
+ACTIONS = [('Up', NORTH), ('Down', SOUTH), ('Right', EAST), ('Left', WEST), ('PULL', None)]
+
+
+class CleanupPlanner():
+    def __init__(self, layout=cleanup_classic):
+        self.rooms, self.cells = layout['rooms'], layout['cells']
+        self.width = max(right for _, right, _, _ in self.rooms.values()) + 1
+        self.height = max(top for _, _, _, top in self.rooms.values()) + 1
+        self.shape = (self.width, self.height, len(DX), self.width, self.height)
+
+        #walls are the room boundaries, minus the doors
+        self.wall = np.zeros((self.width, self.height), dtype=bool)
+        for left, right, bottom, top in self.rooms.values():
+            self.wall[[left, right], bottom:top + 1] = True
+            self.wall[left:right + 1, [bottom, top]] = True
+        for x, y in layout['doors']:
+            self.wall[x, y] = False
+
+        self.transitions, self.collisions = self.build_transitions()
+        self.evaluator = RFEvaluator(layout)
+        self.searches = {} #breadth-first search trees, by start state
+
+    def free(self, x, y):
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        return inside & ~self.wall[np.clip(x, 0, self.width - 1), np.clip(y, 0, self.height - 1)]
+
+    #next state of every state, for every action, and whether the action collides (leaves the agent in place, against
+    #a wall or a block it can't push, or a PULL with no block to pull): each of shape [num_states, num_actions]
+    def build_transitions(self):
+        ax, ay, d, bx, by = np.unravel_index(np.arange(np.prod(self.shape)), self.shape)
+        transitions, collisions = [], []
+        for _, direction in ACTIONS:
+            if direction is not None:
+                #move (pushing the block, if it is in the way and the cell behind it is free)
+                tx, ty = ax + DX[direction], ay + DY[direction]
+                hit = (tx == bx) & (ty == by)
+                push = hit & self.free(bx + DX[direction], by + DY[direction])
+                move = self.free(tx, ty) & (~hit | push)
+                next_state = (np.where(move, tx, ax), np.where(move, ty, ay), np.full_like(d, direction),
+                              np.where(push, bx + DX[direction], bx), np.where(push, by + DY[direction], by))
+            else:
+                #pull the block the agent is facing, backing up into the cell behind the agent
+                facing = (ax + DX[d] == bx) & (ay + DY[d] == by)
+                pull = facing & self.free(ax - DX[d], ay - DY[d])
+                next_state = (np.where(pull, ax - DX[d], ax), np.where(pull, ay - DY[d], ay), d,
+                              np.where(pull, ax, bx), np.where(pull, ay, by))
+            transitions.append(np.ravel_multi_index(next_state, self.shape))
+            collisions.append((next_state[0] == ax) & (next_state[1] == ay))
+        return np.stack(transitions, axis=1).astype(np.int32), np.stack(collisions, axis=1)
+
+    #start state of a domain: agent and block at the start cells of their rooms, agent facing north
+    def start_state(self, domain):
+        (ax, ay), (bx, by) = self.cells[domain['start']], self.cells[domain['block']]
+        if (ax, ay) == (bx, by):
+            bx += 1
+        return np.ravel_multi_index((ax, ay, NORTH, bx, by), self.shape)
+
+    #states satisfying a grounded reward function, e.g. "agentInRegion agent0 room1 blockInRegion block0 room2"
+    def goal_states(self, grounded_rf):
+        ax, ay, _, bx, by = np.unravel_index(np.arange(len(self.transitions)), self.shape)
+        return self.evaluator.compile(grounded_rf).satisfied(np.stack([ax, ay], -1), np.stack([bx, by], -1))
+
+    #breadth-first search from a start state, expanding a whole frontier per step: returns the depth,
+    #parent state and action (into each state) of every state, memoized by start state
+    def search(self, start):
+        if start not in self.searches:
+            depth = -np.ones(len(self.transitions), dtype=np.int32)
+            parent, action = -np.ones_like(depth), -np.ones_like(depth)
+            depth[start], frontier = 0, np.array([start])
+            while frontier.size:
+                next_states = self.transitions[frontier].ravel()
+                sources, actions = np.repeat(frontier, len(ACTIONS)), np.tile(np.arange(len(ACTIONS)), len(frontier))
+                new = depth[next_states] < 0
+                frontier, first = np.unique(next_states[new], return_index=True)
+                parent[frontier], action[frontier] = sources[new][first], actions[new][first]
+                depth[frontier] = depth[sources[new][first]] + 1
+            self.searches[start] = (depth, parent, action)
+        return self.searches[start]
+
+    #shortest plan (list of action names) for a grounded reward function in a domain, or None if unreachable
+    def plan(self, domain, grounded_rf):
+        start = self.start_state(domain)
+        depth, parent, action = self.search(start)
+        reached = np.where(self.goal_states(grounded_rf) & (depth >= 0))[0]
+        if reached.size == 0:
+            return None
+
+        state, plan = reached[np.argmin(depth[reached])], []
+        while state != start:
+            plan.append(ACTIONS[action[state]][0])
+            state = parent[state]
+        return plan[::-1]
@@ -2,9 +2,10 @@
 
 from argparse import ArgumentParser
 from sys import argv
-from domains import id2domain
 import random as r
-from ground_rf import ground_rf #grounder
+
+import numpy as np
+from domain_table import DomainTable, InternedRFs, Grounder, write_grounded
 
 r.seed(0) #setting random seed
 
@@ -12,29 +13,34 @@ def parse(args):
     parser = ArgumentParser()
     parser.add_argument("--lifted", help="list of lifted RFs")
     parser.add_argument("--out", help="output path for saving ground truth groundings + list of domain numbers")
+    parser.add_argument("--configurations", help="draw from every domain configuration, rather than the predefined domains (saves the domain table too)", action="store_true")
+    parser.add_argument("--cross", help="ground every lifted RF in every domain, rather than in one random domain", action="store_true")
     return parser.parse_args(args)
 
 def load_strings(filename):
     with open(filename, 'r') as f:
         return [line.strip() for line in f]
 
+#one string per line, each ending in a newline (so a trailing empty string, e.g. an empty plan, is loaded back)
 def save_strings(filename, strings):
     with open(filename, 'w') as f:
-        f.write("\n".join(strings))
+        f.write("".join(string + "\n" for string in strings))
 
 def run(args):
     lifted_rfs = load_strings(args.lifted)
-
-    domain_list = [str(r.randint(1, len(id2domain.keys()))) for _ in range(len(lifted_rfs))]
-
-    grounded_rf = []
-
-    for lifted, domain_id in zip(lifted_rfs, domain_list):
-        domain = id2domain[domain_id]
-        grounded_rf.append(ground_rf(lifted,domain))
-
-    save_strings(args.out + "_grounded_gt.ml", grounded_rf)
-    save_strings(args.out + "_domain_numbers.txt", domain_list)
+    domains = DomainTable.configurations() if args.configurations else DomainTable.predefined()
+    grounder = Grounder(InternedRFs(lifted_rfs), domains)
+
+    if args.cross:
+        codes = grounder.ground(cross=True)
+        domain_list = np.broadcast_to(np.arange(len(domains)), codes.shape)
+    else:
+        domain_list = np.array([r.randint(1, len(domains)) - 1 for _ in range(len(lifted_rfs))], dtype=np.int32)
+        codes = grounder.ground(domain_list)
+
+    write_grounded(grounder, codes, domain_list, args.out + "_grounded_gt.ml", args.out + "_domain_numbers.txt")
+    if args.configurations:
+        domains.save(args.out + "_domains.txt")
 
 
 if __name__=="__main__":
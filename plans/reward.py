@@ -0,0 +1,80 @@
+#compiled reward functions: turns grounded RFs (e.g. "agentInRegion agent0 room1 blockInRegion block0 room2")
+#into vectorized predicates over arrays of Cleanup states, to check goal satisfaction and reward for many states at once
+
+import numpy as np
+from domains import cleanup_classic
+
+#interior cells of each room of a layout, as boolean masks of shape [width, height]
+def room_masks(layout=cleanup_classic):
+    rooms = layout['rooms']
+    width = max(right for _, right, _, _ in rooms.values()) + 1
+    height = max(top for _, _, _, top in rooms.values()) + 1
+    masks = {}
+    for room, (left, right, bottom, top) in rooms.items():
+        masks[room] = np.zeros((width, height), dtype=bool)
+        masks[room][left + 1:right, bottom + 1:top] = True
+    return masks
+
+#whether each (x, y) position (int array of shape [..., 2]) is on a grid of the given shape
+def on_grid(shape, xy):
+    return (xy[..., 0] >= 0) & (xy[..., 0] < shape[0]) & (xy[..., 1] >= 0) & (xy[..., 1] < shape[1])
+
+#whether each (x, y) position is inside a mask (positions off the grid are not)
+def in_mask(mask, xy):
+    x, y = np.clip(xy[..., 0], 0, mask.shape[0] - 1), np.clip(xy[..., 1], 0, mask.shape[1] - 1)
+    return on_grid(mask.shape, xy) & mask[x, y]
+
+class CompiledRF():
+    def __init__(self, grounded_rf, masks):
+        #grounded RF is a conjunction of (prop function, object, room) triples
+        rf_list = grounded_rf.split()
+        assert len(rf_list) % 3 == 0, "reward function {} is invalid".format(grounded_rf)
+        self.rf = " ".join(rf_list)
+        self.terms = [(rf_list[i + 1].startswith('agent'), masks[rf_list[i + 2]]) for i in range(0, len(rf_list), 3)]
+
+        #goal satisfaction for every (agent x, agent y, block x, block y) on the grid, plus a border of off-grid
+        #positions (table index = position + 1), so an RF on one object ignores where the other one is
+        width, height = masks.values()[0].shape
+        ax, ay, bx, by = np.indices((width + 2, height + 2, width + 2, height + 2)) - 1
+        self.table = self.satisfied(np.stack([ax, ay], -1), np.stack([bx, by], -1))
+
+    #goal satisfaction of each state, given agent and block positions (int arrays of shape [..., 2])
+    def satisfied(self, agent_xy, block_xy):
+        goal = np.ones(np.broadcast(agent_xy[..., 0], block_xy[..., 0]).shape, dtype=bool)
+        for is_agent, mask in self.terms:
+            goal &= in_mask(mask, agent_xy if is_agent else block_xy)
+        return goal
+
+    #reward of each state: goal_reward where the RF is satisfied, step_reward elsewhere
+    def reward(self, agent_xy, block_xy, goal_reward=1.0, step_reward=0.0):
+        return np.where(self.satisfied(agent_xy, block_xy), goal_reward, step_reward)
+
+#compiles (and memoizes) grounded RFs for a layout, and evaluates batches of states with a different RF per state
+class RFEvaluator():
+    def __init__(self, layout=cleanup_classic):
+        self.masks = room_masks(layout)
+        self.compiled = {}
+
+    def compile(self, grounded_rf):
+        key = " ".join(grounded_rf.split())
+        if key not in self.compiled:
+            self.compiled[key] = CompiledRF(key, self.masks)
+        return self.compiled[key]
+
+    #goal satisfaction of state i under grounded_rfs[rf_ids[i]] (states as int arrays of shape [N, 2]), looked up in the
+    #stacked goal tables of the RFs. without rf_ids, grounded_rfs lists the RF of each state
+    def satisfied(self, grounded_rfs, agent_xy, block_xy, rf_ids=None):
+        if rf_ids is None:
+            grounded_rfs, rf_ids = np.unique(grounded_rfs, return_inverse=True)
+        tables = np.stack([self.compile(rf).table for rf in grounded_rfs])
+        #positions off the grid all map to the (unsatisfiable) border
+        a = np.clip(agent_xy + 1, 0, np.array(tables.shape[1:3]) - 1)
+        b = np.clip(block_xy + 1, 0, np.array(tables.shape[3:]) - 1)
+        return tables[rf_ids, a[..., 0], a[..., 1], b[..., 0], b[..., 1]]
+
+    def reward(self, grounded_rfs, agent_xy, block_xy, rf_ids=None, goal_reward=1.0, step_reward=0.0):
+        return np.where(self.satisfied(grounded_rfs, agent_xy, block_xy, rf_ids), goal_reward, step_reward)
+
+    #fraction of states on which two grounded RFs agree about goal satisfaction (1.0 for RFs with the same goal states)
+    def agreement(self, rf_a, rf_b, agent_xy, block_xy):
+        return np.mean(self.compile(rf_a).satisfied(agent_xy, block_xy) == self.compile(rf_b).satisfied(agent_xy, block_xy))
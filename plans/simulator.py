@@ -0,0 +1,144 @@
+#batched rollout simulator for the Cleanup domain: steps many action sequences in parallel, to verify predicted
+#trajectories (e.g. from NPI/DRAGGN, expanded with segments_to_actions.py, or planned with generate_actions.py)
+
+#the state of every rollout is kept as struct-of-arrays indices into the planner's state table, and each step is a
+#lookup in its precomputed transition table, so a step costs the same for one rollout as for thousands.
+
+from argparse import ArgumentParser
+from sys import argv
+import re
+
+import numpy as np
+from domains import cleanup_classic, id2domain
+from ground_rf import ground_rf
+from planner import CleanupPlanner, NORTH, SOUTH, EAST, WEST
+from randomize_grounding import load_strings
+from domain_table import DomainTable
+
+#action names used across the datasets (segments, NPI programs, RSS traces), mapped to the planner's actions
+ACTION_IDS = {'up': 0, 'north': 0, 'down': 1, 'south': 1, 'right': 2, 'east': 2, 'left': 3, 'west': 3, 'pull': 4}
+PAD, INVALID = -1, -2
+
+#orientations (in degrees) of the RSS trace states
+ORIENTATIONS = {0: SOUTH, 90: WEST, 180: NORTH, 270: EAST}
+TRACE_STATE = re.compile(r'([A-Za-z]*)\((\d+),\s*(\d+),\s*(\d+)\)')
+
+class CleanupSimulator():
+    def __init__(self, layout=cleanup_classic):
+        self.planner = CleanupPlanner(layout)
+        self.transitions, self.collisions = self.planner.transitions, self.planner.collisions
+
+    #action sequences (lists of action names) as a padded matrix of action IDs, shape [num_sequences, max_length]
+    def encode(self, action_seqs):
+        actions = np.full((len(action_seqs), max([len(seq) for seq in action_seqs] + [0])), PAD, dtype=np.int32)
+        for i, seq in enumerate(action_seqs):
+            actions[i, :len(seq)] = [ACTION_IDS.get(action.lower(), INVALID) for action in seq]
+        return actions
+
+    #state indices of arrays of agent positions/directions and block positions
+    def states(self, agent_xy, direction, block_xy):
+        return np.ravel_multi_index((agent_xy[:, 0], agent_xy[:, 1], direction, block_xy[:, 0], block_xy[:, 1]),
+                                    self.planner.shape)
+
+    #agent positions, directions and block positions of arrays of state indices
+    def unpack(self, states):
+        ax, ay, direction, bx, by = np.unravel_index(states, self.planner.shape)
+        return np.stack([ax, ay], -1), direction, np.stack([bx, by], -1)
+
+    #runs action sequences from the given start state indices, all in parallel. returns a dictionary of the end agent
+    #positions, directions and block positions, the number of collisions and invalid (unknown) actions of each rollout,
+    #and, with grounded RFs, whether each end state satisfies its RF. with keep_states, also the state index of every
+    #rollout at every step, shape [max_length + 1, num_sequences] (padded rollouts stay in their end state)
+    def rollout(self, starts, action_seqs, grounded_rfs=None, keep_states=False):
+        actions = self.encode(action_seqs)
+        states = np.array(starts, dtype=np.int64)
+        collisions, invalid = np.zeros(len(states), dtype=np.int32), (actions == INVALID).sum(axis=1)
+        history = [states.copy()]
+        for t in range(actions.shape[1]):
+            act = actions[:, t] >= 0
+            current, action = states[act], actions[act, t]
+            collisions[act] += self.collisions[current, action]
+            states[act] = self.transitions[current, action]
+            if keep_states:
+                history.append(states.copy())
+
+        agent_xy, direction, block_xy = self.unpack(states)
+        result = {'agent_xy': agent_xy, 'direction': direction, 'block_xy': block_xy, 'collisions': collisions,
+                  'invalid': invalid}
+        if grounded_rfs is not None:
+            result['satisfied'] = self.planner.evaluator.satisfied(grounded_rfs, agent_xy, block_xy)
+        if keep_states:
+            result['states'] = np.stack(history)
+        return result
+
+    #runs action sequences, each from the start state of its domain
+    def rollout_domains(self, domains, action_seqs, grounded_rfs=None, keep_states=False):
+        starts = [self.planner.start_state(domain) for domain in domains]
+        return self.rollout(starts, action_seqs, grounded_rfs, keep_states)
+
+#loads state-annotated traces (as in data/rss_data/traces_RSS_lifted.txt): blocks of RF, start state, end state, and
+#semicolon-separated ACTION(x,y,orientation) steps ending in the final state. returns a list of (RF, actions, states)
+def load_traces(filename):
+    with open(filename, 'r') as f:
+        blocks = [block.split('\n') for block in f.read().split('\n\n')]
+    traces = []
+    for lines in blocks:
+        lines = [line.strip() for line in lines if line.strip() and not line.startswith('#')]
+        if len(lines) < 4:
+            continue
+        steps = TRACE_STATE.findall(lines[3])
+        actions = [action for action, _, _, _ in steps if action]
+        states = [(int(x), int(y), ORIENTATIONS[int(o)]) for _, x, y, o in steps]
+        traces.append((lines[0], actions, states))
+    return traces
+
+#replays state-annotated traces (with the block at its cd_1 start cell), returning whether each trace's simulated
+#agent positions match its annotated ones at every step
+def verify_traces(simulator, traces):
+    starts, block = [], simulator.planner.cells[id2domain['1']['block']]
+    for _, _, states in traces:
+        (x, y, direction) = states[0]
+        starts.append(simulator.states(np.array([[x, y]]), np.array([direction]), np.array([block]))[0])
+    result = simulator.rollout(starts, [actions for _, actions, _ in traces], keep_states=True)
+    agent_xy = simulator.unpack(result['states'])[0]
+    return np.array([all(tuple(agent_xy[t, i]) == states[t][:2] for t in range(len(states)))
+                     for i, (_, _, states) in enumerate(traces)])
+
+def parse(args):
+    parser = ArgumentParser()
+    parser.add_argument("--traces", help="state-annotated traces to replay")
+    parser.add_argument("--actions", help="list of action sequences to verify (space-separated actions)")
+    parser.add_argument("--rf", help="list of corresponding reward functions")
+    parser.add_argument("--domains", help="list of corresponding domain IDs for each action sequence")
+    parser.add_argument("--domain_table", help="domain table the domain IDs refer to (as saved by randomize_grounding.py --configurations)")
+    parser.add_argument("--lifted", help="if reward functions are lifted", action="store_true")
+    return parser.parse_args(args)
+
+def run(args):
+    simulator = CleanupSimulator()
+
+    if args.traces:
+        traces = load_traces(args.traces)
+        matched = verify_traces(simulator, traces)
+        for (rf, _, _), match in zip(traces, matched):
+            if not match:
+                print "trace mismatch: {}".format(rf)
+        print "traces replayed: {}/{} match".format(matched.sum(), len(matched))
+
+    if args.actions:
+        action_seqs = [line.split() for line in load_strings(args.actions)]
+        domain_ids = DomainTable.load(args.domain_table).id2domain() if args.domain_table else id2domain
+        domains = [domain_ids[domain_id] for domain_id in load_strings(args.domains)]
+        rfs = load_strings(args.rf)
+        assert len(action_seqs) == len(domains) == len(rfs), "{} action sequences, {} domains, {} reward functions".format(
+            len(action_seqs), len(domains), len(rfs))
+        if args.lifted:
+            rfs = [ground_rf(rf, domain) for rf, domain in zip(rfs, domains)]
+
+        result = simulator.rollout_domains(domains, action_seqs, rfs)
+        print "goal satisfied: {:.3f}".format(result['satisfied'].mean())
+        print "rollouts with collisions: {:.3f}".format((result['collisions'] > 0).mean())
+        print "rollouts with invalid actions: {:.3f}".format((result['invalid'] > 0).mean())
+
+if __name__=="__main__":
+    run(parse(argv[1:]))
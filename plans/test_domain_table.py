@@ -0,0 +1,85 @@
+#tests for domain_table.py (and the RF grounding scripts built on it). run from plans/ with
+#python -m unittest discover -p 'test_*.py'
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import randomize_grounding
+from domain_table import DomainTable, InternedRFs, Grounder, write_grounded
+from domains import id2domain
+from ground_rf import ground_rf
+
+PERMUTED = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'experiments', 'permuted_ends_test')
+LIFTED = ["agentInRegion roomIsGreen", "blockInRegion roomIsRed  agentInRegion roomIsBlue", "agentInRegion roomIsGreen"]
+
+class DomainTableTest(unittest.TestCase):
+    def test_predefined_matches_domains(self):
+        table = DomainTable.predefined()
+        self.assertEqual(table.id2domain(), id2domain)
+
+    def test_configurations(self):
+        table = DomainTable.configurations()
+        self.assertEqual(len(table), 6 * 3 * 3)
+        self.assertEqual(len(set(tuple(row) for row in table.table)), len(table))
+
+    def test_save_load(self):
+        table, directory = DomainTable.configurations(), tempfile.mkdtemp()
+        try:
+            table.save(os.path.join(directory, "domains.txt"))
+            loaded = DomainTable.load(os.path.join(directory, "domains.txt"))
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(loaded.id2domain(), table.id2domain())
+
+class GrounderTest(unittest.TestCase):
+    def test_interned(self):
+        interned = InternedRFs(LIFTED)
+        self.assertEqual(len(interned.lifted), 2)
+        self.assertEqual(interned.rf_ids[0], interned.rf_ids[2])
+
+    def test_matches_ground_rf(self):
+        table = DomainTable.predefined()
+        grounder = Grounder(InternedRFs(LIFTED), table)
+        for i, name in enumerate(table.names):
+            expected = [ground_rf(rf, id2domain[name]) for rf in LIFTED]
+            self.assertEqual(list(grounder.strings(grounder.ground([i] * len(LIFTED)))), expected)
+
+    def test_cross(self):
+        table = DomainTable.configurations()
+        grounder = Grounder(InternedRFs(LIFTED), table)
+        grounded = grounder.strings(grounder.ground(cross=True))
+        self.assertEqual(grounded.shape, (len(LIFTED), len(table)))
+        for j in [0, 17, len(table) - 1]:
+            self.assertEqual(list(grounded[:, j]), [ground_rf(rf, table.domain(j)) for rf in LIFTED])
+
+    def test_write_grounded_chunks(self):
+        table, directory = DomainTable.predefined(), tempfile.mkdtemp()
+        grounder = Grounder(InternedRFs(LIFTED * 5), table)
+        domain_ids = np.arange(len(LIFTED) * 5) % len(table)
+        try:
+            rf_file, domain_file = os.path.join(directory, "rf"), os.path.join(directory, "domain")
+            write_grounded(grounder, grounder.ground(domain_ids), domain_ids, rf_file, domain_file, chunk_size=4)
+            rfs, names = randomize_grounding.load_strings(rf_file), randomize_grounding.load_strings(domain_file)
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(names, [table.names[i] for i in domain_ids])
+        self.assertEqual(rfs, [ground_rf(rf, id2domain[name]) for rf, name in zip(LIFTED * 5, names)])
+
+    #regrounding the permuted ends test set reproduces the checked-in files
+    def test_regrounds_permuted_ends(self):
+        directory = tempfile.mkdtemp()
+        try:
+            randomize_grounding.r.seed(0)
+            randomize_grounding.run(randomize_grounding.parse(["--lifted", os.path.join(PERMUTED, "L2_test_lifted_gt.ml"),
+                                                               "--out", os.path.join(directory, "randomized")]))
+            for suffix in ["_grounded_gt.ml", "_domain_numbers.txt"]:
+                self.assertEqual(randomize_grounding.load_strings(os.path.join(directory, "randomized" + suffix)),
+                                 randomize_grounding.load_strings(os.path.join(PERMUTED, "randomized" + suffix)))
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+#tests for planner.py. run from plans/ with python -m unittest discover -p 'test_*.py'
+
+import unittest
+from collections import deque
+
+import numpy as np
+from domains import cleanup_classic, id2domain
+from ground_rf import ground_rf
+from planner import CleanupPlanner, ACTIONS, NORTH, EAST
+
+LIFTED = ["agentInRegion roomIsGreen", "agentInRegion roomIsRed", "blockInRegion roomIsBlue",
+          "blockInRegion roomIsGreen", "agentInRegion roomIsRed blockInRegion roomIsBlue"]
+
+class PlannerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.planner = CleanupPlanner()
+
+    def step(self, agent, direction, block, action):
+        state = np.ravel_multi_index(agent + (direction,) + block, self.planner.shape)
+        action = [name for name, _ in ACTIONS].index(action)
+        ax, ay, d, bx, by = np.unravel_index(self.planner.transitions[state, action], self.planner.shape)
+        return ((ax, ay), d, (bx, by)), self.planner.collisions[state, action]
+
+    def test_walls_block_moves(self):
+        self.assertEqual(self.step((1, 1), NORTH, (3, 3), 'Left'), (((1, 1), 3, (3, 3)), True))
+
+    def test_doors_are_open(self):
+        self.assertEqual(self.step((2, 3), NORTH, (1, 1), 'Up'), (((2, 4), NORTH, (1, 1)), False))
+
+    def test_push(self):
+        self.assertEqual(self.step((2, 2), NORTH, (3, 2), 'Right'), (((3, 2), EAST, (4, 2)), False))
+        self.assertEqual(self.step((6, 2), NORTH, (7, 2), 'Right'), (((6, 2), EAST, (7, 2)), True))
+
+    def test_pull(self):
+        self.assertEqual(self.step((3, 2), EAST, (4, 2), 'PULL'), (((2, 2), EAST, (3, 2)), False))
+        self.assertEqual(self.step((3, 2), NORTH, (4, 2), 'PULL'), (((3, 2), NORTH, (4, 2)), True))
+
+    #plans reach their goal, and are as short as a plain breadth-first search finds
+    def test_plans_are_shortest(self):
+        for domain in id2domain.values():
+            start = self.planner.start_state(domain)
+            depth, queue = {start: 0}, deque([start])
+            while queue:
+                state = queue.popleft()
+                for next_state in self.planner.transitions[state]:
+                    if next_state not in depth:
+                        depth[next_state] = depth[state] + 1
+                        queue.append(next_state)
+            for lifted in LIFTED:
+                rf = ground_rf(lifted, domain)
+                plan, goals = self.planner.plan(domain, rf), np.where(self.planner.goal_states(rf))[0]
+                state = start
+                for action in plan:
+                    state = self.planner.transitions[state, [name for name, _ in ACTIONS].index(action)]
+                self.assertTrue(self.planner.goal_states(rf)[state])
+                self.assertEqual(len(plan), min(depth[g] for g in goals if g in depth))
+
+    def test_satisfied_at_start(self):
+        domain = id2domain['1']
+        self.assertEqual(self.planner.plan(domain, ground_rf("agentInRegion start", domain)), [])
+
+    def test_unreachable(self):
+        planner = CleanupPlanner(dict(cleanup_classic, doors=[]))
+        domain = id2domain['1']
+        self.assertIsNone(planner.plan(domain, ground_rf("agentInRegion block", domain)))
+
+if __name__ == "__main__":
+    unittest.main()
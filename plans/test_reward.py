@@ -0,0 +1,50 @@
+#tests for reward.py. run from plans/ with python -m unittest discover -p 'test_*.py'
+
+import unittest
+
+import numpy as np
+from reward import room_masks, RFEvaluator
+
+#reference goal check, one state at a time, from the room boundaries
+def reference_satisfied(grounded_rf, agent, block, rooms):
+    rf_list = grounded_rf.split()
+    for i in range(0, len(rf_list), 3):
+        x, y = agent if rf_list[i + 1].startswith('agent') else block
+        left, right, bottom, top = rooms[rf_list[i + 2]]
+        if not (left < x < right and bottom < y < top):
+            return False
+    return True
+
+class RewardTest(unittest.TestCase):
+    def setUp(self):
+        self.evaluator = RFEvaluator()
+        self.rooms = {'room0': (0, 8, 0, 4), 'room1': (0, 4, 4, 8), 'room2': (4, 8, 4, 8)}
+        self.rfs = ["agentInRegion agent0 room1", "blockInRegion block0 room0",
+                    "agentInRegion agent0 room2 blockInRegion block0 room1"]
+
+    def test_room_masks(self):
+        masks = room_masks()
+        self.assertEqual([masks[room].sum() for room in ['room0', 'room1', 'room2']], [21, 9, 9])
+        self.assertFalse(masks['room0'][2, 4] or masks['room1'][2, 4])
+
+    def test_matches_reference(self):
+        rng = np.random.RandomState(0)
+        agent_xy, block_xy = rng.randint(-1, 10, (500, 2)), rng.randint(-1, 10, (500, 2))
+        rf_ids = rng.randint(0, len(self.rfs), 500)
+        satisfied = self.evaluator.satisfied(self.rfs, agent_xy, block_xy, rf_ids)
+        expected = [reference_satisfied(self.rfs[r], a, b, self.rooms) for r, a, b in zip(rf_ids, agent_xy, block_xy)]
+        self.assertEqual(satisfied.tolist(), expected)
+        self.assertTrue(satisfied.any())
+
+    def test_rf_per_state(self):
+        agent_xy, block_xy = np.array([[2, 6], [2, 6]]), np.array([[2, 2], [2, 2]])
+        self.assertEqual(self.evaluator.satisfied(self.rfs[:2], agent_xy, block_xy).tolist(), [True, True])
+        self.assertEqual(self.evaluator.reward([self.rfs[2]] * 2, agent_xy, block_xy, step_reward=-1.0).tolist(), [-1.0, -1.0])
+
+    def test_agreement(self):
+        agent_xy, block_xy = np.indices((9, 9)).reshape(2, -1).T, np.zeros((81, 2), dtype=int)
+        self.assertEqual(self.evaluator.agreement("agentInRegion agent0 room1", " agentInRegion  agent0 room1", agent_xy, block_xy), 1.0)
+        self.assertLess(self.evaluator.agreement(self.rfs[0], "agentInRegion agent0 room2", agent_xy, block_xy), 1.0)
+
+if __name__ == "__main__":
+    unittest.main()
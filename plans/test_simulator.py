@@ -0,0 +1,78 @@
+#tests for simulator.py. run from plans/ with python -m unittest discover -p 'test_*.py'
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from StringIO import StringIO
+
+import numpy as np
+import simulator
+from domains import id2domain
+from ground_rf import ground_rf
+from planner import CleanupPlanner
+from randomize_grounding import save_strings, load_strings
+
+TRACES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'rss_data', 'traces_RSS_lifted.txt')
+
+class SimulatorTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.simulator = simulator.CleanupSimulator()
+
+    def test_encode(self):
+        actions = self.simulator.encode([["Up", "north", "PULL"], [], ["jump"]])
+        self.assertEqual(actions.tolist(), [[0, 0, 4], [simulator.PAD] * 3, [simulator.INVALID] + [simulator.PAD] * 2])
+
+    def test_states_round_trip(self):
+        agent_xy, direction, block_xy = np.array([[2, 2], [6, 6]]), np.array([0, 3]), np.array([[2, 6], [3, 2]])
+        unpacked = self.simulator.unpack(self.simulator.states(agent_xy, direction, block_xy))
+        for expected, actual in zip([agent_xy, direction, block_xy], unpacked):
+            self.assertTrue((expected == actual).all())
+
+    def test_planned_rollouts_satisfy_goals(self):
+        planner, domains, rfs, plans = CleanupPlanner(), [], [], []
+        for domain_id in sorted(id2domain):
+            for lifted in ["agentInRegion roomIsGreen", "blockInRegion roomIsRed", "agentInRegion roomIsBlue blockInRegion roomIsGreen"]:
+                rf = ground_rf(lifted, id2domain[domain_id])
+                plan = planner.plan(id2domain[domain_id], rf)
+                if plan is not None:
+                    domains.append(id2domain[domain_id]), rfs.append(rf), plans.append(plan)
+        result = self.simulator.rollout_domains(domains, plans, rfs)
+        self.assertTrue(result['satisfied'].all())
+        self.assertFalse(result['collisions'].any())
+
+    def test_padded_rollouts_keep_their_end_states(self):
+        start = self.simulator.planner.start_state(id2domain['1'])
+        result = self.simulator.rollout([start, start], [["Left"], ["Left", "Right", "Left"]], keep_states=True)
+        self.assertEqual(result['states'].shape, (4, 2))
+        self.assertEqual(result['states'][-1, 0], result['states'][1, 0])
+        self.assertEqual(result['states'][-1, 0], result['states'][-1, 1])
+
+    def test_rss_traces_replay(self):
+        traces = simulator.load_traces(TRACES)
+        self.assertEqual(len(traces), 8)
+        self.assertTrue(simulator.verify_traces(self.simulator, traces).all())
+
+    #an empty plan (goal satisfied at the start) at the end of the file still lines up with its RF
+    def test_run_with_trailing_empty_plan(self):
+        directory, stdout = tempfile.mkdtemp(), sys.stdout
+        try:
+            rfs = ["agentInRegion roomIsGreen", "agentInRegion roomIsBlue"]
+            plans = [" ".join(self.simulator.planner.plan(id2domain['1'], ground_rf(rf, id2domain['1']))) for rf in rfs]
+            self.assertEqual(plans[1], "")
+            paths = [os.path.join(directory, name) for name in ["actions", "rf", "domains"]]
+            for path, strings in zip(paths, [plans, rfs, ["1", "1"]]):
+                save_strings(path, strings)
+            self.assertEqual(load_strings(paths[0]), plans)
+            sys.stdout = StringIO()
+            simulator.run(simulator.parse(["--actions", paths[0], "--rf", paths[1], "--domains", paths[2], "--lifted"]))
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+            shutil.rmtree(directory)
+        self.assertIn("goal satisfied: 1.000", output)
+
+if __name__ == "__main__":
+    unittest.main()
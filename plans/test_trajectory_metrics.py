@@ -0,0 +1,58 @@
+#tests for trajectory_metrics.py. run from plans/ with python -m unittest discover -p 'test_*.py'
+
+import random
+import unittest
+
+import numpy as np
+from trajectory_metrics import encode_runs, strip_common, edit_distances, trajectory_lengths, level_metrics
+
+ACTIONS = ['Up', 'Down', 'Left', 'Right', 'PULL']
+
+#reference Levenshtein distance between two lists, one cell of the dynamic program at a time
+def levenshtein(a, b):
+    row = range(len(b) + 1)
+    for i, x in enumerate(a, 1):
+        previous, row = row, [i]
+        for j, y in enumerate(b, 1):
+            row.append(min(previous[j] + 1, row[j - 1] + 1, previous[j - 1] + (x != y)))
+    return row[-1]
+
+#random trajectory, as expanded actions, and as run-length segments of the same actions
+def random_trajectory(rng):
+    runs = [(rng.choice(ACTIONS), rng.randint(1, 4)) for _ in range(rng.randint(0, 6))]
+    actions = [action for action, count in runs for _ in range(count)]
+    return actions, " | ".join("{} {}".format(action, count) for action, count in runs)
+
+class TrajectoryMetricsTest(unittest.TestCase):
+    def test_encode_runs(self):
+        vocab = {}
+        self.assertEqual(encode_runs("Down 4 | down 1 | Left 5 | Up", vocab), [(0, 5), (1, 5), (2, 1)])
+        self.assertEqual(encode_runs("North North South", vocab), [(2, 2), (0, 1)])
+        self.assertEqual(encode_runs("", vocab), [])
+
+    def test_strip_common(self):
+        self.assertEqual(strip_common([(0, 3), (1, 2), (2, 4)], [(0, 1), (3, 1), (2, 5)]), ([(0, 2), (1, 2)], [(3, 1), (2, 1)]))
+        self.assertEqual(strip_common([(0, 3)], [(0, 3)]), ([], []))
+
+    #distances match the reference on random pairs, in either format, and with batches of mixed lengths
+    def test_matches_reference(self):
+        rng = random.Random(0)
+        pairs = [(random_trajectory(rng), random_trajectory(rng)) for _ in range(300)]
+        expected = [levenshtein(a[0], b[0]) for a, b in pairs]
+        expanded = edit_distances([" ".join(a[0]) for a, _ in pairs], [" ".join(b[0]) for _, b in pairs], batch_size=16)
+        segments = edit_distances([a[1] for a, _ in pairs], [b[1] for _, b in pairs], batch_size=16)
+        self.assertEqual(expanded.tolist(), expected)
+        self.assertEqual(segments.tolist(), expected)
+
+    def test_level_metrics(self):
+        predicted, reference = ["Up 2", "Up 1 | Left 1", "Down 3"], ["Up 2", "Up 2", "Down 1"]
+        self.assertEqual(trajectory_lengths(predicted).tolist(), [2, 2, 3])
+        metrics = level_metrics(predicted, reference, ['L0', 'L1', 'L1'])
+        self.assertEqual(metrics['L0'], {'count': 1, 'edit_distance': 0.0, 'normalized': 0.0, 'exact': 1.0})
+        self.assertEqual(metrics['L1']['count'], 2)
+        self.assertAlmostEqual(metrics['L1']['edit_distance'], 1.5)
+        self.assertAlmostEqual(metrics['L1']['normalized'], (1 / 2.0 + 2 / 3.0) / 2)
+        self.assertAlmostEqual(metrics['overall']['exact'], 1 / 3.0)
+
+if __name__ == "__main__":
+    unittest.main()
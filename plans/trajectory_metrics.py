@@ -0,0 +1,131 @@
+#edit distance between predicted and reference action trajectories, for whole test sets at once
+
+#trajectories are kept run-length encoded (as in the NPI segments, e.g. "Down 4 | Left 5 | Up 2"; expanded
+#trajectories, e.g. "Down Down Left", are encoded into runs). common prefixes and suffixes are stripped run by run
+#(which doesn't change the Levenshtein distance), so identical and near-identical pairs are never expanded; only the
+#differing middles are, and their distances are computed together with a dynamic program vectorized over the batch.
+
+from argparse import ArgumentParser
+from sys import argv
+import re
+
+import numpy as np
+from randomize_grounding import load_strings
+from simulator import ACTION_IDS
+
+RUN = re.compile(r'([A-Za-z]+)\s*(\d*)')
+
+#run-length encoding of a trajectory string (segments or expanded actions): list of (action ID, count) runs,
+#with adjacent runs of the same action merged (action aliases, e.g. Up/North, share an ID)
+def encode_runs(trajectory, vocab):
+    runs = []
+    for action, count in RUN.findall(trajectory):
+        action_id = vocab.setdefault(ACTION_IDS.get(action.lower(), action), len(vocab))
+        count = int(count) if count else 1
+        if runs and runs[-1][0] == action_id:
+            runs[-1] = (action_id, runs[-1][1] + count)
+        elif count > 0:
+            runs.append((action_id, count))
+    return runs
+
+#strips the common prefix and suffix of two run-length encoded trajectories, run by run (a shared action with
+#different counts is trimmed by the smaller count). returns the differing middles
+def strip_common(a, b):
+    a, b = list(a), list(b)
+    for index in [0, -1]:
+        while a and b and a[index][0] == b[index][0]:
+            shared = min(a[index][1], b[index][1])
+            a[index], b[index] = (a[index][0], a[index][1] - shared), (b[index][0], b[index][1] - shared)
+            if a[index][1] == 0:
+                a.pop(index)
+            if b[index][1] == 0:
+                b.pop(index)
+    return a, b
+
+#expands run-length encoded trajectories into a padded matrix of action IDs, and their lengths
+def expand(runs_list, pad):
+    lengths = np.array([sum(count for _, count in runs) for runs in runs_list], dtype=np.int64)
+    actions = np.full((len(runs_list), max(lengths.max(), 1)), pad, dtype=np.int64)
+    for i, runs in enumerate(runs_list):
+        if runs:
+            ids, counts = zip(*runs)
+            actions[i, :lengths[i]] = np.repeat(ids, counts)
+    return actions, lengths
+
+#Levenshtein distances of a batch of (a, b) action ID sequences (padded matrices, with their lengths), computing one
+#row of every pair's dynamic program per step (insertions along a row are resolved with a running minimum)
+def batch_levenshtein(a, a_len, b, b_len):
+    columns = np.arange(b.shape[1] + 1)
+    row, distances = np.tile(columns, (len(a), 1)), np.where(a_len == 0, b_len, 0)
+    for i in range(1, a_len.max() + 1):
+        substitute = row[:, :-1] + (a[:, i - 1:i] != b)
+        delete = row[:, 1:] + 1
+        row = np.concatenate([np.full((len(a), 1), i), np.minimum(substitute, delete)], axis=1)
+        row = np.minimum.accumulate(row - columns, axis=1) + columns
+        done = a_len == i
+        distances[done] = row[done, b_len[done]]
+    return distances
+
+#edit distances between lists of predicted and reference trajectory strings, with pairs run in batches of similar
+#lengths (so one long pair doesn't pad the whole test set)
+def edit_distances(predicted, reference, batch_size=256):
+    vocab = {}
+    pairs = [strip_common(encode_runs(p, vocab), encode_runs(r, vocab)) for p, r in zip(predicted, reference)]
+    distances = np.zeros(len(pairs), dtype=np.int64)
+
+    #pairs with an empty middle need no dynamic program
+    lengths = np.array([[sum(count for _, count in runs) for runs in pair] for pair in pairs]).reshape(-1, 2)
+    trivial = (lengths == 0).any(axis=1)
+    distances[trivial] = lengths[trivial].sum(axis=1)
+
+    remaining = np.where(~trivial)[0]
+    remaining = remaining[np.argsort(lengths[remaining].max(axis=1), kind='mergesort')]
+    for start in range(0, len(remaining), batch_size):
+        batch = remaining[start:start + batch_size]
+        a, a_len = expand([pairs[i][0] for i in batch], -1)
+        b, b_len = expand([pairs[i][1] for i in batch], -2)
+        distances[batch] = batch_levenshtein(a, a_len, b, b_len)
+    return distances
+
+#trajectory lengths (number of actions) of a list of trajectory strings
+def trajectory_lengths(trajectories):
+    vocab = {}
+    return np.array([sum(count for _, count in encode_runs(t, vocab)) for t in trajectories], dtype=np.int64)
+
+#aggregate metrics per level (e.g. L0/L1/L2) and overall: number of pairs, mean edit distance, mean distance
+#normalized by the longer trajectory, and exact match rate
+def level_metrics(predicted, reference, levels):
+    distances = edit_distances(predicted, reference)
+    longest = np.maximum(np.maximum(trajectory_lengths(predicted), trajectory_lengths(reference)), 1)
+    metrics = {}
+    for level in sorted(set(levels)) + ['overall']:
+        selected = np.array([level in ['overall', l] for l in levels], dtype=bool)
+        metrics[level] = {'count': int(selected.sum()), 'edit_distance': distances[selected].mean(),
+                          'normalized': (distances[selected].astype(float) / longest[selected]).mean(),
+                          'exact': (distances[selected] == 0).mean()}
+    return metrics
+
+def parse(args):
+    parser = ArgumentParser()
+    parser.add_argument("--pred", help="predicted trajectories (segments or expanded actions)")
+    parser.add_argument("--ref", help="reference trajectories (segments or expanded actions)")
+    parser.add_argument("--levels", help="list of corresponding levels (e.g. L0/L1/L2) for each trajectory")
+    parser.add_argument("--level", help="level of all trajectories (instead of --levels)", default="all")
+    parser.add_argument("--results", help="results log file")
+    return parser.parse_args(args)
+
+def run(args):
+    predicted, reference = load_strings(args.pred), load_strings(args.ref)
+    assert len(predicted) == len(reference), "{} predicted, {} reference trajectories".format(len(predicted), len(reference))
+    levels = load_strings(args.levels) if args.levels else [args.level] * len(predicted)
+
+    metrics = level_metrics(predicted, reference, levels)
+    lines = ["{}: n={} edit distance={:.3f} normalized={:.3f} exact={:.3f}".format(
+        level, m['count'], m['edit_distance'], m['normalized'], m['exact']) for level, m in sorted(metrics.items())]
+    print "\n".join(lines)
+    if args.results:
+        with open(args.results, 'w') as f:
+            f.write("\n".join(lines))
+
+if __name__=="__main__":
+    run(parse(argv[1:]))
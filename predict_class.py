@@ -6,6 +6,7 @@ produces output sets of predicted ends/means data to run the NPI and the CCG on
 from argparse import ArgumentParser
 from sys import argv
 from models.classifier_rnn import ClassifierRNN
+from data_utils import save_data, load_data, load_labels
 import numpy as np
 
 def parse(args):
@@ -16,21 +17,6 @@ def parse(args):
     parser.add_argument("--ends", help="output location for ends")
     return parser.parse_args(args)
 
-#save strings to file
-def save_data(outfile, data):
-    with open(outfile, 'w') as textfile:
-        outstr = "\n".join(data)
-        textfile.write(outstr)
-        print "saved to {}".format(outfile)
-
-def load_data(filepath):
-    with open(filepath, 'r') as f:
-        return [line.strip() for line in f]
-
-def load_labels(filepath):
-    with open(filepath, 'r') as f:
-        return np.array([1 if line.strip() == "E" else 0 for line in f])
-
 def run(args):
     #create classifier RNN, train model
     classifier_rnn = ClassifierRNN(args.train, args.test)
@@ -7,7 +7,7 @@ from models.single_rnn import SingleRNN
 import numpy as np
 from sys import argv
 from argparse import ArgumentParser
-from predict_class import load_data
+from data_utils import load_data
 
 def parse(args):
     parser = ArgumentParser()